@@ -1,6 +1,7 @@
 import os
 import glob
 import re
+import json
 import joblib
 
 base_folder_path = 'resources/viper_extracts/extract_output'
@@ -32,7 +33,7 @@ def extract_tree_body_as_code(tree, feature_names, class_names, node=0, depth=1)
     )
 
     code = (
-        f"{'    ' * depth}if {condition}:\n"
+        f"{'    ' * depth}if {condition}:  # {feature_names[feature_index]}\n"
         f"{'    ' * (depth+1)}self.decision_path.append(\"{append_cond} -> True\")\n"
         f"{left_code}"
         f"{'    ' * depth}else:\n"
@@ -129,8 +130,14 @@ for viper_path in matching_files:
     # Load the DecisionTree and extract code
     dtree = joblib.load(viper_path)
 
+    # feature names from the observation schema written by viper_extract.py, generic names for older extracts
     n_features = dtree.n_features_in_
-    features = [f"feature_{i}" for i in range(n_features)]
+    schema_path = os.path.join(folder_dir, "schema.json")
+    if os.path.exists(schema_path):
+        with open(schema_path, "r") as f:
+            features = json.load(f)["observation_names"]
+    else:
+        features = [f"feature_{i}" for i in range(n_features)]
 
     tree_body_code = extract_tree_body_as_code(
         dtree,
@@ -0,0 +1,134 @@
+import time
+from pathlib import Path
+
+import argparse
+import numpy as np
+import torch as th
+import yaml
+from captum.attr import IntegratedGradients
+from stable_baselines3 import PPO
+from stable_baselines3.common.vec_env import VecNormalize, DummyVecEnv
+
+from scobi import Environment
+from scobi.pruning import feature_importance, function_costs, reward_requirements, select_functions, select_objects, \
+    expected_speedup, pruned_focus_dict
+from scobi.rewards import load_default_spec, spec_features
+
+EVAL_ENV_SEED = 84
+
+
+def collect_samples(model, env, steps):
+    # roll out the trained policy, returns the (normalized) observations and the mean wall time of a step in us
+    obs_out_array = []
+    step_time = 0.0
+    obs = env.reset()
+    for _ in range(steps):
+        obs_out_array.append(obs[0]) #unvec
+        action, _ = model.predict(obs, deterministic=True)
+        start = time.perf_counter()
+        obs, _, done, _ = env.step(action)
+        step_time += time.perf_counter() - start
+        if done:
+            obs = env.reset()
+    return np.array(obs_out_array, dtype=np.float32), step_time / steps * 1e6
+
+
+def attribute(model, observations, batch_size=256):
+    # integrated gradients of the chosen action logits w.r.t. the observation
+    policy = model.policy
+    def forward(x):
+        return policy.get_distribution(x).distribution.logits
+    ig = IntegratedGradients(forward)
+    out = []
+    for i in range(0, len(observations), batch_size):
+        x = th.as_tensor(observations[i:i+batch_size], device=policy.device)
+        with th.no_grad():
+            target = forward(x).argmax(dim=-1)
+        attr = ig.attribute(x, baselines=th.zeros_like(x), target=target)
+        out.append(attr.detach().cpu().numpy())
+    return np.concatenate(out)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--input", type=str, required=True, help="checkpoint folder containing 'best_model.zip', 'best_vecnormalize.pkl' and the focus file it was trained with")
+    parser.add_argument("-g", "--game", type=str, required=True, help="game of the checkpoint (e.g. 'Pong')")
+    parser.add_argument("-f", "--focus_file", type=str, required=False, help="focus file in the checkpoint folder to prune, default focus file if omitted")
+    parser.add_argument("-o", "--output", type=str, required=False, help="pruned focus file to write, 'resources/focusfiles/pruned_<game>.yaml' if omitted")
+    parser.add_argument("-k", "--keep", type=float, required=False, default=0.95, help="fraction of the total feature importance to keep")
+    parser.add_argument("-s", "--steps", type=int, required=False, default=2000, help="number of agent steps to sample importance and cost on")
+    parser.add_argument("-x", "--exclude_properties", action="store_true", help="checkpoint was trained without properties in the feature vector")
+    parser.add_argument("--hackatari", action="store_true", help="use Hackatari as environment")
+    parser.add_argument("-mods", "--mods", type=str, required=False, help="list which mods you want to run with hackatari, separate via comma")
+    opts = parser.parse_args()
+
+    if opts.hackatari and opts.mods:
+        mods = [item.strip() for item in opts.mods.split(",")]
+    else: mods = None
+
+    env_str = "ALE/" + opts.game + "-v5"
+    game_id = opts.game.lower()
+    checkpoint_path = Path(opts.input)
+    output_path = Path(opts.output) if opts.output else Path("resources/focusfiles", f"pruned_{game_id}.yaml")
+
+    env = Environment(env_str,
+                      focus_dir=checkpoint_path,
+                      focus_file=opts.focus_file,
+                      hide_properties=opts.exclude_properties,
+                      refresh_yaml=False,
+                      profile=True,
+                      reward=0,
+                      hackatari=opts.hackatari, mods=mods)
+    focus = env.focus
+    _, _ = env.reset(seed=EVAL_ENV_SEED)
+    dummy_vecenv = DummyVecEnv([lambda :  env])
+    vec_env = VecNormalize.load(checkpoint_path / "best_vecnormalize.pkl", dummy_vecenv)
+    vec_env.training = False
+    vec_env.norm_reward = False
+    model = PPO.load(checkpoint_path / "best_model")
+
+    print(f"Sampling {opts.steps} steps of {env_str}...")
+    focus.PROFILER.reset()
+    observations, step_us = collect_samples(model, vec_env, opts.steps)
+    profile = focus.get_profile()
+    print(focus.PROFILER.table())
+
+    print("Computing feature attributions...")
+    attributions = attribute(model, observations)
+    n_props = len(focus.NS_REPR_LIST)
+    importance = feature_importance(attributions, focus.FEATURE_VECTOR_BACKMAP, n_props + len(focus.PARSED_FUNCTIONS),
+                                    opts.exclude_properties, focus.FEATURE_VECTOR_PROPS_SIZE)
+    property_importance, function_importance = importance[:n_props], importance[n_props:]
+
+    with open(focus.FOCUSFILEPATH, "r") as f:
+        in_dict = yaml.safe_load(f)
+    # the samples are taken without reward shaping, the features of the reward spec (REWARD section of the focus file
+    # or the packaged default of the game) are kept, s.t. the pruned focus file can be trained with -r human/mixed
+    reward_spec = in_dict.get("REWARD") or load_default_spec(env_str)
+    reward_functions, reward_objects = reward_requirements(focus.PARSED_FUNCTIONS, spec_features(reward_spec))
+
+    costs = function_costs(profile, focus.PARSED_FUNCTIONS)
+    kept = select_functions(function_importance, costs, opts.keep, reward_functions)
+    kept_functions = [focus.PARSED_FUNCTIONS[i] for i in kept]
+    objects = select_objects(focus.OBJECT_NAMES, focus.NS_REPR_LIST, property_importance, kept_functions, opts.keep, focus.OBJECT_CATEGORIES,
+                             reward_objects)
+
+    out_dict = pruned_focus_dict(in_dict, objects, kept_functions, focus.funclist_to_yaml_dict)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w") as f:
+        yaml.dump(out_dict, f, sort_keys=False)
+
+    saved_us = costs.sum() - costs[kept].sum()
+    feature_us = sum(c["us_per_step"] for c in profile["concepts"].values())
+    before, after = expected_speedup(step_us, saved_us)
+    print("--------------------------------------------")
+    print(f"functions: {len(focus.PARSED_FUNCTIONS)} -> {len(kept_functions)} | objects: {len(focus.OBJECT_NAMES)} -> {len(objects)}")
+    print(f"importance kept: {function_importance[kept].sum() / max(function_importance.sum(), 1e-12):.3f}")
+    print(f"feature extraction: {feature_us:.1f} us/step -> {feature_us - saved_us:.1f} us/step")
+    print(f"expected steps/sec: {before:.1f} -> {after:.1f} ({100 * (after / before - 1):+.1f}%)")
+    print(f"pruned focus file written to {output_path}")
+    print("--------------------------------------------")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""User cache of compiled focus files and generated feature extractors"""
+import hashlib
+import os
+from pathlib import Path
+
+# Compiled focus files are pickles and generated extractors are python modules, loading either runs code. They are
+# only read from the user cache, never from the folder of a focus file: focus files are shared with checkpoints and
+# a planted file next to one would be executed. Entries are named by the location of the focus file and checked
+# against the hash of its content, a changed focus file replaces them.
+# SCOBI_CACHE_DIR moves the cache, SCOBI_CACHE=0 turns both caches off (focus files are compiled on every load and
+# single envs extract with the feature plan).
+
+
+def cache_enabled():
+    return os.environ.get("SCOBI_CACHE", "1") != "0"
+
+
+def get_cache_dir():
+    if os.environ.get("SCOBI_CACHE_DIR"):
+        return Path(os.environ["SCOBI_CACHE_DIR"])
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local"
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "scobi"
+
+
+def get_cache_path(fpath, suffix):
+    # cache entry of the focus file at fpath, e.g. ~/.cache/scobi/default_focus_Pong-v5_<path hash>.compiled
+    fpath = Path(fpath)
+    location = hashlib.sha256(str(fpath.resolve()).encode()).hexdigest()[:16]
+    return get_cache_dir() / ("%s_%s%s" % (fpath.stem, location, suffix))
+
+
+def make_cache_dir():
+    # only readable by the user
+    cache_dir = get_cache_dir()
+    cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+    return cache_dir
@@ -0,0 +1,175 @@
+"""Generate a straight-line python feature extractor from a compiled feature plan"""
+import os
+import importlib.util
+import numpy as np
+from scobi.concepts import EPS
+from scobi.cache import cache_enabled, get_cache_path, make_cache_dir
+
+# bump when the generated code changes
+CODEGEN_VERSION = 3
+
+
+# inline templates of the registered functions
+# each template gets the argument expressions (one list per parameter) and a unique temp variable prefix,
+# and returns the statements to emit and the expressions of the return values.
+# templates have to match the scalar functions bit for bit
+def lin_traj_source(a, h, t):
+    lines = [
+        "%sm = (%s - %s) / (%s - %s + 0.1)" % (t, h[3], h[1], h[2], h[0]),
+        "%sb = %s - %sm * %s" % (t, h[1], t, h[0]),
+    ]
+    distx = "((%s - %sb) / (%sm + EPS)) - %s" % (a[1], t, t, a[0])
+    disty = "(%sm * %s + %sb) - %s" % (t, a[0], t, a[1])
+    return lines, [distx, disty]
+
+
+def distance_source(a, b, t):
+    return [], ["%s - %s" % (b[0], a[0]), "%s - %s" % (b[1], a[1])]
+
+
+def euclidean_distance_source(a, b, t):
+    return [], ["sqrt((%s - %s)**2 + (%s - %s)**2)" % (b[1], a[1], b[0], a[0])]
+
+
+def center_source(a, b, t):
+    return [], ["(%s + %s)/2" % (a[0], b[0]), "(%s + %s)/2" % (a[1], b[1])]
+
+
+def velocity_source(h, t):
+    return [], ["sqrt((%s - %s)**2 + (%s - %s)**2)" % (h[2], h[0], h[3], h[1])]
+
+
+def dir_velocity_source(h, t):
+    return [], ["%s - %s" % (h[2], h[0]), "%s - %s" % (h[3], h[1])]
+
+
+def acceleration_source(h, t):
+    return [], ["(%s - %s) - (%s - %s)" % (h[0], h[2], h[2], h[4]), "(%s - %s) - (%s - %s)" % (h[1], h[3], h[3], h[5])]
+
+
+def multi_step_velocity_source(h, t):
+    steps = len(h) // 2 - 1
+    return [], ["(%s - %s) / %d" % (h[-2], h[0], steps), "(%s - %s) / %d" % (h[-1], h[1], steps)]
+
+
+SOURCE_TEMPLATES = {
+    "LINEAR_TRAJECTORY": lin_traj_source,
+    "DISTANCE": distance_source,
+    "EUCLIDEAN_DISTANCE": euclidean_distance_source,
+    "CENTER": center_source,
+    "VELOCITY": velocity_source,
+    "DIR_VELOCITY": dir_velocity_source,
+    "ACCELERATION": acceleration_source,
+    "MULTI_STEP_VELOCITY": multi_step_velocity_source,
+}
+
+
+def generate_extractor_source(plan, key, origin):
+    """
+Turn a FeaturePlan into the source of a module with a single function extract(obs_buffer, out).
+extract fills out (feature vector size) with the unmasked feature vector of the (2, n_props) OCAtari buffer
+(the (history_depth, row_width) buffered history for history depths > 2)
+and returns None if all objects are visible, else the boolean mask of feature entries derived from invisible objects.
+    """
+    n_rows = plan.raw_object_incidence.shape[1] # object x frame
+    fv_names = ["p%d" % i for i in range(plan.props_size)]
+
+    body = ["    r = np.asarray(obs_buffer, dtype=np.float64).ravel().tolist()"]
+    # property layer
+    for i, raw_idx in enumerate(plan.gather_idxs.tolist()):
+        body.append("    p%d = r[%d]" % (i, raw_idx))
+
+    # visibility of each object per frame, row t * n_objects + o as in the plan
+    rows = [[] for _ in range(n_rows)]
+    for vis_idx, row in zip(*np.nonzero(plan.raw_object_incidence)):
+        raw_idx = vis_idx if plan.visibility_idxs is None else plan.visibility_idxs[vis_idx]
+        rows[row].append("r[%d] != r[%d]" % (raw_idx, raw_idx))
+    for row, checks in enumerate(rows):
+        body.append("    i%d = %s" % (row, " or ".join(checks) if checks else "False"))
+
+    # function layer
+    helpers = {}
+    func_offset = plan.props_size
+    for i, ((start, stop), input_idxs) in enumerate(zip(plan.func_output_slices, plan.func_input_idxs)):
+        fname = plan.func_names[i]
+        args = [["p%d" % k for k in idxs] for idxs in input_idxs]
+        outs = ["f%d" % k for k in range(start, stop)]
+        template = SOURCE_TEMPLATES.get(fname)
+        if template is not None:
+            lines, exprs = template(*args, "t%d_" % i)
+            body += ["    " + line for line in lines]
+            body += ["    %s = %s" % (o, e) for o, e in zip(outs, exprs)]
+        else:
+            # no template, call the registered function unless one of its objects is invisible
+            helper = helpers.setdefault(fname, "F%d" % len(helpers))
+            input_rows = np.nonzero(plan.object_feature_incidence[:, func_offset + start])[0]
+            invisible = " or ".join("i%d" % row for row in input_rows) or "False"
+            call_args = ["(%s,)" % ", ".join(a) if a else "()" for a in args] + ["%s=%r" % o for o in plan.func_options[i].items()]
+            call = "%s(%s)" % (helper, ", ".join(call_args))
+            body.append("    %s = nan_result%d if %s else %s" % (", ".join(outs) + ",", stop - start, invisible, call))
+        fv_names += outs
+
+    body.append("    out[:] = (%s,)" % ", ".join(fv_names))
+
+    # freeze mask
+    all_rows = " or ".join("i%d" % row for row in range(n_rows)) or "False"
+    body.append("    if not (%s):" % all_rows)
+    body.append("        return None")
+    body.append("    frozen = np.zeros(%d, dtype=bool)" % plan.feature_vector_size)
+    for row in range(n_rows):
+        entries = np.nonzero(plan.object_feature_incidence[row])[0].tolist()
+        if entries:
+            body.append("    if i%d:" % row)
+            body.append("        frozen[%s] = True" % entries)
+    body.append("    return frozen")
+
+    header = [
+        "# generated by scobi.codegen from %s, do not edit" % origin,
+        "from math import sqrt",
+        "import numpy as np",
+        "from scobi.utils.decorators import FUNCTIONS",
+        "",
+        "CODEGEN_VERSION = %d" % CODEGEN_VERSION,
+        "KEY = %r" % key,
+        "FEATURE_VECTOR_SIZE = %d" % plan.feature_vector_size,
+        "EPS = %r" % EPS,
+    ]
+    for fname, helper in helpers.items():
+        header.append("%s = FUNCTIONS[%r][\"object\"]" % (helper, fname))
+    for n in sorted({stop - start for start, stop in plan.func_output_slices}):
+        header.append("nan_result%d = (%s)" % (n, "float(\"nan\"), " * n))
+    header += ["", "", "def extract(obs_buffer, out):"]
+    return "\n".join(header + body) + "\n"
+
+
+def get_extractor_path(fpath):
+    return get_cache_path(fpath, "_extractor.py")
+
+
+def load_extractor(fpath, key):
+    # import the generated extractor of the focus file from the user cache (see scobi.cache),
+    # None if it is missing or outdated or the cache is off
+    epath = get_extractor_path(fpath)
+    if not cache_enabled() or not epath.exists():
+        return None
+    try:
+        spec = importlib.util.spec_from_file_location(epath.stem, epath)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    except Exception: # broken file, regenerate
+        return None
+    if getattr(module, "KEY", None) != key or getattr(module, "CODEGEN_VERSION", None) != CODEGEN_VERSION:
+        return None
+    return module
+
+
+def write_extractor(fpath, plan, key):
+    # generate, write (atomically, several envs may compile the same file) and import the extractor
+    epath = get_extractor_path(fpath)
+    source = generate_extractor_source(plan, key, fpath)
+    make_cache_dir()
+    tmp_path = epath.with_name("%s.%d.tmp" % (epath.name, os.getpid()))
+    with open(tmp_path, "w") as f:
+        f.write(source)
+    os.replace(tmp_path, epath)
+    return load_extractor(fpath, key)
@@ -1,16 +1,27 @@
 """Properties and Functions for scobi features"""
 import math
-from typing import Tuple
+from typing import Tuple, NewType
 import numpy as np
 # from scobi.utils.game_object import get_wrapper_class
 from scobi.utils.colors import get_closest_color
+from scobi.utils.color_dicts import COLOR_TO_INT
+from scobi.utils.palette import PALETTE_COLOR_INT_MAP, palette_color_ints
 from scobi.utils.decorators import register
-COLOR_INT_MEMORY = {}
+# rgb -> color int, preset with the Atari palette. off-palette values are added on first sight
+COLOR_INT_MEMORY = dict(PALETTE_COLOR_INT_MAP)
 EPS = np.finfo(np.float64).eps.item()
+# [x_t, y_t, x_t-1, y_t-1, ..., x_t-k, y_t-k], length depends on the history depth declared in the focus file
+PositionTrail = NewType("PositionTrail", tuple)
+# [x_1, y_1, ..., x_n, y_n] of all slots of an object category ({POSITIONS: <category>} in the focus file)
+CategoryPositions = NewType("CategoryPositions", tuple)
+# [dx_1, dy_1, ..., dx_k, dy_k], k is set by the relations of the focus file
+NearestK = NewType("NearestK", tuple)
 # GameObject = get_wrapper_class()
 
-# None forwarding crucial for feature handling when objects are invisible
-# TODO: use a wrapper instead, pretty ugly atm
+# Invisible objects are NaN. Feature entries derived from them are masked and zeroed by the
+# feature plan (object -> feature incidence), so functions do not need to handle them.
+# Exception are CategoryPositions: the slots of a category do not mask the result, invisible slots are skipped.
+# The slot of the object a relation is evaluated for is left out by the feature plan.
 
 # dummy init
 def init():
@@ -50,13 +61,179 @@ def init():
 #     return tuple(obj.rgb)
 
 
+##########################
+# VECTORIZED KERNELS
+##########################
+# Each kernel evaluates all instances of a function at once. Arguments are stacked property
+# arrays of shape (..., n_instances, arg_len), the result has shape (..., n_instances, return_len).
+# Kernels have to match the scalar functions bit for bit (see scobi.parity). Invisible inputs are NaN,
+# their results are masked afterwards, kernels only must not fail on them. Kernels with a 'visible'
+# parameter additionally get the (..., n_instances) visibility mask of the instances.
+def lin_traj_kernel(a_position, b_history):
+    m = (b_history[..., 3] - b_history[..., 1]) / (b_history[..., 2] - b_history[..., 0] + 0.1)
+    b = b_history[..., 1] - m * b_history[..., 0]
+    disty = (m * a_position[..., 0] + b) - a_position[..., 1]
+    distx = ((a_position[..., 1] - b) / (m + EPS)) - a_position[..., 0]
+    return np.stack((distx, disty), axis=-1)
+
+
+def distance_kernel(a_position, b_position):
+    return b_position - a_position
+
+
+def euclidean_distance_kernel(a_position, b_position):
+    # sqrt of the squared sum instead of np.hypot, to stay bit-identical with math.sqrt
+    delta = b_position - a_position
+    return np.sqrt(delta[..., 1:2]**2 + delta[..., 0:1]**2)
+
+
+def center_kernel(a_position, b_position):
+    return (a_position + b_position) / 2
+
+
+def velocity_kernel(pos_history):
+    delta = pos_history[..., 2:4] - pos_history[..., 0:2]
+    return np.sqrt(delta[..., 0:1]**2 + delta[..., 1:2]**2)
+
+
+def dir_velocity_kernel(pos_history):
+    return pos_history[..., 2:4] - pos_history[..., 0:2]
+
+
+def color_name_kernel(rgb):
+    out, found = palette_color_ints(rgb)
+    if not found.all():
+        # off-palette colors, nearest css3 color once per unique value
+        off = ~found & ~np.isnan(rgb).any(axis=-1)
+        if off.any():
+            uniq, inverse = np.unique(rgb[off], axis=0, return_inverse=True)
+            ints = []
+            for key in map(tuple, uniq.tolist()):
+                if key not in COLOR_INT_MEMORY:
+                    _, COLOR_INT_MEMORY[key] = get_closest_color(key)
+                ints.append(COLOR_INT_MEMORY[key])
+            out[off] = np.array(ints, dtype=np.float64)[inverse.ravel()]
+    return out[..., None]
+
+
+def acceleration_kernel(pos_trail):
+    return (pos_trail[..., 0:2] - pos_trail[..., 2:4]) - (pos_trail[..., 2:4] - pos_trail[..., 4:6])
+
+
+def multi_step_velocity_kernel(pos_trail):
+    steps = pos_trail.shape[-1] // 2 - 1
+    return (pos_trail[..., -2:] - pos_trail[..., 0:2]) / steps
+
+
+def _neighbour_deltas(a_position, positions):
+    # per frame index of a category: (..., n_slots, 2) deltas and (..., n_slots) squared distances, inf for invisible slots
+    deltas = positions.reshape(positions.shape[:-1] + (-1, 2)) - a_position[..., None, :]
+    d2 = (deltas**2).sum(axis=-1)
+    d2[np.isnan(d2)] = np.inf
+    return deltas, d2
+
+
+def nearest_k_kernel(a_position, positions, visible, k=2):
+    deltas, d2 = _neighbour_deltas(a_position, positions)
+    order = np.argsort(d2, axis=-1, kind="stable")[..., :k]
+    nearest = np.take_along_axis(deltas, order[..., None], axis=-2)
+    found = np.isfinite(np.take_along_axis(d2, order, axis=-1))
+    out = np.zeros(a_position.shape[:-1] + (k, 2))
+    out[..., :order.shape[-1], :] = np.where(found[..., None], nearest, 0.0)
+    out[~visible] = np.nan
+    return out.reshape(a_position.shape[:-1] + (2*k,))
+
+
+def within_radius_kernel(a_position, positions, visible, radius=20.0):
+    _, d2 = _neighbour_deltas(a_position, positions)
+    out = (d2 <= radius*radius).sum(axis=-1, keepdims=True).astype(np.float64)
+    out[~visible] = np.nan
+    return out
+
+
+##########################
+# VALUE BOUNDS
+##########################
+# Bounds of the feature values, used for the observation space and compact observation dtypes.
+# Property bounds are per entry (low, high). OCAtari reports objects that are partly outside of the
+# 160x210 screen, positions get a margin of one screen in every direction.
+SCREEN_WIDTH, SCREEN_HEIGHT = 160, 210
+PROPERTY_BOUNDS = {
+    "POSITION": ((-SCREEN_WIDTH, -SCREEN_HEIGHT), (2*SCREEN_WIDTH, 2*SCREEN_HEIGHT)),
+    "RGB": ((0, 0, 0), (255, 255, 255)),
+}
+# Function bounds get the (low, high) arrays of every argument and return the (low, high) arrays of the result
+# (interval arithmetic over the argument bounds). Functions without bounds are unbounded.
+def _sub_bounds(a, b):
+    # bounds of a - b
+    return a[0] - b[1], a[1] - b[0]
+
+
+def _norm_bounds(delta):
+    # bounds of the euclidean norm of a 2d delta
+    far = np.maximum(np.abs(delta[0]), np.abs(delta[1]))
+    near = np.where((delta[0] <= 0) & (delta[1] >= 0), 0.0, np.minimum(np.abs(delta[0]), np.abs(delta[1]))) # per axis
+    return np.array([np.sqrt((near**2).sum())]), np.array([np.sqrt((far**2).sum())])
+
+
+def _slice_bounds(a, sl):
+    return a[0][sl], a[1][sl]
+
+
+def distance_bounds(a_position, b_position):
+    return _sub_bounds(b_position, a_position)
+
+
+def euclidean_distance_bounds(a_position, b_position):
+    return _norm_bounds(_sub_bounds(b_position, a_position))
+
+
+def center_bounds(a_position, b_position):
+    return (a_position[0] + b_position[0]) / 2, (a_position[1] + b_position[1]) / 2
+
+
+def velocity_bounds(pos_history):
+    return _norm_bounds(_sub_bounds(_slice_bounds(pos_history, slice(2, 4)), _slice_bounds(pos_history, slice(0, 2))))
+
+
+def dir_velocity_bounds(pos_history):
+    return _sub_bounds(_slice_bounds(pos_history, slice(2, 4)), _slice_bounds(pos_history, slice(0, 2)))
+
+
+def color_name_bounds(rgb):
+    return np.zeros(1), np.array([float(max(COLOR_TO_INT.values()))])
+
+
+def acceleration_bounds(pos_trail):
+    # x_t - 2 x_t-1 + x_t-2
+    t0, t1, t2 = [_slice_bounds(pos_trail, slice(i, i+2)) for i in (0, 2, 4)]
+    return t0[0] - 2*t1[1] + t2[0], t0[1] - 2*t1[0] + t2[1]
+
+
+def multi_step_velocity_bounds(pos_trail):
+    steps = len(pos_trail[0]) // 2 - 1
+    low, high = _sub_bounds(_slice_bounds(pos_trail, slice(-2, None)), _slice_bounds(pos_trail, slice(0, 2)))
+    return low / steps, high / steps
+
+
+def nearest_k_bounds(a_position, positions, k=2):
+    # deltas to any slot of the category, or 0 if less than k are visible
+    if not len(positions[0]):
+        return np.zeros(2*k), np.zeros(2*k)
+    slots = (positions[0].reshape(-1, 2).min(axis=0), positions[1].reshape(-1, 2).max(axis=0))
+    low, high = _sub_bounds(slots, a_position)
+    return np.tile(np.minimum(low, 0.0), k), np.tile(np.maximum(high, 0.0), k)
+
+
+def within_radius_bounds(a_position, positions, radius=20.0):
+    return np.zeros(1), np.array([float(len(positions[0]) // 2)])
+
+
 ##########################
 # FUNCTIONS TO REGISTER
 ##########################
-@register(type="F", name="LINEAR_TRAJECTORY", params=["POSITION", "POSITION_HISTORY"], desc="x, y distance to trajectory")
+@register(type="F", name="LINEAR_TRAJECTORY", params=["POSITION", "POSITION_HISTORY"], desc="x, y distance to trajectory", kernel=lin_traj_kernel)
 def calc_lin_traj(a_position: Tuple[int, int], b_history: Tuple[int, int, int, int]) -> Tuple[int, int]:
-    if None in a_position or None in b_history:
-        return None, None
     m = (b_history[3] - b_history[1]) / (b_history[2] - b_history[0] + 0.1 )  # slope  m = (y2 - y1) / (x2 - x1)
     b = b_history[1] - m * b_history[0] # b = y - mx
     disty = (m * a_position[0] + b) - a_position[1] # delta_y = y_a - (m * x_a + b)
@@ -64,44 +241,34 @@ def calc_lin_traj(a_position: Tuple[int, int], b_history: Tuple[int, int, int, i
     return distx, disty
 
 
-@register(type="F", name="DISTANCE", params=["POSITION", "POSITION"], desc="distance between two coordinates")
+@register(type="F", name="DISTANCE", params=["POSITION", "POSITION"], desc="distance between two coordinates", kernel=distance_kernel, bounds=distance_bounds, integral=True)
 def calc_distance(a_position: Tuple[int, int], b_position: Tuple[int, int]) -> Tuple[int, int]:
-    if None in a_position or None in b_position:
-        return None, None
     distx = b_position[0] - a_position[0]
     disty = b_position[1] - a_position[1]
     return distx, disty
 
 
-@register(type="F", name="EUCLIDEAN_DISTANCE", params=["POSITION", "POSITION"], desc="euclidean distance between two coordinates")
+@register(type="F", name="EUCLIDEAN_DISTANCE", params=["POSITION", "POSITION"], desc="euclidean distance between two coordinates", kernel=euclidean_distance_kernel, bounds=euclidean_distance_bounds)
 def calc_euclidean_distance(a_position: Tuple[int, int], b_position: Tuple[int, int]) -> Tuple[float]:
-    if None in [*a_position, *b_position]:
-        return None, 
     dist = math.sqrt((b_position[1] - a_position[1])**2 + (b_position[0] - a_position[0])**2)
     return dist,
 
 
-@register(type="F", name="CENTER", params=["POSITION", "POSITION"], desc="center position of two objects")
+@register(type="F", name="CENTER", params=["POSITION", "POSITION"], desc="center position of two objects", kernel=center_kernel, bounds=center_bounds)
 def get_center(a_position: Tuple[int, int], b_position: Tuple[int, int]) -> Tuple[int, int]:
-    if None in a_position or None in b_position:
-        return None, None
     return (a_position[0] + b_position[0])/2, (a_position[1] + b_position[1])/2
 
 
-@register(type="F", name="VELOCITY", params=["POSITION_HISTORY"], desc="velocity of object")
+@register(type="F", name="VELOCITY", params=["POSITION_HISTORY"], desc="velocity of object", kernel=velocity_kernel, bounds=velocity_bounds)
 def get_velocity(pos_history: Tuple[int, int, int, int]) -> Tuple[float]:
-    if None in pos_history:
-        return None,
     obj = pos_history[0:2]
     obj_past = pos_history[2:4]
     vel = math.sqrt((obj_past[0] - obj[0])**2 + (obj_past[1] - obj[1])**2)
     return vel,
 
 
-@register(type="F", name="DIR_VELOCITY", params=["POSITION_HISTORY"], desc="directional velocity of object")
+@register(type="F", name="DIR_VELOCITY", params=["POSITION_HISTORY"], desc="directional velocity of object", kernel=dir_velocity_kernel, bounds=dir_velocity_bounds, integral=True)
 def get_dir_velocity(pos_history: Tuple[int, int, int, int]) -> Tuple[float, float]:
-    if None in pos_history:
-        return None, None
     obj = pos_history[0:2]
     obj_past = pos_history[2:4]
     vel_x = obj_past[0] - obj[0]
@@ -109,10 +276,8 @@ def get_dir_velocity(pos_history: Tuple[int, int, int, int]) -> Tuple[float, flo
     return vel_x, vel_y
 
 
-@register(type="F", name="COLOR", params=["RGB"], desc="Index of colorname")
+@register(type="F", name="COLOR", params=["RGB"], desc="Index of colorname", kernel=color_name_kernel, bounds=color_name_bounds, integral=True)
 def get_color_name(rgb: Tuple[int, int, int]) -> Tuple[int]:
-    if None in rgb:
-        return None,
     # only calc distances if new unseen rgb value
     if rgb in COLOR_INT_MEMORY:
         return COLOR_INT_MEMORY[rgb],
@@ -120,3 +285,44 @@ def get_color_name(rgb: Tuple[int, int, int]) -> Tuple[int]:
         _, col_int = get_closest_color(rgb)
         COLOR_INT_MEMORY[rgb] = col_int
         return col_int,
+
+
+@register(type="F", name="ACCELERATION", params=["POSITION_TRAIL"], desc="acceleration of object over the last three frames", kernel=acceleration_kernel, bounds=acceleration_bounds, integral=True)
+def get_acceleration(pos_trail: PositionTrail) -> Tuple[float, float]:
+    acc_x = (pos_trail[0] - pos_trail[2]) - (pos_trail[2] - pos_trail[4])
+    acc_y = (pos_trail[1] - pos_trail[3]) - (pos_trail[3] - pos_trail[5])
+    return acc_x, acc_y
+
+
+@register(type="F", name="MULTI_STEP_VELOCITY", params=["POSITION_TRAIL"], desc="mean directional velocity of object over the whole history", kernel=multi_step_velocity_kernel, bounds=multi_step_velocity_bounds)
+def get_multi_step_velocity(pos_trail: PositionTrail) -> Tuple[float, float]:
+    steps = len(pos_trail) // 2 - 1
+    vel_x = (pos_trail[-2] - pos_trail[0]) / steps # same direction as DIR_VELOCITY
+    vel_y = (pos_trail[-1] - pos_trail[1]) / steps
+    return vel_x, vel_y
+
+
+def _visible_neighbours(a_position, positions):
+    # (squared distance, dx, dy) of the visible category slots
+    out = []
+    for i in range(0, len(positions), 2):
+        dx = positions[i] - a_position[0]
+        dy = positions[i+1] - a_position[1]
+        d2 = dx*dx + dy*dy
+        if d2 == d2: # nan: invisible
+            out.append((d2, dx, dy))
+    return out
+
+
+@register(type="F", name="NEAREST_K", params=["POSITION", "POSITIONS"], desc="x, y distance to the k nearest objects of a category", kernel=nearest_k_kernel, bounds=nearest_k_bounds, integral=True)
+def get_nearest_k(a_position: Tuple[int, int], positions: CategoryPositions, k=2) -> NearestK:
+    neighbours = sorted(_visible_neighbours(a_position, positions), key=lambda x: x[0]) # ties in slot order
+    out = []
+    for _, dx, dy in neighbours[:k]:
+        out += [dx, dy]
+    return tuple(out + [0.0] * (2*k - len(out))) # less than k visible
+
+
+@register(type="F", name="WITHIN_RADIUS", params=["POSITION", "POSITIONS"], desc="number of objects of a category within a radius", kernel=within_radius_kernel, bounds=within_radius_bounds, integral=True)
+def get_within_radius(a_position: Tuple[int, int], positions: CategoryPositions, radius=20.0) -> Tuple[int]:
+    return sum(1 for d2, _, _ in _visible_neighbours(a_position, positions) if d2 <= radius*radius),
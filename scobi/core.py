@@ -12,7 +12,11 @@ from copy import deepcopy
 
 class Environment(Env):
     def __init__(self, env_name, seed=None, focus_dir="resources/focusfiles", focus_file=None, reward=0, hide_properties=False, silent=False,
-                 refresh_yaml=True, draw_features=False, hud=False, hackatari=False, mods=None):
+                 refresh_yaml=True, draw_features=False, hud=False, hackatari=False, mods=None, candidate_filter=None,
+                 incremental=False, normalize=False, freeze_normalization=False, profile=False, obs_dtype="float32",
+                 prototype=None):
+        # prototype: initialized Environment (or its focus) of the same game, its compiled focus file is copied
+        # instead of loading it again (focus_dir, focus_file, refresh_yaml and candidate_filter are only used if it does not match)
         self.logger = Logger(silent=silent)
         # set buffer_window=2, s.t. we can build POSITION_HISTORY properties, which are needed by all envs.
         self.oc_env = em.make(env_name, self.logger, hackatari, mods, hud=hud, buffer_window_size=2)
@@ -21,29 +25,48 @@ class Environment(Env):
         # TODO: tie to em.make
         self.game_object_wrapper = get_wrapper_class()
 
-        # TODO: oc envs should answer this, not the raw env
-        actions = self.oc_env._env.unwrapped.get_action_meanings()
-
-        self.oc_env.reset(seed=self.seed)
-
         # not possible anymore
         # self.noisy_objects = os.environ["SCOBI_OBJ_EXTRACTOR"] == "Noisy_OC_Atari"
         self.noisy_objects = False
 
-        # use the initialized slots from OC_Atari (ensures that there are no NoObjects)
-        init_objects = self.oc_env._slots
-        max_obj_dict = self.oc_env.max_objects_per_cat
         self.did_reset = False
-        self.focus = Focus(env_name, reward, hide_properties, focus_dir, focus_file, init_objects, max_obj_dict, actions, refresh_yaml, self.logger)
+        # TODO: oc envs should answer this, not the raw env
+        actions = self.oc_env._env.unwrapped.get_action_meanings()
+        if prototype is not None:
+            prototype = prototype.focus if isinstance(prototype, Environment) else prototype
+            settings = {"env": env_name.split("/")[-1], "hide_properties": hide_properties, "obs_dtype": np.dtype(obs_dtype).name,
+                        "normalize": normalize, "freeze_normalization": freeze_normalization, "incremental": incremental}
+            mismatch = [k for k, v in prototype.get_settings().items() if settings[k] != v]
+            # hud and mods can change the object slots and actions of the env, the compiled plan is bound to them
+            if prototype.MAX_NB_OBJECTS != self.oc_env.max_objects_per_cat:
+                mismatch.append("object slots")
+            if list(prototype.ACTIONS) != list(actions):
+                mismatch.append("actions")
+            if mismatch:
+                self.logger.GeneralWarning("Prototype does not match the env (%s), loading the focus file again." % ", ".join(mismatch))
+                prototype = None
+        if prototype is None:
+            self.oc_env.reset(seed=self.seed)
+
+            # use the initialized slots from OC_Atari (ensures that there are no NoObjects)
+            init_objects = self.oc_env._slots
+            max_obj_dict = self.oc_env.max_objects_per_cat
+            self.focus = Focus(env_name, reward, hide_properties, focus_dir, focus_file, init_objects, max_obj_dict, actions, refresh_yaml, self.logger,
+                               candidate_filter=candidate_filter, incremental=incremental,
+                               normalize=normalize, freeze_normalization=freeze_normalization, profile=profile,
+                               obs_dtype=obs_dtype)
+        else:
+            self.focus = prototype.clone(self.logger, reward=reward, profile=profile)
         self.focus_file = self.focus.FOCUSFILEPATH
         self.action_space = spaces.Discrete(len(self.focus.PARSED_ACTIONS))
         self.action_space_description = self.focus.PARSED_ACTIONS
         self.observation_space_description = self.focus.PARSED_PROPERTIES + self.focus.PARSED_FUNCTIONS #this and feature_vector_desc is redundant
         self.feature_vector_description = self.focus.get_feature_vector_description()
+        self.feature_schema = self.focus.FEATURE_SCHEMA
         self.num_envs = 1
         self.draw_features = draw_features
         self.feature_attribution = []
-        self.render_font = ImageFont.truetype(str(Path(__file__).parent / 'resources' / 'Gidole-Regular.ttf'), size=38)
+        self._render_font = None # loaded on first use, see render_font
         self.obj_obs = None  # observation augmented with objects
         self._rel_obs = None  # observation augmented with relations
         self._top_features = []
@@ -70,11 +93,12 @@ class Environment(Env):
         if self.noisy_objects:
             self.logger.GeneralInfo("Using noisy object detection (default: std 3, detection error rate 5%)")
 
-        self.reset()
-        self.step(0) # step once to set the feature vector size
-        self.observation_space = spaces.Box(low=-2**63, high=2**63 - 2, shape=(self.focus.OBSERVATION_SIZE,), dtype=np.float32)
+        # the observation size is known from the compiled plan, no need to step the env.
+        # bounds from the concept definitions, see Focus.init_observation_bounds()
+        obs_dtype = self.focus.OBSERVATION_DTYPE
+        self.observation_space = spaces.Box(low=self.focus.OBSERVATION_LOW.astype(obs_dtype), high=self.focus.OBSERVATION_HIGH.astype(obs_dtype),
+                                            shape=(self.focus.OBSERVATION_SIZE,), dtype=obs_dtype)
         self.ale = self.oc_env._env.unwrapped.ale
-        self.reset()
         self.did_reset = False # still require user to properly call a (likely seeded) reset()
 
     def step(self, action):
@@ -89,32 +113,42 @@ class Environment(Env):
                 img_obs = self.oc_env._state_buffer_rgb[-1]
                 self.obj_obs = self._draw_objects_overlay(img_obs)
                 self._rel_obs = self._draw_relation_overlay(img_obs, sco_obs, freeze_mask, action)
-            self.original_obs = obs
-            self.original_reward = reward
-            self.ep_env_reward_buffer += self.original_reward
-            if self.reset_ep_reward:
-                self.ep_env_reward = None
-                self.reset_ep_reward = False
-            if terminated or truncated:
-                self.ep_env_reward = self.ep_env_reward_buffer
-                self.ep_env_reward_buffer = 0
-                self.reset_ep_reward = True
-                self.focus.reward_subgoals = 0
+            self.record_step(obs, reward, terminated or truncated)
             final_reward = self.focus.compose_reward(sco_reward, reward)
             # self.sco_obs = sco_obs
             return sco_obs, final_reward, truncated, terminated, info # 5
         else:
             raise ValueError("scobi> Action not in action space")
 
+    def record_step(self, obs, reward, done):
+        # env reward per episode (ep_env_reward), also kept by the batched vector envs, see scobi.vec_env
+        self.original_obs = obs
+        self.original_reward = reward
+        self.ep_env_reward_buffer += self.original_reward
+        if self.reset_ep_reward:
+            self.ep_env_reward = None
+            self.reset_ep_reward = False
+        if done:
+            self.ep_env_reward = self.ep_env_reward_buffer
+            self.ep_env_reward_buffer = 0
+            self.reset_ep_reward = True
+            self.focus.reward_subgoals = 0
+
     def reset(self, *args, **kwargs):
         self.did_reset = True
         # additional scobi reset steps here
-        self.focus.reward_threshold = -1
-        self.focus.reward_history = [0, 0]
+        self.focus.reset_reward_state()
+        self.focus.reset_history()
         obs, info = self.oc_env.reset(*args, **kwargs)
         sco_obs, _ = self.focus.get_feature_vector(obs)
         return sco_obs, info
 
+    @property
+    def render_font(self):
+        if self._render_font is None:
+            self._render_font = ImageFont.truetype(str(Path(__file__).parent / 'resources' / 'Gidole-Regular.ttf'), size=38)
+        return self._render_font
+
     @property
     def unwrapped(self):
         return self.oc_env.unwrapped
@@ -123,6 +157,15 @@ class Environment(Env):
         # additional scobi close steps here
         self.oc_env.close()
 
+    def save_normalization(self, path=None):
+        # store the observation normalization statistics (next to the focus file by default), requires normalize=True.
+        # not used by the training scripts, see Focus.NORMALIZE
+        return self.focus.save_normalization(path)
+
+    def get_focus_profile(self):
+        # feature extraction costs per concept and object, requires profile=True
+        return self.focus.get_profile()
+
     def set_feature_attribution(self, att):
         self.feature_attribution = att
 
@@ -174,28 +217,24 @@ class Environment(Env):
             img = img.resize((img.size[0]*scale, img.size[1]*scale), resample=Image.BOX)
             # img = self._add_margin(img,0,img.size[0],0,0, (255,255,255))
             return np.array(img)
-        features = self.feature_vector_description[0]
-        fv_backmap = self.feature_vector_description[1]
-        i = 0
+        schema = self.feature_schema
         top_features_k = 5
         top_features_names = ["" for _ in range(top_features_k)]
         if np.ptp(self.feature_attribution):
             feature_attribution = (255*(self.feature_attribution - np.min(self.feature_attribution))/np.ptp(self.feature_attribution)).astype(int)
             top_features_idxs = np.argsort(feature_attribution)[-top_features_k:][::-1]
-            for feature in features:
-                i += 1
-                idxs = np.where(fv_backmap == i-1)[0]
-                feature_name = feature[0]
-                feature_signature = feature[1]
-                fv_entries = feature_vector[idxs[0]:idxs[-1]+1]
-                fv_attribution = feature_attribution[idxs[0]:idxs[-1]+1]
-                fv_freeze_mask = freeze_mask[idxs[0]:idxs[-1]+1]
+            for k_idx, idx in enumerate(top_features_idxs):
+                top_features_names[k_idx] = schema.names[idx]
+
+            def source_values(feature):
+                # entries of a source property of a function
+                return schema.values(feature_vector, schema.feature_index(feature))
+
+            for (feature_name, feature_signature), (start, stop) in zip(schema.features, schema.slices):
+                fv_entries = feature_vector[start:stop]
+                fv_attribution = feature_attribution[start:stop]
                 alpha = int(np.mean(fv_attribution)**2/255)
-                for ii, idx in enumerate(idxs):
-                    if idx in top_features_idxs:
-                        k_idx = np.where(top_features_idxs == idx)[0][0]
-                        top_features_names[k_idx] = format_feature(feature_name, feature_signature, ii)
-                if 0 in fv_freeze_mask:
+                if 0 in freeze_mask[start:stop]:
                     continue
                 if feature_name == "POSITION":
                     radius = 2
@@ -216,44 +255,16 @@ class Environment(Env):
                     draw.ellipse(coords, fill=(10,100,10, alpha), outline=(0,0,0, alpha))
                 elif feature_name == "DISTANCE":
                     delta = [fv_entries[0], fv_entries[1]]
-                    source_object_coords = feature_signature[0]
-                    idx = -1
-                    for f in features:
-                        idx += 1
-                        if f == source_object_coords:
-                            break
-                    idxs = np.where(fv_backmap == idx)[0]
-                    source_object_coord_values = feature_vector[idxs[0]:idxs[-1]+1]
+                    source_object_coord_values = source_values(feature_signature[0])
                     vector = np.add(source_object_coord_values, delta).tolist()
                     draw.line(source_object_coord_values + vector, fill=(0,0,255,alpha), width=1)
                 elif feature_name == "EUCLIDEAN_DISTANCE":
-                    source_object_coords = feature_signature[0]
-                    target_object_coords = feature_signature[1]
-                    idx = -1
-                    for f in features:
-                        idx += 1
-                        if f == source_object_coords:
-                            break
-                    idxs = np.where(fv_backmap == idx)[0]
-                    source_object_coord_values = feature_vector[idxs[0]:idxs[-1]+1]
-                    idx = -1
-                    for f in features:
-                        idx += 1
-                        if f == target_object_coords:
-                            break
-                    idxs = np.where(fv_backmap == idx)[0]
-                    target_object_coord_values = feature_vector[idxs[0]:idxs[-1]+1]
+                    source_object_coord_values = source_values(feature_signature[0])
+                    target_object_coord_values = source_values(feature_signature[1])
                     draw.line(source_object_coord_values + target_object_coord_values , fill=(0,0,255,alpha), width=1)
                 elif feature_name == "TODO": # LINEAR_TRAJECTORY
                     delta = [fv_entries[0], fv_entries[1]]
-                    source_object_coords = feature_signature[0]
-                    idx = -1
-                    for f in features:
-                        idx += 1
-                        if f == source_object_coords:
-                            break
-                    idxs = np.where(fv_backmap == idx)[0]
-                    source_object_coord_values = feature_vector[idxs[0]:idxs[-1]+1]
+                    source_object_coord_values = source_values(feature_signature[0])
                     vector = np.add(source_object_coord_values, delta)#.tolist()
                     vector = vector / np.sqrt(np.sum(vector**2))
                     vector *= 100
@@ -262,30 +273,14 @@ class Environment(Env):
                     velocity_scaling = 2
                     velocity_vector = [fv_entries[0], fv_entries[1]]
                     velocity_vector = np.multiply(velocity_vector, velocity_scaling)
-                    source_object_phistory = feature_signature[0]
-                    idx = -1
-                    for f in features:
-                        idx += 1
-                        if f == source_object_phistory:
-                            break
-                    idxs = np.where(fv_backmap == idx)[0]
-                    source_object_phistory_values = feature_vector[idxs[0]:idxs[-1]+1]
-                    current_coords = source_object_phistory_values[:2]
+                    current_coords = source_values(feature_signature[0])[:2]
                     vector = np.subtract(current_coords, velocity_vector).tolist()
                     draw.line(current_coords + vector, fill=(0,255,255,alpha), width=2)
                 elif feature_name == "VELOCITY":
                     velocity_scaling = 2
                     velocity_value = [0, fv_entries[0]] #draw velocity as vertical bar
                     velocity_vector = np.multiply(velocity_value, velocity_scaling)
-                    source_object_phistory = feature_signature[0]
-                    idx = -1
-                    for f in features:
-                        idx += 1
-                        if f == source_object_phistory:
-                            break
-                    idxs = np.where(fv_backmap == idx)[0]
-                    source_object_phistory_values = feature_vector[idxs[0]:idxs[-1]+1]
-                    current_coords = source_object_phistory_values[:2]
+                    current_coords = source_values(feature_signature[0])[:2]
                     vector = np.subtract(current_coords, velocity_vector).tolist()
                     draw.line(current_coords + vector, fill=(0,255,255,alpha), width=2)
         #print(top_features_names)
@@ -298,54 +293,8 @@ class Environment(Env):
         return np.array(img)
 
     def get_vector_entry_descriptions(self):
-        features = self.feature_vector_description[0]
-        fv_backmap = self.feature_vector_description[1]
-        i = 0
-        features_names = []
-        for feature in features:
-            idxs = np.where(fv_backmap == i)[0]
-            feature_name = feature[0]
-            feature_signature = feature[1]
-            for ii, idx in enumerate(idxs):
-                features_names.append(format_feature(feature_name, feature_signature, ii))
-            i += 1
-        return features_names
-
-
-def format_feature(feature_name, feature_signature, ii):
-    if feature_name == 'RGB':
-        axis = ["R", "G", "B"][ii]
-        return f"RGB({feature_signature}.{axis})"
-    if feature_name == "POSITION_HISTORY":
-        if ii < 2:
-            axis = ["x", "y"][ii]
-            return f"{feature_signature}.{axis}"
-        axis = ["x", "y"][ii-2]
-        return f"{feature_signature}.{axis}[t-1]"
-    axis = ["x", "y"][ii]
-    if ii > 3:
-        print("feature render formatting error. exiting...")
-        exit()
-    if feature_name == 'POSITION':
-        return f"{feature_signature}.{axis}"
-    elif feature_name == "EUCLIDEAN_DISTANCE":
-        return f"ED({feature_signature[0][1]}, {feature_signature[1][1]})"
-    elif feature_name == "DISTANCE":
-        return f"D({feature_signature[0][1]}, {feature_signature[1][1]}).{axis}"
-    elif feature_name == "VELOCITY":
-        return f"V({feature_signature[0][1]}).{axis}"
-    elif feature_name == "DIR_VELOCITY":
-        return f"DV({feature_signature[0][1]}).{axis}"
-    elif feature_name == "CENTER":
-        return f"C({feature_signature[0][1]}, {feature_signature[1][1]}).{axis}"
-    elif feature_name == "ORIENTATION":
-        return f"O({feature_signature})"
-    elif feature_name == "LINEAR_TRAJECTORY":
-        return f"LT({feature_signature[0][1]}, {feature_signature[1][1]}).{axis}"
-    elif feature_name == "COLOR":
-        return f"COL({feature_signature[0][1]})"
-    print("feature render formatting error. exiting...")
-    exit()
+        # display names of the feature vector entries, computed once per focus file
+        return self.feature_schema.names
 
 
 def _make_darker(color, col_precent=0.8):
@@ -1,40 +1,35 @@
-goRight = True
-onLetterUp = False
-onLetterDown = False
-startLetterFromBottom = False
+# initial per env state, see HackAtari.reward_state
+REWARD_STATE = {"goRight": True, "onLetterUp": False, "onLetterDown": False, "startLetterFromBottom": False}
 
 
 def reward_function(self) -> float:
-    global goRight
-    global onLetterUp
-    global onLetterDown
-    global startLetterFromBottom
+    state = self.reward_state
 
     for obj in self.objects:
         if "player" in str(obj).lower():
             player = obj
             break
 
-    if player.dx != 0 and (onLetterUp or onLetterDown):
-        if onLetterUp and startLetterFromBottom:
-            goRight = not goRight
-        if onLetterDown and not startLetterFromBottom:
-            goRight = not goRight
-        onLetterUp = False
-        onLetterDown = False
+    if player.dx != 0 and (state.onLetterUp or state.onLetterDown):
+        if state.onLetterUp and state.startLetterFromBottom:
+            state.goRight = not state.goRight
+        if state.onLetterDown and not state.startLetterFromBottom:
+            state.goRight = not state.goRight
+        state.onLetterUp = False
+        state.onLetterDown = False
 
     if player.dy == -1 and player.dx == 0:
-        if not (onLetterDown or onLetterUp):
-            startLetterFromBottom = True
-        onLetterUp = True
-        onLetterDown = False
+        if not (state.onLetterDown or state.onLetterUp):
+            state.startLetterFromBottom = True
+        state.onLetterUp = True
+        state.onLetterDown = False
     elif player.dy == 1 and player.dx == 0:
-        if not (onLetterDown or onLetterUp):
-            startLetterFromBottom = False
-        onLetterDown = True
-        onLetterUp = False
+        if not (state.onLetterDown or state.onLetterUp):
+            state.startLetterFromBottom = False
+        state.onLetterDown = True
+        state.onLetterUp = False
 
-    if goRight == 0:  # even platform, encourage left movement
+    if state.goRight == 0:  # even platform, encourage left movement
         reward = -player.dx
     else:  # encourage right movement
         reward = player.dx
@@ -42,5 +37,5 @@ def reward_function(self) -> float:
     reward -= player.dy
     if abs(reward) > 50:  # level end
         reward = 100
-    # print( onLetterDown, onLetterUp, startLetterFromBottom, reward)
+    # print( state.onLetterDown, state.onLetterUp, state.startLetterFromBottom, reward)
     return reward
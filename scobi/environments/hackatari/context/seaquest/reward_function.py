@@ -1,9 +1,7 @@
 from ocatari.ram.seaquest import *
 
-LOW_OXYGEN = False
-DIVERS = 0
-COLLISION = False
-COLLECTED = 0
+# initial per env state, see HackAtari.reward_state
+REWARD_STATE = {"low_oxygen": False, "divers": 0, "collision": False, "collected": 0}
 
 
 def check_collision(obj1, obj2):
@@ -29,10 +27,7 @@ def check_collision(obj1, obj2):
 
 
 def reward_function(self) -> float:
-    global LOW_OXYGEN
-    global DIVERS
-    global COLLISION
-    global COLLECTED
+    state = self.reward_state
 
     game_objects = self.objects
     reward = 0.0
@@ -62,29 +57,29 @@ def reward_function(self) -> float:
 
     if player:
         for diver in divers:
-            if check_collision(player, diver) and COLLECTED != 6:
-                COLLISION = True
+            if check_collision(player, diver) and state.collected != 6:
+                state.collision = True
 
-    if DIVERS > len(divers) and COLLISION:
+    if state.divers > len(divers) and state.collision:
         reward += 1  # Scaled down reward for collecting a diver
-        COLLECTED += 1
-        COLLISION = False
+        state.collected += 1
+        state.collision = False
 
-    DIVERS = len(divers)
+    state.divers = len(divers)
 
     if player.y == 45:
-        if COLLECTED == 6:
+        if state.collected == 6:
             reward += 100
-            COLLECTED = 0
-        elif COLLECTED > 0:
-            COLLECTED -= 1
-            if LOW_OXYGEN:
-                LOW_OXYGEN = False
+            state.collected = 0
+        elif state.collected > 0:
+            state.collected -= 1
+            if state.low_oxygen:
+                state.low_oxygen = False
                 reward += 5
             else:
                 reward += 0
 
     if oxygen_bar and oxygen_bar.value <= 20 and player.y != 45:
-        LOW_OXYGEN = True
+        state.low_oxygen = True
 
     return reward
@@ -1,10 +1,11 @@
 from ocatari.ram.skiing import *
 
-REWARD = 32
+# initial per env state, see HackAtari.reward_state
+REWARD_STATE = {"score": 32}
 
 
 def reward_function_old(self) -> float:
-    global REWARD
+    state = self.reward_state
     ram = self.get_ram()
     speed = ram[14] * 0.01
     score = ram[107]
@@ -13,23 +14,23 @@ def reward_function_old(self) -> float:
     else:
         reward = speed
 
-    if score != REWARD:
+    if score != state.score:
         reward += 100000
 
-    REWARD = ram[107]
+    state.score = ram[107]
     return reward
 
 
 def reward_function(self) -> float:
-    global REWARD
+    state = self.reward_state
     ram = self.get_ram()
     orientation = -abs(8-ram[15])*0.5
     speed = ram[14]*.01
     score = ram[107]
     reward = orientation+speed
 
-    if score != REWARD:
+    if score != state.score:
         reward += 100000
 
-    REWARD = ram[107]
+    state.score = ram[107]
     return reward
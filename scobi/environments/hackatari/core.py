@@ -3,11 +3,13 @@ from scobi.environments.hackatari.ale_mods import (
     ALEInpainting,
     assert_colorswaps,
 )
+import copy
 import random
 import numpy as np
 import pygame
 import importlib
 import sys
+from types import SimpleNamespace
 from ocatari.core import OCAtari
 import warnings
 import cv2
@@ -47,6 +49,11 @@ GameList = [
 ]
 
 
+def _init_state(module, name):
+    # fresh per env copy of the initial state a game or reward module declares (e.g. MOD_STATE = {"cars_color": 0})
+    return SimpleNamespace(**copy.deepcopy(getattr(module, name, {})))
+
+
 class HackAtari(OCAtari):
     """
     HackAtari provides variation of Atari Learning Environments.
@@ -88,11 +95,17 @@ class HackAtari(OCAtari):
             print("Available games: ", GameList)
             # _modif_funcs = lambda x, y: ([], [])
             self._modif_funcs = lambda x, y: ([], [])
+            game_module = None
         else:
-            self._modif_funcs = importlib.import_module(
+            game_module = importlib.import_module(
                 f"scobi.environments.hackatari.games.{game.lower()}"
-            )._modif_funcs
+            )
+            self._modif_funcs = game_module._modif_funcs
 
+        # state of the modifications and the random stream they draw from are kept per env (not in module globals),
+        # so several envs can run in one process. the stream is reseeded by reset(seed=...)
+        self.mod_state = _init_state(game_module, "MOD_STATE")
+        self.rng = random.Random()
         self.step_modifs, self.reset_modifs, self.post_detection_modifs = [], [], []
         self.inpaintings, self.place_above = [], []
         self._modif_funcs(self, modifs)
@@ -131,6 +144,7 @@ class HackAtari(OCAtari):
             sys.modules["reward_function"] = module
             spec.loader.exec_module(module)
             self.new_reward_func = module.reward_function
+            self.reward_state = _init_state(module, "REWARD_STATE")
             self._hack_step = self.step
             self.step = self._step_with_lm_reward
 
@@ -208,7 +222,12 @@ class HackAtari(OCAtari):
 
         return obs, total_reward, terminated, truncated, info
 
+    def _seed_modifs(self, kwargs):
+        if kwargs.get("seed") is not None:
+            self.rng.seed(kwargs["seed"])
+
     def _alter_reset(self, *args, **kwargs):
+        self._seed_modifs(kwargs)
         obs, info = super().reset(*args, **kwargs)
         self.org_reward = 0
         self.org_return = 0
@@ -225,7 +244,7 @@ class HackAtari(OCAtari):
         # print(self.step_modifs)
         frameskip = self._frameskip
         if frameskip == 0 or not frameskip:
-            frameskip = random.choice((2, 5))
+            frameskip = self.rng.choice((2, 5))
         total_reward = 0.0
         terminated = truncated = False
         for func in self.step_modifs:
@@ -255,6 +274,7 @@ class HackAtari(OCAtari):
     def _alter_reset_with_switch(self, *args, **kwargs):
         self.step_modifs, self.reset_modfis = [], []
         self._modif_funcs(self, self.modfis)
+        self._seed_modifs(kwargs)
         obs, info = super().reset(*args, **kwargs)
         self.org_reward = 0
         self.org_return = 0
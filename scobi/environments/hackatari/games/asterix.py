@@ -1,4 +1,5 @@
-SPEED = 0
+# initial per env state, see HackAtari.mod_state
+MOD_STATE = {"speed": 0}
 
 
 def obelix(self):
@@ -6,8 +7,7 @@ def obelix(self):
 
 
 def set_speed(self):
-    global SPEED
-    ram = self.set_ram(54, SPEED)
+    ram = self.set_ram(54, self.mod_state.speed)
 
 
 def unlimited_lives(self):
@@ -27,14 +27,14 @@ def odd_lines_free(self):
 
 
 def _modif_funcs(env, modifs):
-    global SPEED
+    state = env.mod_state
     for mod in modifs:
         if mod == "obelix":
             env.step_modifs.append(obelix)
-            SPEED += 4
+            state.speed += 4
         elif mod.startswith("speed"):
             mod_n = int(mod[-1])
-            SPEED += 8 * mod_n
+            state.speed += 8 * mod_n
             env.step_modifs.append(set_speed)
         elif mod == "unlimited_lives":
             env.step_modifs.append(unlimited_lives)
@@ -1,9 +1,7 @@
-import random
-
 TYPES = [32, 64, 80]
-TYPE_STATE = [0, 0, 0, 0]
 
-SPEED = 2
+# initial per env state, see HackAtari.mod_state
+MOD_STATE = {"type_state": [0, 0, 0, 0], "speed": 2}
 
 
 def no_last_line(self):
@@ -32,10 +30,10 @@ def random_enemies(self):
     Randomly assigns enemy types, instead of following the standardized pattern.
     """
     ram = self.get_ram()
-    global TYPES, TYPE_STATE
+    state = self.mod_state
     for i in range(4):
-        if ram[79 + i] and ram[79 + i] < 81 and ram[79 + i] != TYPE_STATE[i]:
-            enemy = random.choice(TYPES)
+        if ram[79 + i] and ram[79 + i] < 81 and ram[79 + i] != state.type_state[i]:
+            enemy = self.rng.choice(TYPES)
             self.set_ram(79 + i, enemy)
             if enemy < 80:
                 if ram[75 + i] == 2:
@@ -47,7 +45,7 @@ def random_enemies(self):
                     self.set_ram(75 + i, 2)
                 elif ram[75 + i] == 255:
                     self.set_ram(75 + i, 254)
-    TYPE_STATE = ram[79:83]
+    state.type_state = ram[79:83]
 
 
 def speed_mode(self):
@@ -55,18 +53,18 @@ def speed_mode(self):
     Increases the speed of all enemy ships according to the mod argument.
     """
     ram = self.get_ram()
-    global SPEED
+    speed = self.mod_state.speed
     for i in range(4):
         if ram[79 + i] == 80:
             if ram[75 + i] & 128:
-                self.set_ram(75 + i, 255 - SPEED)
+                self.set_ram(75 + i, 255 - speed)
             elif ram[75 + i] > 0:
-                self.set_ram(75 + i, 1 + SPEED)
+                self.set_ram(75 + i, 1 + speed)
         else:
             if ram[75 + i] & 128:
-                self.set_ram(75 + i, 256 - SPEED)
+                self.set_ram(75 + i, 256 - speed)
             elif ram[75 + i] > 0:
-                self.set_ram(75 + i, SPEED)
+                self.set_ram(75 + i, speed)
 
 
 def _modif_funcs(env, modifs):
@@ -83,8 +81,7 @@ def _modif_funcs(env, modifs):
                 mod_n = int(mod[-1])
                 if mod_n < 2 or mod_n > 10:
                     raise ValueError("Invalid value, choose speed value 2-10")
-                global SPEED
-                SPEED = mod_n
+                env.mod_state.speed = mod_n
             elif mod[-1] == "e":
                 pass
             else:
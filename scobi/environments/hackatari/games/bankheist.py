@@ -1,10 +1,5 @@
-import random
-
-TOWNS_VISITED = []
-REMAINING_TOWNS = [i for i in range(256)]
-random.shuffle(REMAINING_TOWNS)
-CURRENT_TOWN = 0
-PLAYER_X = 0
+# initial per env state, see HackAtari.mod_state. the remaining towns are shuffled by random_city_res on reset
+MOD_STATE = {"towns_visited": [], "remaining_towns": [i for i in range(256)], "current_town": 0, "player_x": 0}
 
 
 def unlimited_gas(self):
@@ -38,16 +33,16 @@ def random_city(self):
     """
     Randomizes which city is entered next.
     """
-    global TOWNS_VISITED, REMAINING_TOWNS, CURRENT_TOWN
+    state = self.mod_state
     ram = self.get_ram()
     city = ram[0]
-    if city == CURRENT_TOWN + 1:  # arrived to new city
-        picked_city = REMAINING_TOWNS.pop(0)
-        CURRENT_TOWN = picked_city
-        if len(REMAINING_TOWNS) == 0:  # reset
-            REMAINING_TOWNS = [i for i in range(256)]
-            random.shuffle(REMAINING_TOWNS)
-        TOWNS_VISITED.append(picked_city)
+    if city == state.current_town + 1:  # arrived to new city
+        picked_city = state.remaining_towns.pop(0)
+        state.current_town = picked_city
+        if len(state.remaining_towns) == 0:  # reset
+            state.remaining_towns = [i for i in range(256)]
+            self.rng.shuffle(state.remaining_towns)
+        state.towns_visited.append(picked_city)
         self.set_ram(0, picked_city)
 
 
@@ -55,13 +50,13 @@ def random_city_res(self):
     """
     Resets the city randomizer.
     """
-    global TOWNS_VISITED, REMAINING_TOWNS, CURRENT_TOWN
+    state = self.mod_state
     ram = self.get_ram()
-    REMAINING_TOWNS = [i for i in range(256)]
-    random.shuffle(REMAINING_TOWNS)
-    picked_city = REMAINING_TOWNS.pop(0)
-    CURRENT_TOWN = picked_city
-    TOWNS_VISITED.append(picked_city)
+    state.remaining_towns = [i for i in range(256)]
+    self.rng.shuffle(state.remaining_towns)
+    picked_city = state.remaining_towns.pop(0)
+    state.current_town = picked_city
+    state.towns_visited.append(picked_city)
     self.set_ram(0, picked_city)
 
 
@@ -69,18 +64,18 @@ def revisit_city(self):
     """
     Allows player to go back one city.
     """
-    global PLAYER_X, CURRENT_TOWN
+    state = self.mod_state
     ram = self.get_ram()
-    if 16 > PLAYER_X and ram[28] > 120:
-        PLAYER_X = 0
-        if CURRENT_TOWN == 0:
-            CURRENT_TOWN = 255
+    if 16 > state.player_x and ram[28] > 120:
+        state.player_x = 0
+        if state.current_town == 0:
+            state.current_town = 255
         else:
-            CURRENT_TOWN = CURRENT_TOWN - 1
-        self.set_ram(0, CURRENT_TOWN)
+            state.current_town = state.current_town - 1
+        self.set_ram(0, state.current_town)
     else:
-        CURRENT_TOWN = ram[0]
-    PLAYER_X = ram[28]
+        state.current_town = ram[0]
+    state.player_x = ram[28]
 
 
 def _modif_funcs(env, modifs):
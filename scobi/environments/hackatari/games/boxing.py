@@ -1,11 +1,12 @@
-import random
 
-TIMER = 0
-global GRAVITY
-GRAVITY = 3
-PLAYER_COLOR = 0  # Black, Red, Blue, Green
-ENEMY_COLOR = 0  # White, Red, Blue, Green
-ONCE = 0
+# initial per env state, see HackAtari.mod_state
+MOD_STATE = {
+    "timer": 0,
+    "gravity": 3,
+    "player_color": 0,  # Black, Red, Blue, Green
+    "enemy_color": 0,  # White, Red, Blue, Green
+    "once": 0,
+}
 
 colors = [0, 12, 48, 113, 200]
 
@@ -22,13 +23,12 @@ def gravity(self):
     gravity_boxing: Increase the value in RAM cell 34 until reaching a certain threshold
     """
     curr_player_pos = self.get_ram()[34]
-    global TIMER
+    state = self.mod_state
     if curr_player_pos < 87:
-        global GRAVITY
-        if not TIMER % GRAVITY:
+        if not state.timer % state.gravity:
             curr_player_pos += 1
             self.set_ram(34, curr_player_pos)
-    TIMER += 1
+    state.timer += 1
 
     # if TOGGLE_HUMAN_MODE:
     #     if curr_player_pos < 87 and not (pygame.K_w in list(self.current_keys_down)):
@@ -88,7 +88,7 @@ def drunken_boxing(self):
     """
     Applies random movements to the players input
     """
-    r = random.randint(0, 1)
+    r = self.rng.randint(0, 1)
     if r == 0:
         # Add a counter variable to keep track of the function calls
         self.counter = getattr(self, "counter", 0)
@@ -96,7 +96,7 @@ def drunken_boxing(self):
         # Increment the counter for the next function call
         self.counter += 1
     else:
-        do = random.randint(0, 3)
+        do = self.rng.randint(0, 3)
 
     # Call functions in sequence based on the counter value
     if do == 0:
@@ -113,42 +113,40 @@ def color_player(self):
     """
     Changes the color of the player to [Black, White, Red, Blue, Green] by choosing a value 0-4
     """
-    self.set_ram(1, colors[PLAYER_COLOR])
+    self.set_ram(1, colors[self.mod_state.player_color])
 
 
 def color_enemy(self):
     """
     Changes the color of the enemy to [Black, White, Red, Blue, Green] by choosing a value 0-4
     """
-    self.set_ram(2, colors[ENEMY_COLOR])
+    self.set_ram(2, colors[self.mod_state.enemy_color])
 
 
 def switch_positions(self):
     """
     Switches the position of player and enemy
     """
-    global ONCE
-    if ONCE:
+    state = self.mod_state
+    if state.once:
         self.set_ram(33, 30)
         self.set_ram(35, 4)
         # 109, 87
         self.set_ram(32, 105)
         self.set_ram(34, 85)
-        ONCE -= 1
+        state.once -= 1
 
 
 def reset_onc(self):
-    global ONCE
-    ONCE = 2
+    self.mod_state.once = 2
 
 
 def _modif_funcs(env, modifs):
     for mod in modifs:
         if mod.startswith("gravity"):
             if mod[-1].isdigit():
-                global GRAVITY
-                GRAVITY = 7 - int(mod[-1])
-                assert 1 < GRAVITY < 7, "Invalid Gravity lelvel, choose number 1-5"
+                env.mod_state.gravity = 7 - int(mod[-1])
+                assert 1 < env.mod_state.gravity < 7, "Invalid Gravity lelvel, choose number 1-5"
             env.step_modifs.append(gravity)
         elif mod == "one_armed":
             env.step_modifs.append(one_armed)
@@ -167,8 +165,7 @@ def _modif_funcs(env, modifs):
                 raise ValueError(
                     "Append value 0-3 [black, red, blue, green] to your color mod-argument"
                 )
-            global PLAYER_COLOR
-            PLAYER_COLOR = mod_n
+            env.mod_state.player_color = mod_n
             env.step_modifs.append(color_player)
         elif mod.startswith("color_e"):
             if mod[-1].isdigit():
@@ -181,8 +178,7 @@ def _modif_funcs(env, modifs):
                 raise ValueError(
                     "Append value 0-3 [white, red, blue, green] to your color mod-argument"
                 )
-            global ENEMY_COLOR
-            ENEMY_COLOR = mod_n
+            env.mod_state.enemy_color = mod_n
             env.step_modifs.append(color_enemy)
         elif mod.startswith("switch_p"):
             env.step_modifs.append(switch_positions)
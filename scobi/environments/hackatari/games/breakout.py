@@ -1,9 +1,11 @@
-STRENGTH = 2  # How strong is the drift
-global TIMER
-TIMER = 0
-PLAYER_COLOR = 0  # Black, White, Red, Blue, Green
-BLOCK_COLOR = 0  # Black, White, Red, Blue, Green
-ROW_COLORS = [None] * 6
+# initial per env state, see HackAtari.mod_state
+MOD_STATE = {
+    "strength": 2,  # How strong is the drift
+    "timer": 0,
+    "player_color": 0,  # Black, White, Red, Blue, Green
+    "block_color": 0,  # Black, White, Red, Blue, Green
+    "row_colors": [None] * 6,
+}
 
 colors = [0, 12, 48, 113, 200]
 
@@ -14,17 +16,17 @@ def right_drift(self):
     """
     ball_x = self.get_ram()[99]
     ball_y = self.get_ram()[101]
-    new_ball_pos = ball_x + STRENGTH
+    state = self.mod_state
+    new_ball_pos = ball_x + state.strength
 
-    global TIMER
     # else the ball isnt there at all or outside of the walls
     if (
         (ball_y + 9 <= 196 and new_ball_pos != 0)
         and 57 <= new_ball_pos <= 199
-        and not TIMER % 10
+        and not state.timer % 10
     ):
         self.set_ram(99, new_ball_pos)
-    TIMER += 1
+    state.timer += 1
 
 
 def left_drift(self):
@@ -33,17 +35,17 @@ def left_drift(self):
     """
     ball_x = self.get_ram()[99]
     ball_y = self.get_ram()[101]
-    new_ball_pos = ball_x - STRENGTH
+    state = self.mod_state
+    new_ball_pos = ball_x - state.strength
 
-    global TIMER
     # else the ball isnt there at all or outside of the walls
     if (
         (ball_y + 9 <= 196 and new_ball_pos != 0)
         and 57 <= new_ball_pos <= 199
-        and not TIMER % 10
+        and not state.timer % 10
     ):
         self.set_ram(99, new_ball_pos)
-    TIMER += 1
+    state.timer += 1
 
 
 def gravity(self):
@@ -52,13 +54,13 @@ def gravity(self):
     """
     # ball_x = self.get_ram()[99]
     ball_y = self.get_ram()[101]
-    new_ball_pos = ball_y + STRENGTH
+    state = self.mod_state
+    new_ball_pos = ball_y + state.strength
 
-    global TIMER
     # else the ball isnt there at all or outside of the walls
-    if 90 <= new_ball_pos <= 165 and not TIMER % 10:
+    if 90 <= new_ball_pos <= 165 and not state.timer % 10:
         self.set_ram(101, new_ball_pos)
-    TIMER += 1
+    state.timer += 1
 
 
 def inverse_gravity(self):
@@ -67,20 +69,20 @@ def inverse_gravity(self):
     """
     # ball_x = self.get_ram()[99]
     ball_y = self.get_ram()[101]
-    new_ball_pos = ball_y - STRENGTH
+    state = self.mod_state
+    new_ball_pos = ball_y - state.strength
 
-    global TIMER
     # else the ball isnt there at all or outside of the walls
-    if 90 <= new_ball_pos <= 180 and not TIMER % 10:
+    if 90 <= new_ball_pos <= 180 and not state.timer % 10:
         self.set_ram(101, new_ball_pos)
-    TIMER += 1
+    state.timer += 1
 
 
 def color_player(self):
     """
     Changes the color of the player to [Black, White, Red, Blue, Green] by choosing a value 0-4
     """
-    self.set_ram(62, colors[PLAYER_COLOR])
+    self.set_ram(62, colors[self.mod_state.player_color])
 
 
 # 64-69 block colors
@@ -89,24 +91,24 @@ def color_block(self):
     Changes the color of all blocks to [Black, White, Red, Blue, Green] by choosing a value 0-4
     """
     for i in range(64, 70):
-        self.set_ram(i, colors[BLOCK_COLOR])
+        self.set_ram(i, colors[self.mod_state.block_color])
 
 
 def color_rows(self):
     """
     Changes the color of the specified block rows to [Black, White, Red, Blue, Green] by choosing a value 0-5 to specify which row to color and 0-4 to specify its color
     """
+    row_colors = self.mod_state.row_colors
     for i in range(6):
-        if ROW_COLORS[i] is not None:
-            self.set_ram(64 + i, ROW_COLORS[i])
+        if row_colors[i] is not None:
+            self.set_ram(64 + i, row_colors[i])
 
 
 def _modif_funcs(env, modifs):
     for mod in modifs:
         if mod.startswith("s"):
-            global STRENGTH
             mod_n = int(mod[-1])
-            STRENGTH = mod_n
+            env.mod_state.strength = mod_n
         elif mod.startswith("d"):
             if mod[-1] == "r":
                 env.step_modifs.append(right_drift)
@@ -129,8 +131,7 @@ def _modif_funcs(env, modifs):
                 raise ValueError(
                     "Append value 0-4 [black, white, red, blue, green] to your color mod-argument"
                 )
-            global PLAYER_COLOR
-            PLAYER_COLOR = mod_n
+            env.mod_state.player_color = mod_n
             env.step_modifs.append(color_player)
         elif mod.startswith("color_b"):
             if mod[-1].isdigit():
@@ -143,8 +144,7 @@ def _modif_funcs(env, modifs):
                 raise ValueError(
                     "Append value 0-4 [black, white, red, blue, green] to your color mod-argument"
                 )
-            global BLOCK_COLOR
-            BLOCK_COLOR = mod_n
+            env.mod_state.block_color = mod_n
             env.step_modifs.append(color_block)
         elif mod.startswith("color_r"):
             has_value = False
@@ -158,7 +158,7 @@ def _modif_funcs(env, modifs):
                                           \n'color_r01-54' == 'color_r0154' and color values 0-4 [black, white, red, blue, green]"
                         )
                     else:
-                        ROW_COLORS[mod_r] = colors[mod_v]
+                        env.mod_state.row_colors[mod_r] = colors[mod_v]
                         has_value = True
                         i += 1
             if not has_value:
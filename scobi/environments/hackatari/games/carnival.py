@@ -1,4 +1,5 @@
-MISSILE_SPEED_INCREASE = 0
+# initial per env state, see HackAtari.mod_state
+MOD_STATE = {"missile_speed_increase": 0}
 
 
 def no_flying_ducks(self):
@@ -27,7 +28,7 @@ def fast_missiles(self):
 
     # ensures there is a missile in the game
     if missile_y >= 5:
-        self.set_ram(55, missile_y - MISSILE_SPEED_INCREASE)
+        self.set_ram(55, missile_y - self.mod_state.missile_speed_increase)
 
 
 def _modif_funcs(env, modifs):
@@ -45,8 +46,7 @@ def _modif_funcs(env, modifs):
             else:
                 raise ValueError(
                     "Append value 1-3 to your fast_missiles mod-argument")
-            global MISSILE_SPEED_INCREASE
-            MISSILE_SPEED_INCREASE = mod_n
+            env.mod_state.missile_speed_increase = mod_n
             env.step_modifs.append(fast_missiles)
         else:
             print("Invalid modification")
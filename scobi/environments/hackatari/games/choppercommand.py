@@ -1,6 +1,5 @@
-global count
-count = 100
-COLOR = 0
+# initial per env state, see HackAtari.mod_state
+MOD_STATE = {"count": 100, "color": 0}
 
 colors = [38, 40, 23, 86, 48]
 
@@ -9,15 +8,15 @@ def delay_shots(self):
     """
     Puts time delay between shots
     """
-    global count
-    if count == 100 and (self._get_action() == 1 or self._get_action() >= 10):
-        count = 0
-    elif 25 < count < 100:
+    state = self.mod_state
+    if state.count == 100 and (self._get_action() == 1 or self._get_action() >= 10):
+        state.count = 0
+    elif 25 < state.count < 100:
         for ram_n in [49, 52, 55, 58, 61, 64]:
             self.set_ram(ram_n, 0)
         self.set_ram(45, 0)
-    if count < 100:
-        count += 1
+    if state.count < 100:
+        state.count += 1
 
 
 def no_enemies(self):
@@ -47,8 +46,7 @@ def color(self):
     """
     Changes the color of background to [Black, White, Red, Blue, Green] by choosing a value 0-4. This also affects the enemies colors
     """
-    global COLOR
-    self.set_ram(117, colors[COLOR])
+    self.set_ram(117, colors[self.mod_state.color])
 
 
 def _modif_funcs(env, modifs):
@@ -72,6 +70,5 @@ def _modif_funcs(env, modifs):
                 raise ValueError(
                     "Append value 0-4 [black, white, red, blue, green] to your color mod-argument"
                 )
-            global COLOR
-            COLOR = mod_n
+            env.mod_state.color = mod_n
             env.step_modifs.append(color)
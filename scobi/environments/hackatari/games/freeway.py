@@ -1,15 +1,14 @@
-import random
-
 color_map = {1: 0, 2: 2, 3: 66, 4: 15, 5: 210, 6: 120, 7: 145, 8: 6}
 
-CARS_COLOR = 0
+# initial per env state, see HackAtari.mod_state
+MOD_STATE = {"cars_color": 0}
 
 def modify_ram_for_color(self):
     """
     Modifies RAM for each car with the specified color.
     """
     for car in range(77, 87):
-        self.set_ram(car, CARS_COLOR)
+        self.set_ram(car, self.mod_state.cars_color)
 
 
 def modify_ram_for_default(self):
@@ -30,14 +29,14 @@ def set_ram_value(self, address, value):
     self.set_ram(address, ram[address])
 
 
-def custom_biased_random(option_a, option_b, probability_a):
+def custom_biased_random(rng, option_a, option_b, probability_a):
     """
     This function generates a random selection between two options (a and b) with a user-defined
     probability for option a.
     """
     choices = [option_a, option_b]
     weights = [probability_a, 1 - probability_a]
-    result = random.choices(choices, weights=weights, k=1)[0]
+    result = rng.choices(choices, weights=weights, k=1)[0]
     return result
 
 
@@ -46,8 +45,8 @@ def handle_car_stop_mode_1(self):
     Handles random car stop mode 1.
     """
     # Get a random counter value and a random car position
-    counter = custom_biased_random(0, 3, 0.9)
-    random_car = random.randint(33, 42)
+    counter = custom_biased_random(self.rng, 0, 3, 0.9)
+    random_car = self.rng.randint(33, 42)
     # Set RAM value to 100 if counter is greater than 0, else set to 0
     if counter > 0:
         set_ram_value(self, random_car, 100)
@@ -60,7 +59,7 @@ def handle_car_stop_mode_2(self):
     Handles random car stop mode 2.
     """
     # Get a random value for all cars and modify RAM accordingly
-    car_all = custom_biased_random(0, 1, 0.4)
+    car_all = custom_biased_random(self.rng, 0, 1, 0.4)
     for car_pos in range(33, 43):
         if car_all > 0:
             set_ram_value(self, car_pos, 100)
@@ -84,14 +83,14 @@ def handle_car_stop_mode_3(self):
 def handle_car_stop_mode_4(self):
     ram = self.get_ram()
     for i in range(5):
-        if random.randrange(0, 10) < 3:
+        if self.rng.randrange(0, 10) < 3:
             set_ram_value(self, 112-i, ram[112-i]+4)
-        elif  random.randrange(0, 10) < 6:
+        elif  self.rng.randrange(0, 10) < 6:
             set_ram_value(self, 112-i, ram[112-i]-1)
     for i in range(5):
-        if  random.randrange(0, 10) < 3:
+        if  self.rng.randrange(0, 10) < 3:
             set_ram_value(self, 117-i, max(0, ram[117-i]-3))
-        elif  random.randrange(0, 10) < 6:
+        elif  self.rng.randrange(0, 10) < 6:
             set_ram_value(self, 117-i, max(0, ram[117-i]+1))
 
 def _modif_funcs(env, modifs):
@@ -110,6 +109,5 @@ def _modif_funcs(env, modifs):
                 raise ValueError("Invalid modification number")
         elif mod.startswith("c"):
             mod_n = int(mod[-1])
-            global CARS_COLOR
-            CARS_COLOR = color_map.get(mod_n, 256)
+            env.mod_state.cars_color = color_map.get(mod_n, 256)
             env.step_modifs.append(modify_ram_for_color)
@@ -1,14 +1,17 @@
-ICE_COLOR = 0  # Black, Red, Blue, Green
-UI_COLOR = 0  # New color for the UI (Int: 000-255)
-LINE = [
-    False,
-    False,
-    False,
-    False,
-]  # Which lines are recolored, multiple line commands are possible (Int: 0-3)
-# Define the numbers of enemies to occur per line (Int: 0-3)
-ENEMIES_NUMBER = 0
-NEW_X_POS = 0  # New startposition of ice shelves (Int: 0-255)
+# initial per env state, see HackAtari.mod_state
+MOD_STATE = {
+    "ice_color": 0,  # Black, Red, Blue, Green
+    "ui_color": 0,  # New color for the UI (Int: 000-255)
+    "line": [
+        False,
+        False,
+        False,
+        False,
+    ],  # Which lines are recolored, multiple line commands are possible (Int: 0-3)
+    # Define the numbers of enemies to occur per line (Int: 0-3)
+    "enemies_number": 0,
+    "new_x_pos": 0,  # New startposition of ice shelves (Int: 0-255)
+}
 
 colors = [0, 48, 113, 200]
 """
@@ -20,58 +23,61 @@ def modify_ram_for_color(self):
     """
     Adjusts the colors of the ice floes bases on the specified values.
     """
-    if LINE[3]:
-        self.set_ram(43, colors[ICE_COLOR])
-    if LINE[2]:
-        self.set_ram(44, colors[ICE_COLOR])
-    if LINE[1]:
-        self.set_ram(45, colors[ICE_COLOR])
-    if LINE[0]:
-        self.set_ram(46, colors[ICE_COLOR])
+    state = self.mod_state
+    if state.line[3]:
+        self.set_ram(43, colors[state.ice_color])
+    if state.line[2]:
+        self.set_ram(44, colors[state.ice_color])
+    if state.line[1]:
+        self.set_ram(45, colors[state.ice_color])
+    if state.line[0]:
+        self.set_ram(46, colors[state.ice_color])
 
 
 def modify_ram_for_uicolor(self):
     """
     Adjusts the colors of the ui bases on the specified values.
     """
-    self.set_ram(71, UI_COLOR)
+    self.set_ram(71, self.mod_state.ui_color)
 
 
 def modify_ram_for_floes_position(self):
     """
     Adjusts the memory based on the specified new position of the ice floes.
     """
+    new_x_pos = self.mod_state.new_x_pos
     self.set_ram(22, 0)
-    self.set_ram(31, NEW_X_POS)
-    self.set_ram(32, NEW_X_POS)
-    self.set_ram(33, NEW_X_POS)
-    self.set_ram(34, NEW_X_POS)
+    self.set_ram(31, new_x_pos)
+    self.set_ram(32, new_x_pos)
+    self.set_ram(33, new_x_pos)
+    self.set_ram(34, new_x_pos)
 
 
 def modify_ram_for_enemy_amount(self):
     """
     Adjusts the memory based on the specified number of enemies selected by the user.
     """
-    if ENEMIES_NUMBER > 0:
+    enemies_number = self.mod_state.enemies_number
+    if enemies_number > 0:
         # enemies number 1: easy mode with 0 enemies
-        if ENEMIES_NUMBER == 1:
+        if enemies_number == 1:
             value = 0
         # enemies number 2: medium mode with 8 enemies
-        elif ENEMIES_NUMBER == 2:
+        elif enemies_number == 2:
             value = 5
         # enemies number 3: medium mode with 12 enemies
-        elif ENEMIES_NUMBER == 3:
+        elif enemies_number == 3:
             value = 15
         for rows in range(92, 96):
             self.set_ram(rows, value)
 
 
 def random_color(self):
-    global ICE_COLOR
-    self.set_ram(43, ICE_COLOR)
-    self.set_ram(44, ICE_COLOR)
-    self.set_ram(45, ICE_COLOR)
-    self.set_ram(46, ICE_COLOR)
+    ice_color = self.mod_state.ice_color
+    self.set_ram(43, ice_color)
+    self.set_ram(44, ice_color)
+    self.set_ram(45, ice_color)
+    self.set_ram(46, ice_color)
 
 
 def _modif_funcs(env, modifs):
@@ -87,15 +93,13 @@ def _modif_funcs(env, modifs):
                 raise ValueError(
                     "Append value 0-3 [black, red, blue, green] to your color mod-argument"
                 )
-            global ICE_COLOR
-            ICE_COLOR = mod_n
+            env.mod_state.ice_color = mod_n
             env.step_modifs.append(modify_ram_for_color)
         elif mod.startswith("line"):
             mod_n = int(mod[-1])
             if mod_n < 1 or mod_n > 4:
                 raise ValueError("Invalid color for ice, choose number 1-5")
-            global LINE
-            LINE[mod_n - 1] = True
+            env.mod_state.line[mod_n - 1] = True
             env.step_modifs.append(modify_ram_for_color)
         elif mod.startswith("ui_color"):
             if mod[-1].isdigit():
@@ -108,16 +112,14 @@ def _modif_funcs(env, modifs):
                 raise ValueError(
                     "Append value 0-3 [black, red, blue, green] to your ui_color mod-argument"
                 )
-            global UI_COLOR
-            UI_COLOR = mod_n
+            env.mod_state.ui_color = mod_n
             env.step_modifs.append(modify_ram_for_uicolor)
         elif mod.startswith("e"):
             mod_n = int(mod[-1])
             if mod_n < 0 or mod_n > 3:
                 raise ValueError(
                     "Invalid number of enenmies, choose number 0-3")
-            global ENEMIES_NUMBER
-            ENEMIES_NUMBER = mod_n
+            env.mod_state.enemies_number = mod_n
             env.step_modifs.append(modify_ram_for_enemy_amount)
         elif mod.startswith("f"):
             for i in range(3):
@@ -127,8 +129,7 @@ def _modif_funcs(env, modifs):
             if mod_n < 0 or mod_n > 160:
                 raise ValueError(
                     "Invalid position for floes, max. value is 160")
-            global NEW_X_POS
-            NEW_X_POS = mod_n
+            env.mod_state.new_x_pos = mod_n
             env.step_modifs.append(modify_ram_for_floes_position)
 
 
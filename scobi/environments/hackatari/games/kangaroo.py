@@ -1,4 +1,3 @@
-import random
 import numpy as np
 from ocatari.ram.kangaroo import Ladder
 
@@ -7,7 +6,6 @@ from ocatari.ram.kangaroo import Ladder
 KANGAROO_POS_X_INDEX = 17  # RAM index for kangaroo's X position
 KANGAROO_POS_Y_INDEX = 16  # RAM index for kangaroo's Y position
 LEVEL_2 = 2
-FLOOR = 0
 
 # Starting positions based on different conditions
 FLOOR_1_LEVEL2_POS = (25, 10)
@@ -16,14 +14,16 @@ FLOOR_1_START_POS = (65, 12)
 FLOOR_2_START_POS = (65, 6)
 ANY_FLOOR_INSTANT_WIN = (110, 0)
 
-VIRTUAL_RAM_19 = 0
-LADDER_X = None
-KANGAROO_Y = 18
-START = False
-CLIMBING_VIRTUAL_RAM = 39
-
-ADDED_LADDERS_POSES = None
-LVL_NUM = None
+# initial per env state, see HackAtari.mod_state
+MOD_STATE = {
+    "floor": 0,
+    "lvl_num": None,
+    "added_ladders_poses": None,
+    "virtual_ram_19": 0,
+    "ladder_x": None,
+    "kangaroo_y": 18,
+    "climbing_virtual_ram": 39,
+}
 
 
 def disable_monkeys(self):
@@ -111,13 +111,13 @@ def set_kangaroo_position(self):
     current_level = ram[36]
     kangaroo_pos = (ram[KANGAROO_POS_X_INDEX], ram[KANGAROO_POS_Y_INDEX])
     if is_at_start(kangaroo_pos):
-        if FLOOR == 1:
+        if self.mod_state.floor == 1:
             # For floor 1, position depends on whether the current level is 2
             new_pos = (
                 FLOOR_1_LEVEL2_POS if current_level == LEVEL_2 else FLOOR_1_START_POS
             )
             set_ram_kang_pos(self, *new_pos)
-        elif FLOOR == 2:
+        elif self.mod_state.floor == 2:
             # For floor 2, position is set to a different location
             # but also depends on the current level
             new_pos = (
@@ -134,7 +134,7 @@ def random_init(self):
     current_level = ram[36]
     kangaroo_pos = (ram[KANGAROO_POS_X_INDEX], ram[KANGAROO_POS_Y_INDEX])
     if is_at_start(kangaroo_pos):
-        random_number = random.randint(0, 2)
+        random_number = self.rng.randint(0, 2)
         if random_number == 1:
             # For floor 1, position depends on whether the current level is 2
             new_pos = (
@@ -156,11 +156,11 @@ def change_level(self):
     """
     Changes the level according to the argument number 0-2. If not specified, selcts random level.
     """
-    global LVL_NUM
-    if LVL_NUM is None:
-        LVL_NUM = random.randint(0, 3)
-        print(f"Selcting Random Level {LVL_NUM}")
-    self.set_ram(36, LVL_NUM)
+    state = self.mod_state
+    if state.lvl_num is None:
+        state.lvl_num = self.rng.randint(0, 3)
+        print(f"Selcting Random Level {state.lvl_num}")
+    self.set_ram(36, state.lvl_num)
 
 
 def remove_original_ladder_inpaintings():
@@ -206,54 +206,53 @@ def added_ladder_step(self):
     py = y_pos + 24  # feet position
     if ram[18] in [20, 28]:
         py -= 8  # ducking
-    global VIRTUAL_RAM_19, LADDER_X, KANGAROO_Y, START
-    if _on_ladder(x_pos, py - 1, ADDED_LADDERS_POSES):
-        global CLIMBING_VIRTUAL_RAM
-        if LADDER_X is not None and ram[114] not in [21, 15, 9]:
-            self.set_ram(17, LADDER_X)
-        if ram[16] < KANGAROO_Y:  # climbing up
+    state = self.mod_state
+    if _on_ladder(x_pos, py - 1, state.added_ladders_poses):
+        if state.ladder_x is not None and ram[114] not in [21, 15, 9]:
+            self.set_ram(17, state.ladder_x)
+        if ram[16] < state.kangaroo_y:  # climbing up
             print("Climbing Up")
             if ram[18] & 64:
                 self.set_ram(18, ram[18] & (not 64) | 32)
-                self.set_ram(16, KANGAROO_Y)
+                self.set_ram(16, state.kangaroo_y)
             elif ram[16] < 19 and ram[16] & 1:
                 self.set_ram(18, 39)
             elif ram[16] < 19:
                 self.set_ram(18, 47)
-            if VIRTUAL_RAM_19 > 0:
-                KANGAROO_Y -= 1
-                self.set_ram(16, KANGAROO_Y)
-                VIRTUAL_RAM_19 = 0
-                # if CLIMBING_VIRTUAL_RAM == 39:
-                #     CLIMBING_VIRTUAL_RAM = 47
+            if state.virtual_ram_19 > 0:
+                state.kangaroo_y -= 1
+                self.set_ram(16, state.kangaroo_y)
+                state.virtual_ram_19 = 0
+                # if state.climbing_virtual_ram == 39:
+                #     state.climbing_virtual_ram = 47
                 #     self.set_ram(18, 47)
-                # elif CLIMBING_VIRTUAL_RAM == 47:
-                #     CLIMBING_VIRTUAL_RAM = 39
+                # elif state.climbing_virtual_ram == 47:
+                #     state.climbing_virtual_ram = 39
                 #     self.set_ram(18, 39)
-            VIRTUAL_RAM_19 += 1
-        elif ram[16] > KANGAROO_Y and ram[114] not in [21, 15, 9]:  # climbing down
+            state.virtual_ram_19 += 1
+        elif ram[16] > state.kangaroo_y and ram[114] not in [21, 15, 9]:  # climbing down
             if ram[18] & 16:
                 self.set_ram(18, ram[18] & (not 16) | 32)
                 if ram[16] not in [18, 12, 6]:
-                    LADDER_X = ram[17]
+                    state.ladder_x = ram[17]
             elif ram[16] < 19 and ram[16] & 1:
                 self.set_ram(18, 39)
             elif ram[16] < 19:
                 self.set_ram(18, 47)
-            if VIRTUAL_RAM_19 > 65:
-                self.set_ram(16, KANGAROO_Y + 1)
-                KANGAROO_Y += 1
-                VIRTUAL_RAM_19 = 0
-            VIRTUAL_RAM_19 += 1
-        elif ram[16] > KANGAROO_Y and ram[114] in [15, 9]:  # on platform
-            LADDER_X = ram[17]
+            if state.virtual_ram_19 > 65:
+                self.set_ram(16, state.kangaroo_y + 1)
+                state.kangaroo_y += 1
+                state.virtual_ram_19 = 0
+            state.virtual_ram_19 += 1
+        elif ram[16] > state.kangaroo_y and ram[114] in [15, 9]:  # on platform
+            state.ladder_x = ram[17]
             self.set_ram(18, ram[18] & (not 16))
-            VIRTUAL_RAM_19 = 0
-            KANGAROO_Y = ram[16]
+            state.virtual_ram_19 = 0
+            state.kangaroo_y = ram[16]
     else:
-        LADDER_X = None
-        VIRTUAL_RAM_19 = 0
-        KANGAROO_Y = ram[16]
+        state.ladder_x = None
+        state.virtual_ram_19 = 0
+        state.kangaroo_y = ram[16]
         # break
 
 
@@ -269,7 +268,7 @@ def moved_ladders(self):
     i = 0
     for obj in self._objects:
         if isinstance(obj, Ladder):
-            obj.xy = ADDED_LADDERS_POSES[i]
+            obj.xy = self.mod_state.added_ladders_poses[i]
             i += 1
 
 
@@ -314,17 +313,15 @@ def _modif_funcs(env, modifs):
             env.reset_modifs.append(random_init)
         elif "set_floor" in mod:
             if mod[-1].isdigit():
-                global FLOOR
-                FLOOR = int(mod[-1])
+                env.mod_state.floor = int(mod[-1])
             env.reset_modifs.append(set_kangaroo_position)
             env.step_modifs.append(set_kangaroo_position)
         # elif mod == "easy_mode":
         #     env.reset_modifs.append(easy_mode)
         elif "change_level" in mod:
             if mod[-1].isdigit():
-                global LVL_NUM
-                LVL_NUM = int(mod[-1])
-                assert LVL_NUM < 3, "Invalid Level Number (0, 1 or 2)"
+                env.mod_state.lvl_num = int(mod[-1])
+                assert env.mod_state.lvl_num < 3, "Invalid Level Number (0, 1 or 2)"
             env.step_modifs.append(change_level)
         elif mod == "no_ladder":
             assert (
@@ -339,12 +336,11 @@ def _modif_funcs(env, modifs):
             assert (
                 "change_level" not in modifs
             ), "Change level can't be used with invert_ladders"
-            global ADDED_LADDERS_POSES
-            # ADDED_LADDERS_POSES = [(80, 36), (85, 132), (90, 84)]
-            ADDED_LADDERS_POSES = [(80, 36), (80, 132), (100, 84)]
+            # env.mod_state.added_ladders_poses = [(80, 36), (85, 132), (90, 84)]
+            env.mod_state.added_ladders_poses = [(80, 36), (80, 132), (100, 84)]
             env.inpaintings = (
                 remove_original_ladder_inpaintings()
-                + add_ladders_inpaintings(ADDED_LADDERS_POSES)
+                + add_ladders_inpaintings(env.mod_state.added_ladders_poses)
             )
             env.step_modifs.extend((removed_ladder_step, added_ladder_step))
             env.place_above.extend(
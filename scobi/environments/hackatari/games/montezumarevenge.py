@@ -1,15 +1,8 @@
-import random
-
-NB_LIFES = 5
 poses = ((77, 235), (88, 192), (128, 192), (133, 148), (33, 148), (22, 192))
 BASE_DELAY = 108
 DELAY = BASE_DELAY
-DEAD = False
 
 COLORS = [0, 1, 2, 4, 6]
-COLOR_INDEX = 4
-
-LEVEL = 0
 
 # First list entey are is the item type (ram[49] for type, ram[50] for color), second list entry is the amount and space between items of the same type (ram[84])
 
@@ -40,6 +33,9 @@ ITEMS = [
     [1, 3],
 ]
 
+# initial per env state, see HackAtari.mod_state
+MOD_STATE = {"nb_lifes": 5, "dead": False, "color_index": 4, "level": 0, "items": ITEMS}
+
 
 # MAP = [             [0, 1, 2],
 #                 [3, 4, 5, 6, 7],
@@ -53,10 +49,9 @@ def random_position_start_res(self):
     """
     ram = self.get_ram()
     if ram[3] == 1:
-        global NB_LIFES
         ram = self.get_ram()
-        NB_LIFES = ram[58]
-        pos = random.choice(poses)
+        self.mod_state.nb_lifes = ram[58]
+        pos = self.rng.choice(poses)
         pos = poses[5]
         for i, ram_n in enumerate([42, 43]):
             self.set_ram(ram_n, pos[i])
@@ -65,25 +60,24 @@ def random_position_start_res(self):
 def random_position_start(self):
     ram = self.get_ram()
     if ram[3] == 1:
-        global NB_LIFES, DEAD
+        state = self.mod_state
         ram = self.get_ram()
-        if ram[58] == NB_LIFES - 1 or DEAD:  # life lost
-            DEAD = True
-        if DEAD:
+        if ram[58] == state.nb_lifes - 1 or state.dead:  # life lost
+            state.dead = True
+        if state.dead:
             if ram[2] == 4:
                 pos = poses[1]
-                NB_LIFES = ram[58]
+                state.nb_lifes = ram[58]
                 for i, ram_n in enumerate([42, 43]):
                     self.set_ram(ram_n, pos[i])
-                DEAD = False
+                state.dead = False
 
 
 def set_level(self):
     """
     Changes the level to a more difficult version. Level 0, 1, 2 are different versions, afterwards level%3 determines map layout.
     """
-    global LEVEL
-    self.set_ram(57, LEVEL)
+    self.set_ram(57, self.mod_state.level)
 
 
 def randomize_items(self):
@@ -92,32 +86,32 @@ def randomize_items(self):
     """
     item_rooms = [0, 5, 6, 7, 8, 10, 14, 19, 20, 23]
     randomized = item_rooms.copy()
-    random.shuffle(randomized)
+    self.rng.shuffle(randomized)
 
-    global ITEMS
-    new_items = ITEMS.copy()
+    state = self.mod_state
+    new_items = state.items.copy()
 
     j = 0
     for i in item_rooms:
-        new_items[i] = ITEMS[randomized[j]]
+        new_items[i] = state.items[randomized[j]]
         j += 1
-    ITEMS = new_items
+    state.items = new_items
 
 
 def change_items(self):
     # ram[49] for type, ram[50] for color, space between items of the same type ram[84]
     ram = self.get_ram()
 
-    global ITEMS
+    items = self.mod_state.items
     if ram[3] != 1 and ram[49] != 0:
-        item_type = ITEMS[ram[3]][0]
+        item_type = items[ram[3]][0]
         if item_type < 3:
             color = item_type
         else:
             color = 4
-        self.set_ram(49, ITEMS[ram[3]][0])
+        self.set_ram(49, items[ram[3]][0])
         self.set_ram(50, color)
-        self.set_ram(84, ITEMS[ram[3]][1])
+        self.set_ram(84, items[ram[3]][1])
 
 
 def full_inventory(self):
@@ -131,8 +125,7 @@ def unify_item_color(self):
     """
     All items are turned into the same color. [Black (Invisible), Orang (Ruby), White (Sword), Yellow (Key), Green (Snake)]
     """
-    global COLORS, COLOR_INDEX
-    self.set_ram(50, COLORS[COLOR_INDEX])
+    self.set_ram(50, COLORS[self.mod_state.color_index])
 
 
 def _modif_funcs(env, modifs):
@@ -141,9 +134,8 @@ def _modif_funcs(env, modifs):
             env.step_modifs.append(random_position_start)
             env.reset_modifs.append(random_position_start_res)
         elif mod.startswith("level"):
-            global LEVEL
             try:
-                LEVEL = int(mod[-1])
+                env.mod_state.level = int(mod[-1])
             except:
                 raise (
                     "Append a number 0-9 to the end of the mod-argument to choose the level"
@@ -165,8 +157,7 @@ def _modif_funcs(env, modifs):
                 raise ValueError(
                     "Append value 0-4 [Black (Invisible), Orang (Ruby), White (Sword), Yellow (Key), Green (Snake)] to your color mod-argument"
                 )
-            global COLOR_INDEX
-            COLOR_INDEX = mod_n
+            env.mod_state.color_index = mod_n
             env.step_modifs.append(unify_item_color)
         else:
             print("Invalid modification")
@@ -1,23 +1,23 @@
-from random import randint, choice
-
-# Global Variables
-TOGGLE_ORANGE = 0
-TOGGLE_CYAN = 0
-TOGGLE_PINK = 0
-TOGGLE_RED = 0
-NUMBER_POWER_PILLS = 4
-LAST_PP_STATUS = 4
-IS_INVERTED = False
-LVL_NUM = 0
-LIVES = 2
-COL = None
-LINE = None
+# initial per env state, see HackAtari.mod_state
+MOD_STATE = {
+    "toggle_orange": 0,
+    "toggle_cyan": 0,
+    "toggle_pink": 0,
+    "toggle_red": 0,
+    "number_power_pills": 4,
+    "last_pp_status": 4,
+    "is_inverted": False,
+    "lvl_num": 0,
+    "lives": 2,
+    "col": None,
+    "line": None,
+    "timer": 1,
+}
+
 COL_POS = [42, 67, 134]
 LINE_POS = [26, 74, 122]
 DOT_POS = [(0, 6), (5, 13), (12, 18)]
 
-TIMER = 1
-
 DOT_STATES = [
     59,
     60,
@@ -139,16 +139,17 @@ def static_ghosts(self):
     static_ghosts: Manipulates the RAM cell at position 6-9 and 12-15 to fix the position of
     the ghost inside the square in the middle of the screen.
     """
-    if TOGGLE_ORANGE:
+    state = self.mod_state
+    if state.toggle_orange:
         self.set_ram(6, 93)
         self.set_ram(12, 80)
-    if TOGGLE_CYAN:
+    if state.toggle_cyan:
         self.set_ram(7, 83)
         self.set_ram(13, 80)
-    if TOGGLE_PINK:
+    if state.toggle_pink:
         self.set_ram(8, 93)
         self.set_ram(14, 67)
-    if TOGGLE_RED:
+    if state.toggle_red:
         self.set_ram(9, 83)
         self.set_ram(15, 67)
 
@@ -161,20 +162,21 @@ def number_power_pills(self):
     is_at_start: a bool used as a switch to determine if the game was reset.
     current_lives: an integer used to store the current number of lives of Ms. Pacman
     """
+    state = self.mod_state
 
-    if NUMBER_POWER_PILLS == 0:  # no power pills
+    if state.number_power_pills == 0:  # no power pills
         self.set_ram(62, 80)
         self.set_ram(95, 80)
         self.set_ram(117, 0)
-    elif NUMBER_POWER_PILLS == 1:  # 1 power pill
+    elif state.number_power_pills == 1:  # 1 power pill
         self.set_ram(62, 64)
         self.set_ram(95, 80)
         self.set_ram(117, 8)
-    elif NUMBER_POWER_PILLS == 2:  # two power pills
+    elif state.number_power_pills == 2:  # two power pills
         self.set_ram(62, 0)
         self.set_ram(95, 80)
         self.set_ram(117, 40)
-    elif NUMBER_POWER_PILLS == 3:  # three power pills
+    elif state.number_power_pills == 3:  # three power pills
         self.set_ram(62, 0)
         self.set_ram(95, 64)
         self.set_ram(117, 46)
@@ -220,10 +222,10 @@ def edible_ghosts(self):
 
 
 def inverted_ms_pacman_reset(self):
+    state = self.mod_state
     set_start_condition(self)
-    global LAST_PP_STATUS, IS_INVERTED
-    LAST_PP_STATUS = 63
-    IS_INVERTED = False
+    state.last_pp_status = 63
+    state.is_inverted = False
 
 
 def inverted_ms_pacman(self):
@@ -244,7 +246,7 @@ def inverted_ms_pacman(self):
     current_pink: an integer used to store the current status of the pink ghost
     current_red: an integer used to store the current status of the red ghost
     """
-    global LAST_PP_STATUS, IS_INVERTED
+    state = self.mod_state
     current_pp_status = self.get_ram()[117]
     current_timer = self.get_ram()[116]
 
@@ -254,30 +256,30 @@ def inverted_ms_pacman(self):
     current_red = self.get_ram()[4]
 
     # check if timer needs to be adjusted
-    if current_timer < 250 and IS_INVERTED is False:
+    if current_timer < 250 and state.is_inverted is False:
         self.set_ram(116, 255)
 
     # check if a power pill has been eaten
     # a range is required because the values in the RAm cells fluctuate
-    if not ((LAST_PP_STATUS - 3) < current_pp_status < (LAST_PP_STATUS + 3)):
-        IS_INVERTED = True
+    if not ((state.last_pp_status - 3) < current_pp_status < (state.last_pp_status + 3)):
+        state.is_inverted = True
         inverted_power_pill(self)
-        LAST_PP_STATUS = current_pp_status
+        state.last_pp_status = current_pp_status
 
     # check if effect of power pill has run out
     if current_timer == 0:
-        IS_INVERTED = False  # disable switch
+        state.is_inverted = False  # disable switch
         power_pill_is_done(self)
 
     # check if a ghost has been eaten and if needed make them edible again
     # change start location to avoid glitches
-    if current_orange == 112 and not IS_INVERTED:
+    if current_orange == 112 and not state.is_inverted:
         make_edible(self, 1, 120, 6, 50, 12)
-    if current_cyan == 112 and not IS_INVERTED:
+    if current_cyan == 112 and not state.is_inverted:
         make_edible(self, 2, 100, 7, 50, 13)
-    if current_pink == 112 and not IS_INVERTED:
+    if current_pink == 112 and not state.is_inverted:
         make_edible(self, 3, 80, 8, 50, 14)
-    if current_red == 112 and not IS_INVERTED:
+    if current_red == 112 and not state.is_inverted:
         make_edible(self, 4, 60, 9, 50, 15)
 
 
@@ -285,29 +287,29 @@ def change_level(self):
     """
     Changes the level according to the argument number 0-3. If not specified, selcts random level.
     """
-    global LVL_NUM
-    if LVL_NUM is None:
-        LVL_NUM = randint(0, 3)
-        print(f"Selecting Random Level {LVL_NUM}")
-    self.set_ram(0, LVL_NUM)
+    state = self.mod_state
+    if state.lvl_num is None:
+        state.lvl_num = self.rng.randint(0, 3)
+        print(f"Selecting Random Level {state.lvl_num}")
+    self.set_ram(0, state.lvl_num)
 
 
 def end_game(self):
     """
     Only spawns a small cluster of pills. Simulates the end of a game.
     """
-    global DOT_STATES, DOT_PATTERN, GRID1
+    state = self.mod_state
 
     for i in range(59, 101):
         self.set_ram(i, 0)
     self.set_ram(117, 0)
     self.set_ram(119, 139)
-    self.set_ram(123, LIVES)
-    line = choice(range(0, 14))
-    dot = choice(range(0, 18))
+    self.set_ram(123, state.lives)
+    line = self.rng.choice(range(0, 14))
+    dot = self.rng.choice(range(0, 18))
     if not GRID1[line][dot]:
         while not GRID1[line][dot]:
-            dot = choice(range(0, 18))
+            dot = self.rng.choice(range(0, 18))
 
     dots = [(line, dot)]
     i = 0
@@ -345,6 +347,7 @@ def maze_man(self):
     After a pill has been collected, time will be added and a new pill will spawn.
     If the player collects 20 pills, the game goes into the next level.
     """
+    state = self.mod_state
     # makes red ghost invisible (is glitchy)
     self.set_ram(47, 0)
     # ram = self.get_ram()
@@ -435,49 +438,48 @@ def maze_man(self):
             self.set_ram(120, 144)
 
         # better choice alogorithm from endgame
-        line = choice(range(0, 14))
-        dot = choice(range(0, 18))
+        line = self.rng.choice(range(0, 14))
+        dot = self.rng.choice(range(0, 18))
         if not GRID1[line][dot]:
             while not GRID1[line][dot]:
-                dot = choice(range(0, 18))
+                dot = self.rng.choice(range(0, 18))
         pill = DOT_PATTERN[dot][0] + 3*line
         value = ram[pill] + DOT_PATTERN[dot][1]
         self.set_ram(pill, value)
 
     # change or reset level on success/failure
-    global LVL_NUM, TIMER, LIVES
     if ram[39] == 69:
         if ram[0] == 0 and ram[119] == 154:
-            LVL_NUM = 1
-            if LIVES < 3:
-                LIVES += 1
+            state.lvl_num = 1
+            if state.lives < 3:
+                state.lives += 1
             self.reset()
         elif ram[0] == 1 and ram[119] == 150:
-            LVL_NUM = 2
-            if LIVES < 3:
-                LIVES += 1
+            state.lvl_num = 2
+            if state.lives < 3:
+                state.lives += 1
             self.reset()
         elif ram[0] == 2 and ram[119] == 158:
-            LVL_NUM = 3
-            if LIVES < 3:
-                LIVES += 1
+            state.lvl_num = 3
+            if state.lives < 3:
+                state.lives += 1
             self.reset()
         elif ram[0] == 3 and ram[119] == 154:
-            LVL_NUM = 0
-            if LIVES < 3:
-                LIVES += 1
+            state.lvl_num = 0
+            if state.lives < 3:
+                state.lives += 1
             self.reset()
 
     # Use ram state and TIMER variable as tick
-    if ram[39] == 255 and TIMER == 0:
+    if ram[39] == 255 and state.timer == 0:
         # resets the whole game if no lives remaining
         if ram[120] < 16 and ram[123] <= 0:
-            LVL_NUM = 0
-            LIVES = 2
+            state.lvl_num = 0
+            state.lives = 2
             self.reset()
         # decrease lives if
         elif ram[120] < 16:
-            LIVES -= 1
+            state.lives -= 1
             self.reset()
         # lower timer
         else:
@@ -485,26 +487,26 @@ def maze_man(self):
             self.set_ram(120, ram[120]-16)
 
     # increase timer
-    TIMER = (TIMER + 1) % 150
+    state.timer = (state.timer + 1) % 150
 
 
 def maze_man_reset(self):
+    state = self.mod_state
     for i in range(59, 101):
         self.set_ram(i, 0)
-    global TIMER, LIVES, LINE
-    TIMER = 1
-    if LINE is not None:
-        global COL, COL_POS, LINE_POS
-        self.set_ram(10, COL_POS[COL])
-        self.set_ram(16, LINE_POS[LINE])
+    state.timer = 1
+    if state.line is not None:
+        self.set_ram(10, COL_POS[state.col])
+        self.set_ram(16, LINE_POS[state.line])
     self.set_ram(19, 0)
     self.set_ram(117, 0)
     self.set_ram(119, 134)
     self.set_ram(120, 144)
-    self.set_ram(123, LIVES)
+    self.set_ram(123, state.lives)
 
 
 def mini_maze_man(self):
+    state = self.mod_state
     ram = self.get_ram()
 
     # check if pill was collected
@@ -516,7 +518,6 @@ def mini_maze_man(self):
             collected = False
 
     # if no pill on the map
-    global COL, LINE
     if collected and ram[39] > 70:
         # increase the timer (inplace of score)
         add = ram[120] + 16
@@ -527,56 +528,54 @@ def mini_maze_man(self):
             self.set_ram(120, 0)
 
         # better choice alogorithm from endgame
-        global  DOT_POS
-        line = choice(range(LINE*5, ((LINE+1)*5)-1))
-        dot = choice(range(DOT_POS[COL][0], DOT_POS[COL][1]))
+        line = self.rng.choice(range(state.line*5, ((state.line+1)*5)-1))
+        dot = self.rng.choice(range(DOT_POS[state.col][0], DOT_POS[state.col][1]))
         if not GRID1[line][dot]:
             while not GRID1[line][dot]:
-                dot = choice(range(DOT_POS[COL][0], DOT_POS[COL][1]))
+                dot = self.rng.choice(range(DOT_POS[state.col][0], DOT_POS[state.col][1]))
         pill = DOT_PATTERN[dot][0] + 3*line
         value = ram[pill] + DOT_PATTERN[dot][1]
         self.set_ram(pill, value)
 
     # change or reset level on success/failure
-    global LVL_NUM, TIMER, LIVES
     if ram[39] == 69:
         if ram[0] == 0 and ram[119] == 154:
-            LVL_NUM = 1
-            if LIVES < 3:
-                LIVES += 1
+            state.lvl_num = 1
+            if state.lives < 3:
+                state.lives += 1
             self.reset()
         elif ram[0] == 1 and ram[119] == 150:
-            LVL_NUM = 2
-            if LIVES < 3:
-                LIVES += 1
+            state.lvl_num = 2
+            if state.lives < 3:
+                state.lives += 1
             self.reset()
         elif ram[0] == 2 and ram[119] == 158:
-            LVL_NUM = 3
-            if LIVES < 3:
-                LIVES += 1
+            state.lvl_num = 3
+            if state.lives < 3:
+                state.lives += 1
             self.reset()
         elif ram[0] == 3 and ram[119] == 154:
-            LVL_NUM = 0
-            if LIVES < 3:
-                LIVES += 1
+            state.lvl_num = 0
+            if state.lives < 3:
+                state.lives += 1
             self.reset()
 
     # Use ram state and TIMER variable as tick
     x, y = ram[10] - 13, ram[16]+1
     boundry_x = [0, 60, 100, 160]
     boundry_y = [0, 50, 120, 170]
-    if ram[39] == 255 and TIMER == 0:
+    if ram[39] == 255 and state.timer == 0:
         # resets the whole game if no lives remaining
         if ram[120] < 16 and ram[121] == 0 and ram[123] <= 0:
-            LVL_NUM = 0
-            LIVES = 2
+            state.lvl_num = 0
+            state.lives = 2
             self.reset()
         # decrease lives if 
         elif ram[120] < 16 and ram[121] == 0:
-            LIVES-=1
+            state.lives-=1
             self.reset()
         # lower timer
-        elif not (boundry_x[COL] < x < boundry_x[COL+1] and boundry_y[LINE] < y < boundry_y[LINE+1]):
+        elif not (boundry_x[state.col] < x < boundry_x[state.col+1] and boundry_y[state.line] < y < boundry_y[state.line+1]):
             if ram[120]-32 < 1:
                 if ram[121] > 0:
                     self.set_ram(121, ram[121]-1)
@@ -586,12 +585,12 @@ def mini_maze_man(self):
                         self.set_ram(120, 128)
                 # Full reset
                 elif ram[123] <= 0:
-                        LVL_NUM = 0
-                        LIVES = 2
+                        state.lvl_num = 0
+                        state.lives = 2
                         self.reset()
                 # decrease lives
                 else:
-                    LIVES-=1
+                    state.lives-=1
                     self.reset()
             else:
                 self.set_ram(120, ram[120]-32)
@@ -605,13 +604,13 @@ def mini_maze_man(self):
             
 
     # increase timer
-    TIMER = (TIMER+1) % 150
+    state.timer = (state.timer+1) % 150
     #remove ghosts
     self.set_ram(47, 0)
 
 
 def _modif_funcs(env, modifs):
-    global TOGGLE_CYAN, TOGGLE_PINK, TOGGLE_ORANGE, TOGGLE_RED
+    state = env.mod_state
 
     if "edible_ghosts" in modifs and "inverted" in modifs:
         raise ValueError(
@@ -619,30 +618,29 @@ def _modif_funcs(env, modifs):
         )
     for mod in modifs:
         if mod == "caged_ghosts":
-            TOGGLE_CYAN = True
-            TOGGLE_ORANGE = True
-            TOGGLE_RED = True
-            TOGGLE_PINK = True
+            state.toggle_cyan = True
+            state.toggle_orange = True
+            state.toggle_red = True
+            state.toggle_pink = True
             env.step_modifs.append(static_ghosts)
         elif mod == "disable_orange":
-            TOGGLE_ORANGE = True
+            state.toggle_orange = True
             env.step_modifs.append(static_ghosts)
         elif mod == "disable_red":
-            TOGGLE_RED = True
+            state.toggle_red = True
             env.step_modifs.append(static_ghosts)
         elif mod == "disable_cyan":
-            TOGGLE_CYAN = True
+            state.toggle_cyan = True
             env.step_modifs.append(static_ghosts)
         elif mod == "disable_pink":
-            TOGGLE_PINK = True
+            state.toggle_pink = True
             env.step_modifs.append(static_ghosts)
         elif mod.startswith("power"):
             mod_n = int(mod[-1])
             if mod_n < 0 or mod_n > 4:
                 raise ValueError(
                     "Invalid Number of Power Pills, choose number 0-4")
-            global NUMBER_POWER_PILLS
-            NUMBER_POWER_PILLS = mod_n
+            state.number_power_pills = mod_n
             env.reset_modifs.append(number_power_pills)
         elif mod == "edible_ghosts":
             env.step_modifs.append(edible_ghosts)
@@ -651,37 +649,35 @@ def _modif_funcs(env, modifs):
             env.reset_modifs.append(inverted_ms_pacman_reset)
         elif "change_level" in mod:
             if mod[-1].isdigit():
-                global LVL_NUM
-                LVL_NUM = int(mod[-1])
-                assert LVL_NUM < 4, "Invalid Level Number (0, 1, 2 or 3)"
+                state.lvl_num = int(mod[-1])
+                assert state.lvl_num < 4, "Invalid Level Number (0, 1, 2 or 3)"
             env.reset_modifs.append(change_level)
         elif mod == "end_game":
             env.reset_modifs.append(end_game)
             env.step_modifs.append(check_reset)
         elif mod == "maze_man":
             env.reset_modifs.append(change_level)
-            TOGGLE_CYAN = True
-            TOGGLE_ORANGE = True
-            TOGGLE_RED = True
-            TOGGLE_PINK = True
+            state.toggle_cyan = True
+            state.toggle_orange = True
+            state.toggle_red = True
+            state.toggle_pink = True
             env.step_modifs.append(static_ghosts)
             env.step_modifs.append(maze_man)
             env.reset_modifs.append(maze_man_reset)
         elif mod.startswith("mini_maze_man"):
-            global COL, LINE
             if mod[-1].isdigit() and int(mod[-1]) < 3:
-                COL = int(mod[-1])
+                state.col = int(mod[-1])
             else:
-                COL = 2
+                state.col = 2
             if mod[-2].isdigit() and int(mod[-2]) < 3:
-                LINE = int(mod[-2])
+                state.line = int(mod[-2])
             else:
-                LINE = 2
+                state.line = 2
 
-            TOGGLE_CYAN = True
-            TOGGLE_ORANGE = True
-            TOGGLE_RED = True
-            TOGGLE_PINK = True
+            state.toggle_cyan = True
+            state.toggle_orange = True
+            state.toggle_red = True
+            state.toggle_pink = True
             env.step_modifs.append(static_ghosts)
             env.step_modifs.append(mini_maze_man)
             env.reset_modifs.append(maze_man_reset)
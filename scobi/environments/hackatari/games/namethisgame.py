@@ -1,9 +1,9 @@
 # from random import random
-REPEAT = True
-BIT = 7
-
 TIMER = 50
 
+# initial per env state, see HackAtari.mod_state
+MOD_STATE = {"repeat": True, "bit": 7}
+
 
 def endeless_oxygen(self):
     '''
@@ -23,26 +23,25 @@ def double_wave_length(self):
     '''
     Doubles the time of each wave
     '''
-    global REPEAT
+    state = self.mod_state
     ram = self.get_ram()
-    if REPEAT:
-        global BIT
+    if state.repeat:
         try:
-            if ram[114] and not ram[114] & (2**BIT):
-                self.set_ram(114, ram[114] | (2**BIT))
-                REPEAT = False
-            elif not ram[114] and not ram[115] & (2**BIT):
-                self.set_ram(115, ram[115] | (2**BIT))
-                REPEAT = False
+            if ram[114] and not ram[114] & (2**state.bit):
+                self.set_ram(114, ram[114] | (2**state.bit))
+                state.repeat = False
+            elif not ram[114] and not ram[115] & (2**state.bit):
+                self.set_ram(115, ram[115] | (2**state.bit))
+                state.repeat = False
         except:
             pass
     else:
-        if ram[114] and not ram[114] & (2**BIT):
-            BIT -= 1
-            REPEAT = True
-        elif not ram[114] and ram[115] & (2**BIT):
-            BIT += 1
-            REPEAT = True
+        if ram[114] and not ram[114] & (2**state.bit):
+            state.bit -= 1
+            state.repeat = True
+        elif not ram[114] and ram[115] & (2**state.bit):
+            state.bit += 1
+            state.repeat = True
 
 
 def quick_start(self):
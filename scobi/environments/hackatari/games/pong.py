@@ -1,8 +1,5 @@
-LAST_ENEMY_Y_POS = 127
-BALL_PREVIOUS_X_POS = 130
-
-STRENGTH = 6
-TIMER = 0
+# initial per env state, see HackAtari.mod_state
+MOD_STATE = {"last_enemy_y_pos": 127, "ball_previous_x_pos": 130, "strength": 6, "timer": 0}
 
 
 def lazy_enemy(self):
@@ -10,17 +7,17 @@ def lazy_enemy(self):
     Enemy does not move after returning the shot.
     """
     ram = self.get_ram()
-    global LAST_ENEMY_Y_POS, BALL_PREVIOUS_X_POS
+    state = self.mod_state
     if 0 < ram[11] < 5:
         self.set_ram(21, 127)
         self.set_ram(49, 130)
-    if BALL_PREVIOUS_X_POS < ram[49]:
-        self.set_ram(21, LAST_ENEMY_Y_POS)
-        tmp = LAST_ENEMY_Y_POS
+    if state.ball_previous_x_pos < ram[49]:
+        self.set_ram(21, state.last_enemy_y_pos)
+        tmp = state.last_enemy_y_pos
     else:
         tmp = ram[21]
-    BALL_PREVIOUS_X_POS = ram[49]
-    LAST_ENEMY_Y_POS = tmp
+    state.ball_previous_x_pos = ram[49]
+    state.last_enemy_y_pos = tmp
 
 
 def up_drift(self):
@@ -31,13 +28,13 @@ def up_drift(self):
     ball_y = self.get_ram()[54]
     new_ball_pos = ball_y - 1
 
-    global TIMER
+    state = self.mod_state
     # else the ball isnt there at all or outside of the walls
     if (
-        ball_y != 0 and not TIMER % STRENGTH
+        ball_y != 0 and not state.timer % state.strength
     ):  # if (ball_y + 9 <= 196 and new_ball_pos != 0) and 57 <= new_ball_pos <= 199 and not TIMER%10:
         self.set_ram(54, new_ball_pos)
-    TIMER += 1
+    state.timer += 1
 
 
 def down_drift(self):
@@ -48,13 +45,13 @@ def down_drift(self):
     ball_y = self.get_ram()[54]
     new_ball_pos = ball_y + 1
 
-    global TIMER
+    state = self.mod_state
     # else the ball isnt there at all or outside of the walls
     if (
-        ball_y != 0 and not TIMER % STRENGTH
+        ball_y != 0 and not state.timer % state.strength
     ):  # if (ball_y + 9 <= 196 and new_ball_pos != 0) and 57 <= new_ball_pos <= 199 and not TIMER%10:
         self.set_ram(54, new_ball_pos)
-    TIMER += 1
+    state.timer += 1
 
 
 def right_drift(self):
@@ -65,13 +62,13 @@ def right_drift(self):
     # ball_y = self.get_ram()[54]
     new_ball_pos = ball_x + 1
 
-    global TIMER
+    state = self.mod_state
     # else the ball isnt there at all or outside of the walls
     if (
-        ball_x != 0 and not TIMER % STRENGTH
+        ball_x != 0 and not state.timer % state.strength
     ):  # if (ball_y + 9 <= 196 and new_ball_pos != 0) and 57 <= new_ball_pos <= 199 and not TIMER%10:
         self.set_ram(49, new_ball_pos)
-    TIMER += 1
+    state.timer += 1
 
 
 def left_drift(self):
@@ -82,13 +79,13 @@ def left_drift(self):
     # ball_y = self.get_ram()[54]
     new_ball_pos = ball_x - 1
 
-    global TIMER
+    state = self.mod_state
     # else the ball isnt there at all or outside of the walls
     if (
-        ball_x != 0 and not TIMER % STRENGTH
+        ball_x != 0 and not state.timer % state.strength
     ):  # if (ball_y + 9 <= 196 and new_ball_pos != 0) and 57 <= new_ball_pos <= 199 and not TIMER%10:
         self.set_ram(49, new_ball_pos)
-    TIMER += 1
+    state.timer += 1
 
 
 def _modif_funcs(env, modifs):
@@ -97,14 +94,13 @@ def _modif_funcs(env, modifs):
             env.step_modifs.append(lazy_enemy)
         elif mod == "gravity":
             if mod[-1].isdigit():
-                global STRENGTH
                 mod_n = int(mod[-1])
                 assert 0 < mod_n < 6, "Invalid Gravity lelvel, choose number 1-5"
                 mod_n = 6 - mod_n
                 if mod_n == 1:
-                    STRENGTH = 3
+                    env.mod_state.strength = 3
                 else:
-                    STRENGTH = mod_n * 2
+                    env.mod_state.strength = mod_n * 2
             if mod.startswith("up_drift"):
                 env.step_modifs.append(up_drift)
             elif mod.startswith("down_drift"):
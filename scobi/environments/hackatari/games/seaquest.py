@@ -1,14 +1,5 @@
-import random
-
-global CURRENT_COLORS
-global TIMER
-CURRENT_COLORS = [
-    random.randint(0, 200),
-    random.randint(0, 200),
-    random.randint(0, 200),
-    random.randint(0, 200),
-]
-TIMER = 0
+# initial per env state, see HackAtari.mod_state. the enemy colors are drawn on first use
+MOD_STATE = {"timer": 0, "current_colors": None}
 
 
 def gravity(self):
@@ -17,10 +8,10 @@ def gravity(self):
     """
     # makes game kinda unplayable
     ram = self.get_ram()
-    global TIMER
-    if ram[97] < 105 and not TIMER % 5:
+    state = self.mod_state
+    if ram[97] < 105 and not state.timer % 5:
         self.set_ram(97, ram[97] + 1)
-    TIMER += 1
+    state.timer += 1
 
 
 def disable_enemies(self):
@@ -61,10 +52,13 @@ def random_color_enemies(self):
     The enemies have new random colors each time they go across the screen.
     """
     ram = self.get_ram()
+    state = self.mod_state
+    if state.current_colors is None:
+        state.current_colors = [self.rng.randint(0, 200) for _ in range(4)]
     for i in range(4):
         if ram[30 + i] == 200:  # if the enemy is not in frame
-            CURRENT_COLORS[i] = random.randint(0, 255)
-        self.set_ram(44 + i, CURRENT_COLORS[i])
+            state.current_colors[i] = self.rng.randint(0, 255)
+        self.set_ram(44 + i, state.current_colors[i])
 
 
 def _modif_funcs(env, modifs):
@@ -1,10 +1,7 @@
 import numpy as np
 
-NEW_POSITION = 0
-
-PREV_X = 246
-
-MATCH_X = 0
+# initial per env state, see HackAtari.mod_state
+MOD_STATE = {"new_position": 0, "prev_x": 246, "match_x": 0}
 
 
 def disable_shield_left(self):
@@ -41,7 +38,7 @@ def relocate_shields(self):
     """
     relocate_shields: Allows for the relocation of the shields via an offset.
     """
-    shield_pos_new = NEW_POSITION
+    shield_pos_new = self.mod_state.new_position
     if shield_pos_new < 53 and shield_pos_new >= 35:
         self.set_ram(27, shield_pos_new)
 
@@ -57,15 +54,13 @@ def curved_shots(self):
     # are not reached.
     if 40 < curr_laser_pos < 122:
         if 75 < curr_laser_hight < 150:
-            global MATCH_X
-            MATCH_X = self.get_ram()[28]
+            self.mod_state.match_x = self.get_ram()[28]
         laser_displacement = calculate_x_displacement(
             self, curr_laser_pos, curr_laser_hight
         )
         self.set_ram(87, laser_displacement)
     else:
-        global PREV_X
-        PREV_X = self.get_ram()[28]
+        self.mod_state.prev_x = self.get_ram()[28]
 
 
 # calculates the x coordinate displacement based on a parabolic function
@@ -75,11 +70,10 @@ def calculate_x_displacement(self, current_x, current_y):
     and the current x position.
     """
     # 85
-    global PREV_X
-    global MATCH_X
-    if MATCH_X < PREV_X:
+    state = self.mod_state
+    if state.match_x < state.prev_x:
         x_out = current_x - current_y / 160
-    elif MATCH_X > PREV_X:
+    elif state.match_x > state.prev_x:
         x_out = current_x + current_y / 160
     else:
         x_out = current_x
@@ -112,6 +106,5 @@ def _modif_funcs(env, modifs):
             if mod_n < 35 or mod_n > 53:
                 raise ValueError(
                     "Invalid position for shields, choose value 35-53")
-            global NEW_POSITION
-            NEW_POSITION = mod_n
+            env.mod_state.new_position = mod_n
             env.reset_modifs.append(relocate_shields)
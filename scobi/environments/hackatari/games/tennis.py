@@ -1,6 +1,3 @@
-from random import random
-
-
 def modify_ram_adding_wind(self):
     """
     wind: Sets the ball in the up and right direction by 3 pixles every single ram step
@@ -19,7 +16,7 @@ def modify_ram_adding_wind(self):
     new_ball_x = ball_x  # moves the ball to the right one position every ram step
     new_ball_y = ball_y  # moves the ball up one position every ram step
     new_shadow_y = shadow_y
-    if random() < 0.5:
+    if self.rng.random() < 0.5:
         new_ball_x += 1  # moves the ball to the right one position every ram step
         new_ball_y += 1  # moves the ball up one position every ram step
         new_shadow_y += 1
@@ -1,9 +1,5 @@
-import random
-
-ENEMY_COLOR = 0
-ENEMY_RANDOM_COLORS = [0, 0, 0, 0, 0, 0]
-
-ROOM = 8
+# initial per env state, see HackAtari.mod_state
+MOD_STATE = {"enemy_color": 0, "enemy_random_colors": [0, 0, 0, 0, 0, 0], "room": 8}
 
 colors = [0, 12, 48, 113, 200]
 
@@ -15,35 +11,35 @@ def enemy_colors(self):
     ram = self.get_ram()
     if ram[90] != 8 and ram[90] != 9:
         for i in range(5):
-            self.set_ram(37 + i, colors[ENEMY_COLOR])
+            self.set_ram(37 + i, colors[self.mod_state.enemy_color])
     else:
         for i in range(6):
-            self.set_ram(36 + i, colors[ENEMY_COLOR])
+            self.set_ram(36 + i, colors[self.mod_state.enemy_color])
 
 
 def random_colors(self):
     """
     Changes the color of each enemy to one of the five colors at radom.
     """
+    state = self.mod_state
     ram = self.get_ram()
     if ram[90] != 8 and ram[90] != 9:
         for i in range(5):
-            self.set_ram(37 + i, ENEMY_RANDOM_COLORS[i])
+            self.set_ram(37 + i, state.enemy_random_colors[i])
     else:
         for i in range(6):
-            self.set_ram(36 + i, ENEMY_RANDOM_COLORS[i])
+            self.set_ram(36 + i, state.enemy_random_colors[i])
 
-    global ROOM
     ram = self.get_ram()
-    if ROOM != ram[90]:
-        ROOM = ram[90]
+    if state.room != ram[90]:
+        state.room = ram[90]
         for i in range(6):
-            ENEMY_RANDOM_COLORS[i] = random.choice(colors)
+            state.enemy_random_colors[i] = self.rng.choice(colors)
 
 
 def reset_random_colors(self):
     for i in range(6):
-        ENEMY_RANDOM_COLORS[i] = random.choice(colors)
+        self.mod_state.enemy_random_colors[i] = self.rng.choice(colors)
 
 
 # ram 62 == map layout
@@ -65,8 +61,7 @@ def _modif_funcs(env, modifs):
                 raise ValueError(
                     "Append value 0-4 [black, white, red, blue, green] to your color mod-argument"
                 )
-            global ENEMY_COLOR
-            ENEMY_COLOR = mod_n
+            env.mod_state.enemy_color = mod_n
             env.step_modifs.append(enemy_colors)
         else:
             print("Invalid or unknown modification")
@@ -1,15 +1,37 @@
 from typing import Tuple
 import yaml
 import numpy as np
-import math
+import time
+import os
+import copy
+import pickle
+import hashlib
 from pathlib import Path
-from itertools import permutations
-from scobi.concepts import init as concept_init
+from itertools import product
+from scobi.concepts import init as concept_init, PositionTrail, CategoryPositions
 from scobi.utils.decorators import FUNCTIONS
+from scobi.plan import FeaturePlan, RELATION_MEANINGS
+from scobi.codegen import load_extractor, write_extractor
+from scobi.cache import cache_enabled, get_cache_path, make_cache_dir
+from scobi.normalization import RunningStats
+from scobi.profiler import FocusProfiler
+from scobi.rewards import RewardSpec, load_default_spec
+from scobi.schema import FeatureSchema
 from termcolor import colored
 
+# libyaml is much faster on large focus files, fall back to the pure python loader
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# observation dtypes of the feature vector. compact dtypes are clipped to the observation bounds, integer dtypes are rounded
+OBSERVATION_DTYPES = ("float32", "float16", "int16")
+
+# bump when the layout of compiled focus files changes
+COMPILED_FOCUS_VERSION = 9
+
 class Focus():
-    def __init__(self, env_name, reward, hide_properties, fofiles_dir_name, fofile, raw_features, max_obj_dict, actions, refresh_yaml, logger):
+    def __init__(self, env_name, reward, hide_properties, fofiles_dir_name, fofile, raw_features, max_obj_dict, actions, refresh_yaml, logger,
+                 candidate_filter=None, incremental=False, normalize=False, freeze_normalization=False,
+                 profile=False, obs_dtype="float32"):
         concept_init()
         self.FUNCTION_LIST = []
         self.MAX_NB_OBJECTS = max_obj_dict
@@ -17,53 +39,105 @@ class Focus():
         self.INIT_OBJECT_NAMES = [x.category for x in self.INIT_OBJECTS]
         self.NS_REPR_LIST = []
         self.NS_REPR_TYPES = []
+        self.NS_REPR_INDEX = {}
+        self.BASE_NS_REPR = None # ns_repr list and types without history properties of the focus file
+        self.ALL_NS_REPR = None # ns_repr list and types of all objects, the OCAtari layout the feature plan is compiled from
         self.OBJECT_NAMES = []
+        self.OBJECT_CATEGORIES = {}
+        # restricts the function instances generated for the default focus file:
+        # "exclude_same_object": bool, "categories": [category, ...], "max_per_function": int,
+        # "relations": bool (category relations like NEAREST_K instead of pairwise distances)
+        self.CANDIDATE_FILTER = candidate_filter if candidate_filter else {}
 
         self.ACTIONS = actions
         self.ENV_NAME = env_name.split("/")[-1] # handle v5 namespace case
         self.FOCUSFILEPATH = None
+        self.FOCUS_KEY = None
         self.PARSED_OBJECTS = []
         self.PARSED_ACTIONS = []
         self.PARSED_PROPERTIES = []
         self.PARSED_FUNCTIONS = []
         self.FEATURE_VECTOR_BACKMAP = []
+        self.FEATURE_PLAN = None
+        self.FEATURE_SCHEMA = None # names, slices, source objects and bounds of the feature vector entries (FeatureSchema)
+        self.EXTRACTOR = None
 
         self.PROPERTY_COMPUTE_LAYER = []
         self.FUNC_COMPUTE_LAYER = []
         self.PROPERTY_COMPUTE_LAYER_SIZE = 0
         self.FUNC_COMPUTE_LAYER_SIZE = 0
-        self.CURRENT_PROPERTY_COMPUTE_LAYER = []
-        self.CURRENT_FUNC_COMPUTE_LAYER = []
 
         self.FEATURE_VECTOR_SIZE = 0
         self.OBSERVATION_SIZE = 0
-        self.CURRENT_FEATURE_VECTOR = []
+        self.CURRENT_FEATURE_VECTOR = None
         self.FEATURE_VECTOR_PROPS_SIZE = 0
-        self.CURRENT_FEATURE_VECTOR_PROPS = []
+        self.CURRENT_FEATURE_VECTOR_PROPS = None
         self.FEATURE_VECTOR_FUNCS_SIZE = 0
-        self.CURRENT_FEATURE_VECTOR_FUNCS = []
-        self.CURRENT_FREEZE_MASK = []
+        self.CURRENT_FEATURE_VECTOR_FUNCS = None
+        self.CURRENT_FREEZE_MASK = None
+
+        # incremental mode: only recompute functions whose input properties changed since the last step
+        self.INCREMENTAL = incremental
+        self.INCREMENTAL_PROPS = None # property layer of the last step
+        self.INCREMENTAL_FUNCS = None # unmasked function layer of the last step
+        self.LAST_REUSE_RATIO = 0.0
+        self.REUSE_STATS = {"recomputed": 0, "reused": 0}
+
+        # position history ring buffer, declared in the focus file. depth 2 is the OCAtari buffer itself
+        self.HISTORY_DEPTH = 2
+        self.HISTORY_OBJECTS = []
+        self.HISTORY_BUFFER = None
+        self.HISTORY_POS = 0
+        self.HISTORY_ORDER = None # per ring position: flat buffer indices in frame order, oldest first
+        self.HISTORY_EMPTY = True
+        self.batch_history = None
+
+        # options of relation functions (NEAREST_K k, WITHIN_RADIUS radius), declared in the focus file
+        self.RELATIONS = {}
 
         self.REWARD_SHAPING = reward
         self.REWARD_FUNC = None
+        # declarative reward shaping (RewardSpec) of the REWARD section of the focus file or the packaged default of the game
+        self.REWARD_SPEC_DICT = None
+        self.REWARD_SPEC = None
+        self.reward_state = None
+        self.batch_reward_spec_state = None
         self.reward_history = [0, 0]
         self.reward_threshold = -1
         self.reward_subgoals = 0
         self.reward_helper_var = False
         self.HIDE_PROPERTIES = hide_properties
 
-        self.running_stats = []
+        # online observation normalization (RunningStats), statistics are stored next to the focus file.
+        # API only: train.py and eval.py normalize with VecNormalize. The statistics are per Focus, i.e. shared by the
+        # envs of a ScobiVecEnv, but kept per worker in a (Scobi)SubprocVecEnv, where save_normalization() of one
+        # worker would only store its own share of the samples
+        self.NORMALIZE = normalize
+        self.FREEZE_NORMALIZATION = freeze_normalization
+        self.running_stats = None
+
+        # observation dtype and bounds of the observation space, see init_observation_bounds()
+        if obs_dtype not in OBSERVATION_DTYPES:
+            logger.GeneralError("Unknown observation dtype %s, expected one of %s." % (colored(obs_dtype, "light_green"), ", ".join(OBSERVATION_DTYPES)))
+        self.OBSERVATION_DTYPE = np.dtype(obs_dtype)
+        self.CLIP_OBSERVATION = self.OBSERVATION_DTYPE != np.float32
+        self.OBSERVATION_LOW = None
+        self.OBSERVATION_HIGH = None
+
+        # cost profiler (FocusProfiler), times the plan per concept and object instead of using the generated extractor
+        self.PROFILE = profile
+        self.PROFILER = None
         self.logger = logger
         # self.generate_property_set()
         self.generate_ns_repr_set()
-        self.generate_history_idxs()
-        self.generate_function_set()
-        self.last_obs_vector = []
-        self.first_pass = True
+        # self.generate_function_set() is only needed to write a fresh yaml, see generate_fresh_yaml()
+        self.SCHEMA_KEY = self.get_schema_key()
+        self.generated_yaml_key = None
         # Params for custom rew functions
         self.ale = None
         self.prev_carry_value = None # e.g. oxygenlevel in seaquest
         self.prev_carry_value2 = None # e.g. lives to check if env reset due to death
+        self.batch_reward_states = [] # per env copies of the reward params above for batched feature extraction
 
         fofiles_dir_path = Path.cwd() / Path(fofiles_dir_name)
         fofiles_dir_path.mkdir(exist_ok=True)
@@ -85,30 +159,20 @@ class Focus():
             else:
                 logger.GeneralInfo("Default Focus file %s found." % colored(fofile_path.name, "light_green"))
                 if refresh_yaml:
-                    logger.GeneralInfo("Rebuilding it to make sure it's up-to-date.")
-                    self.generate_fresh_yaml(fofile_path)
+                    if self.is_generated_yaml_up_to_date(fofile_path):
+                        logger.GeneralInfo("Compiled Focus File matches the current object schema. Rebuild skipped.")
+                    else:
+                        logger.GeneralInfo("Rebuilding it to make sure it's up-to-date.")
+                        self.generate_fresh_yaml(fofile_path)
             self.load_focus_file(fofile_path)
             logger.GeneralInfo("Default Focus File is valid. Imported.")
             self.FOCUSFILEPATH = fofile_path
 
-        if self.REWARD_SHAPING != 0: # set respective reward shaping
-            if self.REWARD_SHAPING == 1:
-                rewstring = "scobi"
-            elif self.REWARD_SHAPING == 2:
-                rewstring = "env + scobi"
-            else:
-                rewstring = "unknown"
-            logger.GeneralInfo("Reward Shaping: %s." % colored(rewstring, "light_green"))
-            self.REWARD_FUNC = self.get_reward_func(self.ENV_NAME)
-            if self.REWARD_FUNC is not None:
-                if self.REWARD_FUNC == "norew":
-                    logger.GeneralError("Reward function for %s not implemented!" % colored(self.ENV_NAME, "light_green"))
-                else:
-                    logger.GeneralInfo("Reward function is valid. Bound.")
-            else:
-                logger.GeneralError("Reward function for %s is expecting properties/concepts that are missing in the focus file!" % colored(self.ENV_NAME, "light_green"))
-        else:
-            logger.GeneralInfo("Reward Shaping: %s." % colored("disabled", "light_yellow"))
+        if self.NORMALIZE:
+            self.init_normalization()
+        self.init_observation_bounds()
+
+        self.init_reward_func()
 
         if self.HIDE_PROPERTIES: # hide properties from observation or not
             logger.GeneralInfo("Object properties are %s from the observation vector." % colored("excluded", "light_yellow"))
@@ -123,6 +187,7 @@ class Focus():
             # iterate over number of objects of current kind
             for i in range( v):
                 self.OBJECT_NAMES.append(k+str(i+1))
+                self.OBJECT_CATEGORIES[k+str(i+1)] = k
                 ns_meanings = [[meaning, k+str(i+1)] for meaning in obj._ns_meaning]
                 self.NS_REPR_LIST += ns_meanings
                 self.NS_REPR_TYPES += obj._ns_types
@@ -132,6 +197,28 @@ class Focus():
             if ns_repr[0] == "POSITION":
                 self.NS_REPR_LIST.insert(i+1, ["POSITION_HISTORY", ns_repr[1]])
                 self.NS_REPR_TYPES.insert(i+1, Tuple[int, int, int, int])
+        self.NS_REPR_INDEX = {tuple(ns_repr): i for i, ns_repr in enumerate(self.NS_REPR_LIST)}
+        self.BASE_NS_REPR = (list(self.NS_REPR_LIST), list(self.NS_REPR_TYPES))
+
+    def set_history(self, depth, objects):
+        # add POSITION_TRAIL properties for the history objects of the focus file
+        self.HISTORY_DEPTH = depth
+        self.HISTORY_OBJECTS = objects
+        ns_list, ns_types = list(self.BASE_NS_REPR[0]), list(self.BASE_NS_REPR[1])
+        for obj in objects:
+            i = ns_list.index(["POSITION_HISTORY", obj])
+            ns_list.insert(i+1, ["POSITION_TRAIL", obj])
+            ns_types.insert(i+1, PositionTrail)
+        self.ALL_NS_REPR = (ns_list, ns_types)
+        self.select_ns_repr()
+
+    def select_ns_repr(self):
+        # selection pushdown: the feature vector only holds the properties of the selected objects
+        selected = set(self.PARSED_OBJECTS)
+        ns_list, ns_types = self.ALL_NS_REPR
+        self.NS_REPR_LIST = [x for x in ns_list if x[1] in selected]
+        self.NS_REPR_TYPES = [t for x, t in zip(ns_list, ns_types) if x[1] in selected]
+        self.NS_REPR_INDEX = {tuple(ns_repr): i for i, ns_repr in enumerate(self.NS_REPR_LIST)}
 
 
     # def generate_property_set(self):
@@ -145,20 +232,41 @@ class Focus():
     #     exit()
 
     def generate_function_set(self):
+        exclude_same_object = self.CANDIDATE_FILTER.get("exclude_same_object", False)
+        categories = self.CANDIDATE_FILTER.get("categories", None)
+        max_per_function = self.CANDIDATE_FILTER.get("max_per_function", None)
+        relations = self.CANDIDATE_FILTER.get("relations", False)
+        # index ns_repr entries by type, s.t. only type-compatible argument tuples are enumerated
+        type_index = {}
+        for i, (ns_repr, ns_type) in enumerate(zip(self.NS_REPR_LIST, self.NS_REPR_TYPES)):
+            if categories is not None and self.OBJECT_CATEGORIES[ns_repr[1]] not in categories:
+                continue
+            type_index.setdefault(ns_type, []).append(i)
+        entries = list(self.NS_REPR_LIST)
+        if relations:
+            # one relation argument per category with positions, they replace the O(n^2) pairwise distances
+            for cat in self.get_position_categories():
+                if categories is None or cat in categories:
+                    type_index.setdefault(CategoryPositions, []).append(len(entries))
+                    entries.append(["POSITIONS", cat])
         for k, v in FUNCTIONS.items():
-            para_len = len(v["expects"])
-            # property_combis = permutations(self.PROPERTY_LIST, para_len)
-            ns_repr_combis = permutations(self.NS_REPR_LIST, para_len)
+            if relations and k in ("DISTANCE", "EUCLIDEAN_DISTANCE"):
+                continue
             function_sig = [x[0].annotation for x in v["expects"]]
-            for combi in ns_repr_combis:
-                # combi_sig_orig = [PROPERTIES[x[0]]["returns"][0] for x in combi]
-                combi_sig = []
-                for c in combi:
-                    idx = self.NS_REPR_LIST.index(c)
-                    combi_sig.append(self.NS_REPR_TYPES[idx])
-                function_sig = [x[0].annotation for x in v["expects"]]
-                if combi_sig == function_sig:
-                    self.FUNCTION_LIST.append([k, list(combi)])
+            candidates = [type_index.get(t, []) for t in function_sig]
+            nb_instances = 0
+            # same order as permutations(NS_REPR_LIST) filtered by signature
+            for combi in product(*candidates):
+                if len(set(combi)) != len(combi):
+                    continue
+                combi = [entries[i] for i in combi]
+                if exclude_same_object and len({c[1] for c in combi}) != len(combi):
+                    continue
+                if max_per_function is not None and nb_instances == max_per_function:
+                    self.logger.GeneralWarning("Function %s capped at %d instances." % (colored(k, "light_green"), max_per_function))
+                    break
+                self.FUNCTION_LIST.append([k, combi])
+                nb_instances += 1
 
     # def get_object_by_name(self, name, objs):
     #     if type(objs) is dict:
@@ -181,6 +289,8 @@ class Focus():
 
 
     def print_state(self):
+        if not self.FUNCTION_LIST:
+            self.generate_function_set()
         print("---NEUROSYMBOLIC---")
         for p in self.NS_REPR_LIST:
             print(p)
@@ -217,6 +327,8 @@ class Focus():
 
 
     def generate_fresh_yaml(self, fpath):
+        if not self.FUNCTION_LIST:
+            self.generate_function_set()
         yaml_dict = {
             "ENVIRONMENT" : "",
             "AVAILABLE_CONCEPTS" : {
@@ -248,206 +360,394 @@ class Focus():
 
         with open(fpath, "w") as f:
             yaml.dump(yaml_dict, f, sort_keys=False)
+        self.generated_yaml_key = self.get_generated_yaml_key()
 
 
-    def validate_objects(self, objs):
+    def validate_objects(self, objs, errors):
         if not objs:
-            return False
+            errors.append("No objects specified in objects selection!")
+            return
+        object_names = set(self.OBJECT_NAMES)
         for o in objs:
-            if o not in self.OBJECT_NAMES:
-                return False, o
-        return True, None
+            if o not in object_names:
+                errors.append("Invalid objects specified in objects selection: %s !" % o)
 
 
-    def validate_actions(self, acts):
+    def validate_actions(self, acts, errors):
         if not acts:
-            return False
-        for o in acts:
-            if o not in self.ACTIONS:
-                return False
-        return True
+            errors.append("No actions specified in actions selection!")
+            return
+        actions = set(self.ACTIONS)
+        for a in acts:
+            if a not in actions:
+                errors.append("Invalid actions specified in actions selection: %s !" % a)
 
 
     def validate_functions(self, funcs):
-        for f in funcs:
-            if f not in FUNCTIONS.keys():
-                return False
-        return True
+        return all(f in FUNCTIONS for f in funcs)
 
 
-    def validate_functions_signatures(self, funclist):
+    def validate_functions_signatures(self, funclist, errors):
+        object_names = set(self.OBJECT_NAMES)
+        selected_objects = set(self.PARSED_OBJECTS)
+        position_categories = self.get_position_categories()
+        signatures = {k: ([x[0].annotation for x in v["expects"]], [x[1] for x in v["expects"]]) for k, v in FUNCTIONS.items()}
         for f in funclist:
+            if f[0] not in signatures:
+                errors.append("Unknown function in function selection: %s" % f[0])
+                continue
             parsed_para_sig = []
-            if f[0] not in FUNCTIONS.keys():
-                self.logger.FocusFileParserError("Unknown function in function selection: %s" % f[0])
             for para in f[1]:
-                if para not in self.NS_REPR_LIST:
-                    self.logger.FocusFileParserError("Unknown property in functions selection: %s" % para[0])
-                if para[1] not in self.OBJECT_NAMES:
-                    self.logger.FocusFileParserError("Unknown object in functions selection: %s" % para[1])
-                para_idx = self.NS_REPR_LIST.index(para)
+                if para[0] in RELATION_MEANINGS:
+                    if para[1] not in position_categories:
+                        errors.append("Unknown object category with positions in functions selection: %s" % para[1])
+                        parsed_para_sig = None
+                        break
+                    parsed_para_sig.append(CategoryPositions)
+                    continue
+                para_idx = self.NS_REPR_INDEX.get(tuple(para))
+                if para_idx is None:
+                    if para[1] not in object_names:
+                        errors.append("Unknown object in functions selection: %s" % para[1])
+                    elif para[1] not in selected_objects:
+                        errors.append("Object in functions selection is not selected in objects selection: %s" % para[1])
+                    else:
+                        errors.append("Unknown property in functions selection: %s" % para[0])
+                    parsed_para_sig = None
+                    break
                 parsed_para_sig.append(self.NS_REPR_TYPES[para_idx])
-            func_definition = FUNCTIONS[f[0]]
-            function_sig = [x[0].annotation for x in func_definition["expects"]]
-            sig_desc = [x[1] for x in func_definition["expects"]]
-            if function_sig != parsed_para_sig:
-                self.logger.FocusFileParserError("Signature mismatch in functions selection. Function '%s' expects '%s'" % (f[0], sig_desc))
-        return True
+            function_sig, sig_desc = signatures[f[0]]
+            if parsed_para_sig is not None and function_sig != parsed_para_sig:
+                errors.append("Signature mismatch in functions selection. Function '%s' expects '%s'" % (f[0], sig_desc))
+
+
+    def import_history(self, hdict, errors):
+        # history:
+        #   depth: 4
+        #   properties:
+        #   - POSITION: Player1
+        if not hdict:
+            return 2, []
+        depth = hdict.get("depth")
+        if type(depth) is not int or depth < 3:
+            errors.append("History depth has to be an integer >= 3 (2 is always available as POSITION_HISTORY): %s" % depth)
+            depth = 3
+        object_names = set(self.OBJECT_NAMES)
+        selected_objects = set(self.PARSED_OBJECTS)
+        objects = []
+        for p in hdict.get("properties") or []:
+            meaning, obj = list(p.items())[0]
+            if meaning != "POSITION":
+                errors.append("Unsupported property in history selection: %s (only POSITION)" % meaning)
+            elif obj not in object_names:
+                errors.append("Unknown object in history selection: %s" % obj)
+            elif obj not in selected_objects:
+                errors.append("Object in history selection is not selected in objects selection: %s" % obj)
+            elif obj not in objects:
+                objects.append(obj)
+        return depth, objects
+
+
+    def get_position_categories(self):
+        # object categories with a POSITION, in object order
+        return list(dict.fromkeys(self.OBJECT_CATEGORIES[name] for meaning, name in self.NS_REPR_LIST if meaning == "POSITION"))
+
+    def import_relations(self, rdict, errors):
+        # relations:
+        #   k: 3        # neighbours of NEAREST_K
+        #   radius: 30  # of WITHIN_RADIUS, in pixels
+        if not rdict:
+            return {}
+        known = {}
+        for v in FUNCTIONS.values():
+            known.update(v["options"])
+        relations = {}
+        for k, v in rdict.items():
+            if k not in known:
+                errors.append("Unknown option in relations selection: %s" % k)
+            elif type(v) not in (int, float) or (type(known[k]) is int and type(v) is not int) or v <= 0:
+                errors.append("Relation option %s has to be a positive %s: %s" % (k, type(known[k]).__name__, v))
+            else:
+                relations[k] = v
+        return relations
 
 
-    def import_objects(self, objs):
-        passed, obj = self.validate_objects(objs)
-        if passed:
-            return objs
-        else:
-            self.logger.FocusFileParserError("Invalid objects specified in objects selection: "+obj+" !")
+    def import_objects(self, objs, errors):
+        self.validate_objects(objs, errors)
+        return objs
 
-    def import_actions(self, acts):
-        if self.validate_actions(acts):
-            return acts
-        else:
-            self.logger.FocusFileParserError("Invalid actions specified in actions selection!")
+
+    def import_actions(self, acts, errors):
+        self.validate_actions(acts, errors)
+        return acts
 
 
-    def import_functions(self ,funcs):
+    def import_functions(self, funcs, errors):
         out = []
-        funcs_to_vali = []
-        properties_to_vali = []
-        objects_to_vali = []
         if not funcs:
             return []
         for p in funcs:
             item = list(p.items())[0]
             fname = item[0]
-            fparas = item[1]
-            funcs_to_vali.append(fname)
+            fparas = item[1] if item[1] else []
             para_list = [fname, []]
             for p in fparas:
                 para_tuple = list(p.items())[0]
-                properties_to_vali.append(para_tuple[0]) # not used ?
-                objects_to_vali.append(para_tuple[1]) # not used ?
                 para_list[1].append(list(para_tuple))
             out.append(para_list)
-        if self.validate_functions_signatures(out):
-            return out
-        else:
-            return None
+        self.validate_functions_signatures(out, errors)
+        return out
 
 
-    def load_focus_file(self, fpath):
-        with open(fpath, "r") as f:
-            in_dict = yaml.safe_load(f)
-        parsed_env_name = in_dict["ENVIRONMENT"]
-        if self.ENV_NAME != parsed_env_name:
-            self.logger.FocusFileParserError("Env and focus file env do not match: %s, %s" % (self.ENV_NAME, parsed_env_name))
-        sdict = in_dict["SELECTION"]
-        self.PARSED_OBJECTS = self.import_objects(sdict["objects"])
-        self.PARSED_ACTIONS = self.import_actions(sdict["actions"])
-        self.PARSED_FUNCTIONS = self.import_functions(sdict["functions"])
-        # based on the focus file selection,
-        # construct a single layer computation graph for the feature vector:
-        # 1     FUNC_COMPUTE_LAYER
-        parsed_fv_index = 0
-
-        for ns_repr_type in self.NS_REPR_TYPES:
-            arg_len = len(str(ns_repr_type).split('[')[1][:-1].split(','))
-            for _ in range(arg_len):
-                self.FEATURE_VECTOR_BACKMAP.append(parsed_fv_index)
-            parsed_fv_index += 1
-
-        #TODO: ADD NS_REPR to FEATURE_VECTOR_BACKMAP
-        # for p in self.PARSED_PROPERTIES:
-        #     property_name = p[0]
-        #     object_name = p[1]
-        #     prop_name_obj_name_pairs.append((property_name, object_name))
-        #     prop_func = PROPERTIES[property_name]["object"]
-        #     return_len = len(PROPERTIES[property_name]["returns"][0].__args__)
-        #     for _ in range(return_len):
-        #         self.FEATURE_VECTOR_BACKMAP.append(parsed_fv_index)
-        #     parsed_fv_index += 1for p in self.PARSED_PROPERTIES:
-        #     property_name = p[0]
-        #     object_name = p[1]
-        #     prop_name_obj_name_pairs.append((property_name, object_name))
-        #     prop_func = PROPERTIES[property_name]["object"]
-        #     return_len = len(PROPERTIES[property_name]["returns"][0].__args__)
-        #     for _ in range(return_len):
-        #         self.FEATURE_VECTOR_BACKMAP.append(parsed_fv_index)
-        #     parsed_fv_index += 1
-
-        for f in self.PARSED_FUNCTIONS:
-            func_name = f[0]
-            input_props = f[1]
-            property_result_idxs = []
-            for p in input_props:
-                property_name = p[0]
-                object_name = p[1]
-                # property_result_idxs.append(prop_name_obj_name_pairs.index((property_name, object_name)))
-                property_result_idxs.append(self.NS_REPR_LIST.index([property_name, object_name]))
-            f = FUNCTIONS[func_name]["object"]
-            return_len = len(FUNCTIONS[func_name]["returns"][0].__args__)
-            for _ in range(return_len):
-                self.FEATURE_VECTOR_BACKMAP.append(parsed_fv_index)
-            parsed_fv_index += 1
-            ol = [0 for _ in range(len(property_result_idxs))]
-            def func(prop_results, f=f, idxs=property_result_idxs, outlist=ol):
-                f_in = outlist
-                for i, j in enumerate(idxs):
-                    f_in[i] = prop_results[j]
-                return f(*f_in)
-            self.FUNC_COMPUTE_LAYER.append(func)
-        # init compute layer lists
-        # self.PROPERTY_COMPUTE_LAYER_SIZE = len(self.PROPERTY_COMPUTE_LAYER)
-        self.FUNC_COMPUTE_LAYER_SIZE = len(self.FUNC_COMPUTE_LAYER)
-        # self.CURRENT_PROPERTY_COMPUTE_LAYER = [0 for _ in range(self.PROPERTY_COMPUTE_LAYER_SIZE)]
-        self.CURRENT_FUNC_COMPUTE_LAYER = [0 for _ in range(self.FUNC_COMPUTE_LAYER_SIZE)]
-
-    def ns_repr_list_to_func_input(self, ns_repr_list):
-        # might be slow
-        out_list = []
-        # This assumes that all types are tuples
-        idx = 0
-        for t in self.NS_REPR_TYPES:
-            # get argument length from tuple string (Tuple[int, int] -> 2)
-            # TODO: Could move this computation to initialization, s.t. its only done once
-            arg_len = len(str(t).split('[')[1][:-1].split(','))
-            out_list.append(tuple(ns_repr_list[idx:idx+arg_len]))
-            idx += arg_len
-        return out_list
-
-    def generate_history_idxs(self):
-        # finds the indices of position properties and the indices where the history should be inserted
-        # (in obs)
-
-        pos_idxs = [] # array of tuples (x, y) for each position property
-        insertion_idxs = []
-        i = 0
-        added_hists = 0
-        for (meaning, name), type_info in zip(self.NS_REPR_LIST, self.NS_REPR_TYPES):
-            arg_len = len(str(type_info).split('[')[1][:-1].split(','))
-            if meaning == "POSITION":
-                pos_idxs.append(i)
-                insertion_idxs.append(i+arg_len+added_hists*4)
-                added_hists += 1
-            if meaning == "POSITION_HISTORY":
-                # not in obs yet, so do not add idx
-                continue
-            i += arg_len
-        self.pos_idxs = pos_idxs
-        self.insertion_idxs = insertion_idxs
+    def get_schema_key(self):
+        # everything besides the focus file itself that the compiled representation depends on
+        functions = [[k, [str(x[0].annotation) for x in v["expects"]], str(v["returns"][0]), v["options"]] for k, v in FUNCTIONS.items()]
+        schema = [COMPILED_FOCUS_VERSION, self.ENV_NAME, self.NS_REPR_LIST, [str(t) for t in self.NS_REPR_TYPES], list(self.ACTIONS), functions]
+        return hashlib.sha256(repr(schema).encode()).hexdigest()
+
+    def get_generated_yaml_key(self):
+        # a generated default yaml is fully determined by the schema and the candidate filter
+        return hashlib.sha256((self.SCHEMA_KEY + repr(sorted(self.CANDIDATE_FILTER.items()))).encode()).hexdigest()
+
+    def get_compiled_path(self, fpath):
+        return get_cache_path(fpath, ".compiled")
 
+    def read_compiled(self, fpath):
+        # compiled focus files are pickles, they are only read from the user cache (see scobi.cache)
+        if not cache_enabled():
+            return None
+        try:
+            with open(self.get_compiled_path(fpath), "rb") as f:
+                compiled = pickle.load(f)
+        except Exception: # missing, outdated or broken cache, recompile
+            return None
+        if compiled.get("version") != COMPILED_FOCUS_VERSION:
+            return None
+        return compiled
+
+    def write_compiled(self, fpath, key):
+        if not cache_enabled():
+            return
+        compiled = {
+            "version": COMPILED_FOCUS_VERSION,
+            "key": key,
+            "yaml_key": self.generated_yaml_key,
+            "objects": self.PARSED_OBJECTS,
+            "actions": self.PARSED_ACTIONS,
+            "functions": self.PARSED_FUNCTIONS,
+            "history": (self.HISTORY_DEPTH, self.HISTORY_OBJECTS),
+            "relations": self.RELATIONS,
+            "reward": self.REWARD_SPEC_DICT,
+            "plan": self.FEATURE_PLAN
+        }
+        # several subprocess envs may compile the same file, write atomically
+        cpath = self.get_compiled_path(fpath)
+        tmp_path = cpath.with_name("%s.%d.tmp" % (cpath.name, os.getpid()))
+        try:
+            make_cache_dir()
+            with open(tmp_path, "wb") as f:
+                pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cpath)
+        except OSError:
+            self.logger.GeneralWarning("Could not write compiled focus file %s." % colored(cpath.name, "light_green"))
+
+    def get_compiled_key(self, content):
+        return hashlib.sha256(content + self.SCHEMA_KEY.encode()).hexdigest()
+
+    def is_generated_yaml_up_to_date(self, fpath):
+        # the default yaml only needs a rebuild, if it was generated for a different schema or was edited since
+        compiled = self.read_compiled(fpath)
+        if compiled is None or compiled["yaml_key"] != self.get_generated_yaml_key():
+            return False
+        if compiled["key"] != self.get_compiled_key(fpath.read_bytes()):
+            return False
+        self.generated_yaml_key = compiled["yaml_key"]
+        return True
 
-    def add_history_to_obs(self, obs):
+    def get_normalization_path(self, fpath):
+        return fpath.with_name(fpath.stem + "_normalization.npz")
+
+    def init_normalization(self):
+        self.running_stats = RunningStats(self.OBSERVATION_SIZE, frozen=self.FREEZE_NORMALIZATION)
+        npath = self.get_normalization_path(self.FOCUSFILEPATH)
+        if npath.exists() and self.running_stats.load(npath, self.FOCUS_KEY):
+            self.logger.GeneralInfo("Normalization statistics %s loaded." % colored(npath.name, "light_green"))
+        elif self.FREEZE_NORMALIZATION:
+            self.logger.GeneralWarning("Normalization is frozen, but no statistics for this focus file were found.")
+        mode = "frozen" if self.FREEZE_NORMALIZATION else "enabled"
+        self.logger.GeneralInfo("Observation normalization: %s." % colored(mode, "light_green"))
+
+    def init_reward_func(self):
+        # set respective reward shaping
+        self.REWARD_FUNC = None
+        self.REWARD_SPEC = None
+        self.reward_state = None
+        if self.REWARD_SHAPING != 0:
+            if self.REWARD_SHAPING == 1:
+                rewstring = "scobi"
+            elif self.REWARD_SHAPING == 2:
+                rewstring = "env + scobi"
+            else:
+                rewstring = "unknown"
+            self.logger.GeneralInfo("Reward Shaping: %s." % colored(rewstring, "light_green"))
+            self.REWARD_FUNC = self.get_reward_func(self.ENV_NAME)
+            if self.REWARD_FUNC is not None:
+                if self.REWARD_FUNC == "norew":
+                    self.logger.GeneralError("Reward function for %s not implemented!" % colored(self.ENV_NAME, "light_green"))
+                else:
+                    self.logger.GeneralInfo("Reward function is valid. Bound.")
+            else:
+                self.logger.GeneralError("Reward function for %s is expecting properties/concepts that are missing in the focus file!" % colored(self.ENV_NAME, "light_green"))
+        else:
+            self.logger.GeneralInfo("Reward Shaping: %s." % colored("disabled", "light_yellow"))
+
+    def get_settings(self):
+        # settings of the focus that a prototype has to share with the envs created from it, see clone()
+        return {"env": self.ENV_NAME, "hide_properties": self.HIDE_PROPERTIES, "obs_dtype": self.OBSERVATION_DTYPE.name,
+                "normalize": self.NORMALIZE, "freeze_normalization": self.FREEZE_NORMALIZATION, "incremental": self.INCREMENTAL}
+
+    def __getstate__(self):
+        # prototype state shipped to vec env workers (e.g. through a forkserver). the logger, the ALE handle,
+        # the reward function and the generated extractor module are bound per env, buffers are reallocated
+        state = self.__dict__.copy()
+        for k in ("logger", "ale", "REWARD_FUNC", "EXTRACTOR", "CURRENT_FEATURE_VECTOR", "CURRENT_FEATURE_VECTOR_PROPS",
+                  "CURRENT_FEATURE_VECTOR_FUNCS", "CURRENT_FREEZE_MASK", "CURRENT_OBSERVATION", "HISTORY_BUFFER",
+                  "HISTORY_ORDER", "batch_history", "PROFILER"):
+            state[k] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.FOCUSFILEPATH is not None:
+            self.EXTRACTOR = load_extractor(self.FOCUSFILEPATH, self.FOCUS_KEY)
+        self.init_buffers()
+
+    def clone(self, logger, reward=None, profile=None):
         """
-Transforms the observation from OC_Atari to include the history of the positions
+Fresh copy of a loaded focus file for another env, skips parsing, validation and compilation of the focus file.
+The compiled plan is shared, buffers, history and reward state are per copy. reward and profile override the settings
+of the prototype, all other settings (see get_settings()) are the same.
         """
-        # obs shape: 2,n_props (2 buffers, n properties)
-        # should be: 1,n_props+(num_position_history*4)
-        # history: [*h_coords[0], *h_coords[1]] == [x,y,prev_x,prev_y]
-        new_obs = obs[1].copy()
-        histories = [[obs[1, i], obs[1, i+1], obs[0, i], obs[0, i+1]] for i in self.pos_idxs]
-        for i, hist in enumerate(histories):
-            new_obs = np.insert(new_obs, self.insertion_idxs[i], hist)
-        return new_obs
+        focus = copy.deepcopy(self, {id(self.FEATURE_PLAN): self.FEATURE_PLAN, id(self.FEATURE_SCHEMA): self.FEATURE_SCHEMA})
+        focus.logger = logger
+        if profile is not None:
+            focus.PROFILE = profile
+            focus.PROFILER = FocusProfiler(focus.FEATURE_PLAN, focus.PARSED_FUNCTIONS) if profile else None
+        if reward is not None:
+            focus.REWARD_SHAPING = reward
+        focus.prev_carry_value = None
+        focus.prev_carry_value2 = None
+        focus.batch_reward_states = []
+        focus.init_reward_func()
+        return focus
+
+    def init_observation_bounds(self):
+        # bounds of the observation entries from the concept definitions, clamped to the range of the observation dtype
+        schema = self.FEATURE_SCHEMA
+        start = schema.observation_start
+        low, high, integral = schema.low[start:], schema.high[start:], schema.integral[start:]
+        is_int = self.OBSERVATION_DTYPE.kind == "i"
+        if self.running_stats is not None:
+            if is_int:
+                self.logger.GeneralError("Normalized observations do not fit the integer observation dtype %s." % colored(self.OBSERVATION_DTYPE.name, "light_green"))
+            low = np.full(self.OBSERVATION_SIZE, -self.running_stats.clip)
+            high = np.full(self.OBSERVATION_SIZE, self.running_stats.clip)
+        elif is_int and not integral.all():
+            rounded = sorted({schema.concepts[i] for i in schema.backmap[start:][~integral]})
+            self.logger.GeneralWarning("Observation dtype %s rounds the values of %s." % (colored(self.OBSERVATION_DTYPE.name, "light_green"), ", ".join(rounded)))
+        info = np.iinfo(self.OBSERVATION_DTYPE) if is_int else np.finfo(self.OBSERVATION_DTYPE)
+        if is_int: # rounded values stay within the bounds
+            low, high = np.floor(low), np.ceil(high)
+        self.OBSERVATION_LOW = np.clip(low, float(info.min), float(info.max))
+        self.OBSERVATION_HIGH = np.clip(high, float(info.min), float(info.max))
+        if self.CLIP_OBSERVATION:
+            self.logger.GeneralInfo("Observation dtype: %s." % colored(self.OBSERVATION_DTYPE.name, "light_green"))
+
+    def save_normalization(self, fpath=None):
+        # statistics are saved next to the focus file by default
+        npath = fpath if fpath else self.get_normalization_path(self.FOCUSFILEPATH)
+        self.running_stats.save(Path(npath), self.FOCUS_KEY)
+        return npath
+
+    def load_focus_file(self, fpath):
+        content = fpath.read_bytes()
+        key = self.get_compiled_key(content)
+        self.FOCUS_KEY = key
+        compiled = self.read_compiled(fpath)
+        if compiled is not None and compiled["key"] == key:
+            # focus file and object schema unchanged, skip parsing and validation
+            self.PARSED_OBJECTS = compiled["objects"]
+            self.PARSED_ACTIONS = compiled["actions"]
+            self.PARSED_FUNCTIONS = compiled["functions"]
+            self.FEATURE_PLAN = compiled["plan"]
+            self.set_history(*compiled["history"])
+            self.RELATIONS = compiled["relations"]
+            self.REWARD_SPEC_DICT = compiled["reward"]
+            if self.generated_yaml_key is None:
+                self.generated_yaml_key = compiled["yaml_key"]
+        else:
+            in_dict = yaml.load(content, Loader=YamlLoader)
+            # collect all errors of the focus file and report them at once
+            errors = []
+            parsed_env_name = in_dict["ENVIRONMENT"]
+            if self.ENV_NAME != parsed_env_name:
+                errors.append("Env and focus file env do not match: %s, %s" % (self.ENV_NAME, parsed_env_name))
+            sdict = in_dict["SELECTION"]
+            self.PARSED_OBJECTS = self.import_objects(sdict["objects"], errors)
+            self.PARSED_ACTIONS = self.import_actions(sdict["actions"], errors)
+            self.set_history(*self.import_history(sdict.get("history"), errors))
+            self.RELATIONS = self.import_relations(sdict.get("relations"), errors)
+            self.PARSED_FUNCTIONS = self.import_functions(sdict["functions"], errors)
+            self.REWARD_SPEC_DICT = in_dict.get("REWARD")
+            if errors:
+                self.logger.FocusFileParserErrors(errors)
+            # based on the focus file selection,
+            # compile the feature plan, a single layer computation graph for the feature vector:
+            # 1     FUNC_COMPUTE_LAYER (one vectorized kernel call per function group)
+            # only the selected objects are gathered, the plan reads them from the full OCAtari layout
+            self.FEATURE_PLAN = FeaturePlan(*self.ALL_NS_REPR, self.PARSED_FUNCTIONS, self.HISTORY_DEPTH,
+                                            self.OBJECT_CATEGORIES, self.RELATIONS, self.PARSED_OBJECTS)
+            self.write_compiled(fpath, key)
+        # generated straight-line extractor, cached in the user cache
+        self.EXTRACTOR = load_extractor(fpath, key)
+        if self.EXTRACTOR is None and cache_enabled():
+            try:
+                self.EXTRACTOR = write_extractor(fpath, self.FEATURE_PLAN, key)
+            except OSError:
+                self.logger.GeneralWarning("Could not write feature extractor for %s." % colored(fpath.name, "light_green"))
+        self.FEATURE_VECTOR_BACKMAP = self.FEATURE_PLAN.backmap
+        self.FEATURE_SCHEMA = FeatureSchema(self.FEATURE_PLAN, self.PARSED_FUNCTIONS, self.HIDE_PROPERTIES, self.OBSERVATION_DTYPE)
+        self.FUNC_COMPUTE_LAYER = self.FEATURE_PLAN.func_groups
+        # init compute layer buffers
+        self.FUNC_COMPUTE_LAYER_SIZE = len(self.PARSED_FUNCTIONS)
+        self.FEATURE_VECTOR_PROPS_SIZE = self.FEATURE_PLAN.props_size
+        self.FEATURE_VECTOR_FUNCS_SIZE = self.FEATURE_PLAN.funcs_size
+        self.FEATURE_VECTOR_SIZE = self.FEATURE_PLAN.feature_vector_size
+        if self.HIDE_PROPERTIES:
+            self.OBSERVATION_SIZE = self.FEATURE_VECTOR_FUNCS_SIZE
+        else:
+            self.OBSERVATION_SIZE = self.FEATURE_VECTOR_SIZE
+        self.init_buffers()
+
+    def init_buffers(self):
+        # per env buffers of the compiled focus file
+        self.CURRENT_FEATURE_VECTOR = np.zeros(self.FEATURE_VECTOR_SIZE, dtype=np.float64)
+        self.CURRENT_FEATURE_VECTOR_PROPS = self.CURRENT_FEATURE_VECTOR[:self.FEATURE_VECTOR_PROPS_SIZE]
+        self.CURRENT_FEATURE_VECTOR_FUNCS = self.CURRENT_FEATURE_VECTOR[self.FEATURE_VECTOR_PROPS_SIZE:]
+        self.CURRENT_FREEZE_MASK = np.ones(self.FEATURE_VECTOR_SIZE, dtype=np.int64)
+        self.CURRENT_OBSERVATION = np.zeros(self.OBSERVATION_SIZE, dtype=self.OBSERVATION_DTYPE)
+        self.INCREMENTAL_PROPS = None
+        if self.PROFILE:
+            self.PROFILER = FocusProfiler(self.FEATURE_PLAN, self.PARSED_FUNCTIONS)
+        if self.HISTORY_DEPTH > 2:
+            # the history only buffers the columns of the selected objects
+            n_props = self.FEATURE_PLAN.row_width
+            self.HISTORY_BUFFER = np.zeros((self.HISTORY_DEPTH, n_props), dtype=np.float64)
+            frames = np.arange(self.HISTORY_DEPTH)
+            self.HISTORY_ORDER = [(((pos - self.HISTORY_DEPTH + 1 + frames) % self.HISTORY_DEPTH)[:, None] * n_props + np.arange(n_props)).ravel()
+                                  for pos in range(self.HISTORY_DEPTH)]
+        self.HISTORY_EMPTY = True
+        self.batch_history = None
 
 
     def get_feature_vector(self, obs):
@@ -460,99 +760,258 @@ Transforms the observation from OC_Atari to include the history of the positions
         # Instead of having to compute the properties, we get them from OC_Atari directly
 
         assert obs.shape[0] == 2, "OC_Atari window-buffer size should be 2"
-        inc_ns_repr_list = self.add_history_to_obs(obs)
-
-        self.CURRENT_PROPERTY_COMPUTE_LAYER = self.ns_repr_list_to_func_input(inc_ns_repr_list)
-
-        # calc function layer
-        for i in range(self.FUNC_COMPUTE_LAYER_SIZE):
-            f = self.FUNC_COMPUTE_LAYER[i]
-            self.CURRENT_FUNC_COMPUTE_LAYER[i] = f(self.CURRENT_PROPERTY_COMPUTE_LAYER)
-        if self.first_pass:
-            self.first_pass = False
-            props = [i for e in self.CURRENT_PROPERTY_COMPUTE_LAYER for i in e]
-            funcs = [i for e in self.CURRENT_FUNC_COMPUTE_LAYER for i in e]
-            out = props + funcs
-            self.FEATURE_VECTOR_SIZE = len(out)
-            if self.HIDE_PROPERTIES:
-                self.OBSERVATION_SIZE = len(funcs)
-            else:
-                self.OBSERVATION_SIZE = len(out)
-            self.FEATURE_VECTOR_PROPS_SIZE = len(props)
-            self.FEATURE_VECTOR_FUNCS_SIZE = len(funcs)
-            self.CURRENT_FEATURE_VECTOR_PROPS = [0 for _ in range(self.FEATURE_VECTOR_PROPS_SIZE)]
-            self.CURRENT_FEATURE_VECTOR_FUNCS = [0 for _ in range(self.FEATURE_VECTOR_FUNCS_SIZE)]
-            self.CURRENT_FREEZE_MASK = [1 for _ in range(self.FEATURE_VECTOR_SIZE)]
-
-            # unpack property layer
-            idx = 0
-            for f in self.CURRENT_PROPERTY_COMPUTE_LAYER:
-                for ff in f:
-                    self.CURRENT_FEATURE_VECTOR_PROPS[idx] = ff
-                    idx += 1
-
-            # unpack function layer
-            idx = 0
-            for f in self.CURRENT_FUNC_COMPUTE_LAYER:
-                for ff in f:
-                    self.CURRENT_FEATURE_VECTOR_FUNCS[idx] = ff
-                    idx += 1
-
-            out = self.CURRENT_FEATURE_VECTOR_PROPS + self.CURRENT_FEATURE_VECTOR_FUNCS
-            for e in out:
-                item = 0.0 if e is None else e
-                self.last_obs_vector.append(item)
-
-            if self.REWARD_SHAPING != 0:
-                reward = self.REWARD_FUNC(self.last_obs_vector)
-            else:
-                reward = 0
-
-            out = self.last_obs_vector
-            if self.HIDE_PROPERTIES:
-                out = out[self.FEATURE_VECTOR_PROPS_SIZE:]
-            return np.asarray(out, dtype=np.float32), reward
-
-        # unpack property layer
-        idx = 0
-        for f in self.CURRENT_PROPERTY_COMPUTE_LAYER:
-            for ff in f:
-                self.CURRENT_FEATURE_VECTOR_PROPS[idx] = ff
-                idx += 1
-
-        # unpack function layer
-        idx = 0
-        for f in self.CURRENT_FUNC_COMPUTE_LAYER:
-            for ff in f:
-                self.CURRENT_FEATURE_VECTOR_FUNCS[idx] = ff
-                idx += 1
-
-        out = self.CURRENT_FEATURE_VECTOR_PROPS + self.CURRENT_FEATURE_VECTOR_FUNCS
+        if self.HISTORY_DEPTH > 2:
+            obs = self.push_history(obs)
+        fv = self.CURRENT_FEATURE_VECTOR
+        if self.PROFILER is not None:
+            raw = self.FEATURE_PLAN.raw_buffer(obs)
+            frozen = self.PROFILER.compute(self.FEATURE_PLAN, raw, self.CURRENT_FEATURE_VECTOR_PROPS, self.CURRENT_FEATURE_VECTOR_FUNCS)
+        elif self.INCREMENTAL:
+            raw = self.FEATURE_PLAN.raw_buffer(obs)
+            props = self.FEATURE_PLAN.gather(raw, self.CURRENT_FEATURE_VECTOR_PROPS)
+            self.compute_functions_incremental(props)
+            frozen = self.FEATURE_PLAN.invisible_features(raw)
+        elif self.EXTRACTOR is not None:
+            # generated extractor of the focus file, same graph with constant indices
+            frozen = self.EXTRACTOR.extract(obs, fv)
+        else:
+            raw = self.FEATURE_PLAN.raw_buffer(obs)
+            props = self.FEATURE_PLAN.gather(raw, self.CURRENT_FEATURE_VECTOR_PROPS)
+            # calc function layer
+            self.FEATURE_PLAN.compute_functions(props, self.CURRENT_FEATURE_VECTOR_FUNCS)
+            frozen = self.FEATURE_PLAN.invisible_features(raw)
+
         # freeze feature entries that are derived from invisible objects
         # objects are distinguished by order, not id
         # if object id=1 on position 1 becomes invisible, and obj id=2, pos=2 remains visible
         # obj with id=2 will be pos=1 and objc id=1 will be first position of hidden objects
-        for i in range(self.FEATURE_VECTOR_SIZE):
-            if out[i] is None:
-                out[i] = 0 #dont freeze. turns out feezing was very bad
-                #out[i] = self.last_obs_vector[i]
-                self.CURRENT_FREEZE_MASK[i] = 0
-            else:
-                self.CURRENT_FREEZE_MASK[i] = 1
-        self.last_obs_vector = out
+        if frozen is None:
+            self.CURRENT_FREEZE_MASK[:] = 1
+        else:
+            fv[frozen] = 0 #dont freeze. turns out feezing was very bad
+            np.logical_not(frozen, out=self.CURRENT_FREEZE_MASK, casting="unsafe")
 
         if self.REWARD_SHAPING != 0:
-            reward = self.REWARD_FUNC(out)
+            start = time.perf_counter()
+            reward = self.REWARD_FUNC(fv)
+            if self.PROFILER is not None:
+                self.PROFILER.add("REWARD", start)
         else:
             reward = 0
+        out = self.CURRENT_OBSERVATION
         if self.HIDE_PROPERTIES:
-            out = out[self.FEATURE_VECTOR_PROPS_SIZE:]
-        return np.asarray(out, dtype=np.float32), reward
+            obs_src = self.CURRENT_FEATURE_VECTOR_FUNCS
+        else:
+            obs_src = fv
+        self.write_observation(obs_src, out)
+        return out.copy(), reward
+
+    def write_observation(self, obs_src, out):
+        # (..., obs_size) feature values -> observation dtype
+        if self.running_stats is not None:
+            self.running_stats.update(obs_src)
+            if not self.CLIP_OBSERVATION:
+                return self.running_stats.normalize(obs_src, out)
+            obs_src = self.running_stats.normalize(obs_src, np.empty(obs_src.shape, dtype=np.float64))
+        if not self.CLIP_OBSERVATION:
+            out[...] = obs_src
+            return out
+        values = np.clip(obs_src, self.OBSERVATION_LOW, self.OBSERVATION_HIGH)
+        if self.OBSERVATION_DTYPE.kind == "i":
+            np.rint(values, out=values)
+        out[...] = values
+        return out
+
+    def push_history(self, obs):
+        # write the OCAtari buffer into the ring buffer, returns the buffered frames, oldest first
+        obs = self.FEATURE_PLAN.select_columns(obs)
+        if self.HISTORY_EMPTY: # after reset, the history is the first frame
+            self.HISTORY_BUFFER[:] = obs[0]
+            self.HISTORY_EMPTY = False
+        self.HISTORY_POS = (self.HISTORY_POS + 1) % self.HISTORY_DEPTH
+        self.HISTORY_BUFFER[self.HISTORY_POS - 1] = obs[0]
+        self.HISTORY_BUFFER[self.HISTORY_POS] = obs[1]
+        return self.HISTORY_BUFFER.take(self.HISTORY_ORDER[self.HISTORY_POS]).reshape(self.HISTORY_BUFFER.shape)
+
+    def reset_history(self):
+        self.HISTORY_EMPTY = True
+
+    def compute_functions_incremental(self, props):
+        # the function layer is cached unmasked, s.t. masked (zeroed) entries can be reused once their objects are visible again
+        if self.INCREMENTAL_PROPS is None:
+            self.INCREMENTAL_FUNCS = np.zeros(self.FEATURE_VECTOR_FUNCS_SIZE, dtype=np.float64)
+            self.FEATURE_PLAN.compute_functions(props, self.INCREMENTAL_FUNCS)
+            recomputed = total = len(self.PARSED_FUNCTIONS)
+        else:
+            recomputed, total = self.FEATURE_PLAN.compute_functions_incremental(props, self.INCREMENTAL_PROPS, self.INCREMENTAL_FUNCS)
+        self.INCREMENTAL_PROPS = props.copy()
+        self.CURRENT_FEATURE_VECTOR_FUNCS[:] = self.INCREMENTAL_FUNCS
+        self.LAST_REUSE_RATIO = (total - recomputed) / total if total else 0.0
+        self.REUSE_STATS["recomputed"] += recomputed
+        self.REUSE_STATS["reused"] += total - recomputed
+
+    def get_reuse_ratio(self):
+        # share of function instances reused from the previous step, over all steps in incremental mode
+        total = self.REUSE_STATS["recomputed"] + self.REUSE_STATS["reused"]
+        return self.REUSE_STATS["reused"] / total if total else 0.0
+
+    def get_profile(self):
+        # per concept and object costs recorded so far, see FocusProfiler.as_dict()
+        return self.PROFILER.as_dict()
+
+    def get_feature_vector_batch(self, obs_batch):
+        # same computation graph as get_feature_vector, evaluated for n environments at once
+        # IN    (n_envs, 2, n_props) OC_Atari buffers
+        # OUT   (n_envs, obs_size) observations, (n_envs,) shaped rewards, (n_envs, fv_size) freeze masks
+        assert obs_batch.ndim == 3 and obs_batch.shape[1] == 2, "expected (n_envs, 2, n_props) OC_Atari buffers"
+        if self.HISTORY_DEPTH > 2:
+            obs_batch = self.push_history_batch(obs_batch)
+        fv, freeze_mask = self.compute_batch(obs_batch)
+        rewards = self.get_batch_rewards(fv)
+        return self.get_batch_observation(fv), rewards, freeze_mask
+
+    def get_feature_vector_rows(self, obs_batch, env_idxs, reset):
+        """
+Second evaluation within a step of a batch, for the envs env_idxs only (auto resets of a vector env).
+Envs marked in reset start over like after Environment.reset(), the others continue like after a regular step
+(e.g. the no-op step after a lost life). The other envs of the batch are untouched.
+Requires a preceding get_feature_vector_batch() of the whole batch, same returns for the given envs.
+        """
+        env_idxs = np.asarray(env_idxs, dtype=np.intp)
+        reset = np.asarray(reset, dtype=bool)
+        for i in env_idxs[reset]:
+            self.reset_batch_reward_state(i)
+        if self.HISTORY_DEPTH > 2:
+            obs_batch = self.push_history_rows(obs_batch, env_idxs, reset)
+        fv, freeze_mask = self.compute_batch(obs_batch)
+        rewards = self.get_batch_rewards(fv, env_idxs)
+        return self.get_batch_observation(fv), rewards, freeze_mask
+
+    def compute_batch(self, obs_batch):
+        # masked (n_envs, fv_size) feature vectors and freeze masks of (n_envs, history_depth, row_width) buffers
+        fv = np.empty((len(obs_batch), self.FEATURE_VECTOR_SIZE), dtype=np.float64)
+        raw = self.FEATURE_PLAN.raw_buffer(obs_batch)
+        props = fv[:, :self.FEATURE_VECTOR_PROPS_SIZE]
+        funcs = fv[:, self.FEATURE_VECTOR_PROPS_SIZE:]
+        if self.PROFILER is not None:
+            frozen = self.PROFILER.compute(self.FEATURE_PLAN, raw, props, funcs)
+        else:
+            props[:] = self.FEATURE_PLAN.gather(raw)
+            self.FEATURE_PLAN.compute_functions(props, funcs)
+            frozen = self.FEATURE_PLAN.invisible_features(raw)
+        if frozen is None:
+            freeze_mask = np.ones(fv.shape, dtype=np.int64)
+        else:
+            fv[frozen] = 0
+            freeze_mask = np.logical_not(frozen).astype(np.int64)
+        return fv, freeze_mask
+
+    def get_batch_rewards(self, fv, env_idxs=None):
+        # shaped rewards of a batch (or of the envs env_idxs of it), advances their reward state
+        n_envs = len(fv)
+        rewards = np.zeros(n_envs, dtype=np.float64)
+        if self.REWARD_SPEC is not None and self.REWARD_SHAPING != 0:
+            # per env state arrays, all envs in one evaluation
+            if env_idxs is None:
+                if self.batch_reward_spec_state is None or len(self.batch_reward_spec_state[0]) != n_envs:
+                    self.batch_reward_spec_state = self.REWARD_SPEC.init_state(n_envs)
+                rewards = self.REWARD_SPEC(fv, self.batch_reward_spec_state)
+            else:
+                state = [None if s is None else s[env_idxs] for s in self.batch_reward_spec_state]
+                rewards = self.REWARD_SPEC(fv, state)
+                for s, rows in zip(self.batch_reward_spec_state, state):
+                    if s is not None:
+                        s[env_idxs] = rows
+        elif self.REWARD_SHAPING != 0:
+            env_idxs = range(n_envs) if env_idxs is None else env_idxs
+            self.init_batch_reward_states(max(env_idxs) + 1)
+            for j, i in enumerate(env_idxs):
+                # reward functions are stateful, swap in the state of env i
+                self.swap_reward_state(i)
+                rewards[j] = self.REWARD_FUNC(fv[j])
+                self.swap_reward_state(i)
+        return rewards
+
+    def get_batch_observation(self, fv):
+        if self.HIDE_PROPERTIES:
+            fv = fv[:, self.FEATURE_VECTOR_PROPS_SIZE:]
+        return self.write_observation(fv, np.empty(fv.shape, dtype=self.OBSERVATION_DTYPE))
+
+    def push_history_batch(self, obs_batch):
+        # one ring buffer per env, all envs of a batch advance in lockstep
+        n_envs = obs_batch.shape[0]
+        obs_batch = self.FEATURE_PLAN.select_columns(obs_batch)
+        if self.batch_history is None or len(self.batch_history[0]) != n_envs:
+            self.batch_history = (np.zeros((n_envs,) + self.HISTORY_BUFFER.shape, dtype=np.float64), np.ones(n_envs, dtype=bool))
+        buffer, empty = self.batch_history
+        if empty.any():
+            buffer[empty] = obs_batch[empty, 0:1]
+            empty[:] = False
+        self.HISTORY_POS = (self.HISTORY_POS + 1) % self.HISTORY_DEPTH
+        buffer[:, self.HISTORY_POS - 1] = obs_batch[:, 0]
+        buffer[:, self.HISTORY_POS] = obs_batch[:, 1]
+        return buffer.reshape(n_envs, -1).take(self.HISTORY_ORDER[self.HISTORY_POS], axis=1).reshape(buffer.shape)
+
+    def push_history_rows(self, obs_batch, env_idxs, reset):
+        # push a frame for the envs env_idxs of the batch only, the shared ring position stays.
+        # returns their (n, history_depth, row_width) histories, oldest frame first
+        obs_batch = self.FEATURE_PLAN.select_columns(obs_batch)
+        buffer, empty = self.batch_history
+        order = self.HISTORY_ORDER[self.HISTORY_POS]
+        rows = buffer[env_idxs].reshape(len(env_idxs), -1)
+        ordered = rows.take(order, axis=1).reshape((len(env_idxs),) + self.HISTORY_BUFFER.shape)
+        ordered[:, :-1] = ordered[:, 1:].copy()
+        start = reset | empty[env_idxs]
+        ordered[start] = obs_batch[start, 0:1]
+        ordered[:, -2] = obs_batch[:, 0]
+        ordered[:, -1] = obs_batch[:, 1]
+        rows[:, order] = ordered.reshape(len(env_idxs), -1)
+        buffer[env_idxs] = rows.reshape(ordered.shape)
+        empty[env_idxs] = False
+        return ordered
+
+    def reset_batch_history(self, env_idx):
+        # equivalent of reset_history() for env env_idx of a batch
+        if self.batch_history is not None:
+            self.batch_history[1][env_idx] = True
+
+    def init_batch_reward_states(self, n_envs):
+        while len(self.batch_reward_states) < n_envs:
+            self.batch_reward_states.append({
+                "reward_history": [0, 0],
+                "reward_threshold": -1,
+                "reward_subgoals": 0,
+                "reward_helper_var": False,
+                "prev_carry_value": None,
+                "prev_carry_value2": None,
+                "ale": self.ale
+            })
+
+    def swap_reward_state(self, env_idx):
+        state = self.batch_reward_states[env_idx]
+        for k, v in state.items():
+            state[k] = getattr(self, k)
+            setattr(self, k, v)
+
+    def reset_batch_reward_state(self, env_idx):
+        # equivalent of the reward resets in Environment.reset() for env env_idx of a batch
+        self.init_batch_reward_states(env_idx + 1)
+        state = self.batch_reward_states[env_idx]
+        state["reward_threshold"] = -1
+        state["reward_history"] = [0, 0]
+        if self.batch_reward_spec_state is not None and env_idx < len(self.batch_reward_spec_state[0]):
+            self.REWARD_SPEC.reset_state(self.batch_reward_spec_state, env_idx)
+
+    def reset_reward_state(self):
+        # reward resets on Environment.reset()
+        self.reward_threshold = -1
+        self.reward_history = [0, 0]
+        if self.reward_state is not None:
+            self.REWARD_SPEC.reset_state(self.reward_state)
 
     def get_feature_vector_description(self):
-        # fv = self.PARSED_PROPERTIES + self.PARSED_FUNCTIONS
-        fv = self.NS_REPR_LIST + self.PARSED_FUNCTIONS
-        return (fv, np.array(self.FEATURE_VECTOR_BACKMAP))
+        # fv = self.PARSED_PROPERTIES + self.PARSED_FUNCTIONS, see FEATURE_SCHEMA for the full layout
+        return (self.FEATURE_SCHEMA.features, self.FEATURE_SCHEMA.backmap)
 
     def get_current_freeze_mask(self):
         return self.CURRENT_FREEZE_MASK
@@ -603,120 +1062,27 @@ Transforms the observation from OC_Atari to include the history of the positions
         return custom_func
 
     def get_reward_func(self, env):
-        fv_description, fv_backmap = self.get_feature_vector_description()
-        i = 0
-        if "Pong" in env:
-            # pong reward function
-            idxs = np.empty(0)
-            for feature in fv_description:
-                i += 1
-                feature_name = feature[0]
-                feature_signature = feature[1]
-                if feature_name == "DISTANCE":
-                    input1 = feature_signature[0]
-                    input2 = feature_signature[1]
-                    if input1[0] == "POSITION" and input1[1] == "Player1" and input2[0] == "POSITION" and input2[1] == "Ball1":
-                        idxs = np.where(fv_backmap == i-1)[0]
-            if not idxs.any():
-                return None
-            # reward when player decreases y-distance to ball
-            def reward(fv, idxs=idxs):
-                v_entries = fv[idxs[0]:idxs[-1]+1]
-                self.reward_history[0] = self.reward_history[1]
-                self.reward_history[1] = abs(v_entries[1]) # absolute distance on y-axis
-                delta = self.reward_history[0] - self.reward_history[1] #decrease in distance: positive sign
-                return delta * 0.1
-            return reward
-        elif "Kangaroo" in env:
-            # kangaroo reward function
-            player_idxs = np.empty(0)
-            distance_idxs = np.empty(0)
-            for feature in fv_description:
-                i += 1
-                feature_name = feature[0]
-                feature_signature = feature[1]
-                if feature_name == "POSITION":
-                    if feature_signature == "Player1":
-                        player_idxs = np.where(fv_backmap == i-1)[0]
-                if feature_name == "DISTANCE":
-                    input1 = feature_signature[0]
-                    input2 = feature_signature[1]
-                    if input1[0] == "POSITION" and input1[1] == "Player1" and input2[0] == "POSITION" and input2[1] == "Ladder1":
-                        distance_idxs = np.where(fv_backmap == i-1)[0]
-
-            if not (player_idxs.any() and distance_idxs.any()):
+        # REWARD section of the focus file, else the packaged default spec of the game (scobi/resources/rewards)
+        spec = self.REWARD_SPEC_DICT
+        if spec is None:
+            spec = load_default_spec(env)
+        if spec is not None:
+            errors = []
+            reward_spec = RewardSpec(spec, self.FEATURE_SCHEMA, errors)
+            if errors:
+                if self.REWARD_SPEC_DICT is not None:
+                    self.logger.FocusFileParserErrors(errors)
                 return None
-            # reward when player achieves new y-coord low and goes to ladder
-            def reward(fv, p_idxs=player_idxs, d_idxs=distance_idxs):
-                p_entries = fv[p_idxs[0]:p_idxs[-1]+1]
-                y_coord_reward = 0
-                if self.reward_threshold == -1: #set starting y
-                    self.reward_threshold = p_entries[1]
-                    y_coord_reward = 0
-                else:
-                    delta = self.reward_threshold - abs(p_entries[1])
-                    if delta > 0:
-                        self.reward_threshold = abs(p_entries[1])
-                        y_coord_reward = delta # reward when player achieves new y-coord low an
-
-                d_entries = fv[d_idxs[0]:d_idxs[-1]+1]
-                self.reward_history[0] = self.reward_history[1]
-                self.reward_history[1] = abs(d_entries[0]) # x-dist
-                delta = self.reward_history[0] - self.reward_history[1] # decreasing x-distance to Scale1
-                distance_reward = delta if 100 > delta else 0 # ignore 100+ spikes
-                return y_coord_reward + 5 * distance_reward
-            return reward
-        elif "Skiing" in env:
-            # skiing reward function
-            dscale = 1
-            player_position_idxs = np.empty(0)
-            flag_center_idxs = np.empty(0)
-            flag_velocity_idxs = np.empty(0)
-            for feature in fv_description:
-                i += 1
-                feature_name = feature[0]
-                feature_signature = feature[1]
-                if feature_name == "CENTER":
-                    input1 = feature_signature[0]
-                    input2 = feature_signature[1]
-                    if input1[0] == "POSITION" and input1[1] == "Flag1" and input2[0] == "POSITION" and input2[1] == "Flag2":
-                        flag_center_idxs = np.where(fv_backmap == i-1)[0]
-                if feature_name == "POSITION":
-                    if feature_signature == "Player1":
-                        player_position_idxs = np.where(fv_backmap == i-1)[0]
-                if feature_name == "DIR_VELOCITY":
-                    input = feature_signature[0]
-                    if input[0] == "POSITION_HISTORY" and input[1] == "Flag1":
-                        flag_velocity_idxs = np.where(fv_backmap == i-1)[0]
-            if not (player_position_idxs.any() and flag_center_idxs.any() and flag_velocity_idxs.any()):
-                return None
-            # reward for high player velocity and player decreases euc-distance to center of flag1 and flag2
-            def reward(fv, c_idxs=flag_center_idxs, p_idxs=player_position_idxs, v_idxs=flag_velocity_idxs):
-                p_entries = fv[p_idxs[0]:p_idxs[-1]+1]
-                c_entries = fv[c_idxs[0]:c_idxs[-1]+1]
-                v_entries = fv[v_idxs[0]:v_idxs[-1]+1]
-                euc_dist = FUNCTIONS["EUCLIDEAN_DISTANCE"]["object"]
-                player_flag_distance = euc_dist(p_entries, c_entries)[0]
-                self.reward_history[0] = self.reward_history[1]
-                self.reward_history[1] = player_flag_distance
-                delta = self.reward_history[0] - self.reward_history[1] #decrease in distance: positive sign
-                player_flag_distance_delta = delta * dscale if p_entries[1] < c_entries[1] else 0 #only scale and send if next flag is ahead not behind
-                player_flag_distance_delta = player_flag_distance_delta if abs(player_flag_distance_delta) < 20 * dscale else 0 #omit bad delta spikes when new flag in focus
-                euc_velocity_flag = np.clip(math.sqrt((v_entries[0])**2 + (v_entries[1])**2), 0, 10) #clip to 10
-                # emit subgoal reward when player passes through 20x10px area around flag center
-                if p_entries[0] > (c_entries[0] -10) and p_entries[0] < (c_entries[0] + 10)and p_entries[1] > (c_entries[1] -5) and p_entries[1] < (c_entries[1] + 5):
-                    if not self.reward_helper_var:
-                        self.reward_subgoals = 100
-                        self.reward_helper_var = True
-                else:
-                    self.reward_helper_var = False
-                    self.reward_subgoals = 0
-                return self.reward_subgoals + euc_velocity_flag + player_flag_distance_delta
-            return reward
-        elif "Seaquest" in env:
+            self.REWARD_SPEC = reward_spec
+            self.reward_state = reward_spec.init_state()
+            return self.spec_reward
+        if "Seaquest" in env:
+            # needs the RAM, not expressible with the feature vector
             return self._seaquest_oxygen_shaping()
-        else:
-            return "norew"
+        return "norew"
+
+    def spec_reward(self, fv):
+        return self.REWARD_SPEC(fv, self.reward_state)
 
     def reset_carry_value(self):
         self.prev_carry_value = None
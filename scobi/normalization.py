@@ -0,0 +1,66 @@
+"""Online feature normalization for the scobi feature pipeline"""
+import os
+import numpy as np
+
+
+class RunningStats():
+    """
+Running mean and variance of the observation vector (Welford, batches are merged with Chan's parallel update).
+Observations are normalized like VecNormalize: clip((x - mean) / sqrt(var + epsilon), -clip, clip).
+In frozen mode the statistics are no longer updated, e.g. for evaluation.
+    """
+    def __init__(self, size, clip=10.0, epsilon=1e-8, frozen=False):
+        self.size = size
+        self.clip = clip
+        self.epsilon = epsilon
+        self.frozen = frozen
+        self.count = 0
+        self.mean = np.zeros(size, dtype=np.float64)
+        self.m2 = np.zeros(size, dtype=np.float64) # sum of squared deviations from the mean
+        self.std = np.ones(size, dtype=np.float64)
+
+    @property
+    def var(self):
+        return self.m2 / self.count if self.count else np.ones(self.size, dtype=np.float64)
+
+    def update(self, x):
+        # x: (size,) or (n, size)
+        if self.frozen:
+            return
+        x = np.asarray(x, dtype=np.float64).reshape(-1, self.size)
+        n = x.shape[0]
+        batch_mean = x.mean(axis=0)
+        batch_m2 = ((x - batch_mean)**2).sum(axis=0)
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean += delta * (n / total)
+        self.m2 += batch_m2 + delta**2 * (self.count * n / total)
+        self.count = total
+        np.sqrt(self.var + self.epsilon, out=self.std)
+
+    def normalize(self, x, out):
+        # normalize x into out, both (..., size)
+        np.subtract(x, self.mean, out=out, casting="unsafe")
+        np.divide(out, self.std, out=out, casting="unsafe")
+        np.clip(out, -self.clip, self.clip, out=out)
+        return out
+
+    def save(self, path, key):
+        # key identifies the focus file (and thereby the observation layout) the statistics belong to
+        tmp_path = path.with_name("%s.%d.tmp" % (path.name, os.getpid()))
+        with open(tmp_path, "wb") as f:
+            np.savez(f, key=key, count=self.count, mean=self.mean, m2=self.m2, clip=self.clip, epsilon=self.epsilon)
+        os.replace(tmp_path, path)
+
+    def load(self, path, key):
+        # returns False if the statistics belong to a different focus file
+        with np.load(path) as stats:
+            if str(stats["key"]) != key or stats["mean"].shape != (self.size,):
+                return False
+            self.count = int(stats["count"])
+            self.mean[:] = stats["mean"]
+            self.m2[:] = stats["m2"]
+            self.clip = float(stats["clip"])
+            self.epsilon = float(stats["epsilon"])
+        np.sqrt(self.var + self.epsilon, out=self.std)
+        return True
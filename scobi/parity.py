@@ -0,0 +1,91 @@
+"""Parity checks of the array kernels against their scalar reference functions"""
+import numpy as np
+from scobi.utils.decorators import FUNCTIONS
+
+
+def record_observations(oc_env, steps, seed=0):
+    """
+Roll out random actions in an OCAtari env and record its (2, n_props) buffers.
+Returns (steps, 2, n_props) float64 observations (invisible objects are NaN) and the (steps,) episode start flags.
+    """
+    observations = []
+    starts = []
+    rng = np.random.default_rng(seed)
+    n_actions = oc_env.action_space.n
+    obs, _ = oc_env.reset(seed=seed)
+    start = True
+    for _ in range(steps):
+        observations.append(np.asarray(obs, dtype=np.float64))
+        starts.append(start)
+        obs, _, truncated, terminated, _ = oc_env.step(int(rng.integers(n_actions)))
+        start = terminated or truncated
+        if start:
+            obs, _ = oc_env.reset()
+    return np.array(observations), np.array(starts)
+
+
+def history_buffers(plan, observations, starts):
+    # (steps, history_depth, row_width) buffers of a feature plan, oldest frame first, as buffered by Focus.push_history
+    if plan.history_depth <= 2:
+        return observations
+    out = np.empty((len(observations), plan.history_depth, plan.row_width), dtype=np.float64)
+    buffer = np.zeros(out.shape[1:], dtype=np.float64)
+    for t, (obs, start) in enumerate(zip(plan.select_columns(observations), starts)):
+        if start or t == 0: # after reset, the history is the first frame
+            buffer[:] = obs[0]
+        buffer[:-1] = buffer[1:]
+        buffer[-2:] = obs
+        out[t] = buffer
+    return out
+
+
+def scalar_reference(fname, args, visible, options, return_len):
+    # the registered scalar function, evaluated for every visible instance
+    func = FUNCTIONS[fname]["object"]
+    out = np.full(visible.shape + (return_len,), np.nan)
+    for idx in zip(*np.nonzero(visible)):
+        out[idx] = func(*[tuple(a[idx].tolist()) for a in args], **options)
+    return out
+
+
+def check_plan_parity(plan, parsed_functions, observations, starts=None, dtype=np.float32, atol=0.0):
+    """
+Evaluate every function group of a feature plan that has a registered kernel on the recorded observations
+and compare it against the scalar functions. Only visible instances are compared, the others are masked by the plan.
+Values are compared after casting to dtype (the observation dtype by default).
+Returns one report per function instance with mismatches: index into parsed_functions, function, params,
+number of mismatching samples, max absolute error and the first mismatching sample.
+    """
+    observations = np.asarray(observations, dtype=np.float64)
+    if starts is None:
+        starts = np.zeros(len(observations), dtype=bool)
+    raw = plan.raw_buffer(history_buffers(plan, observations, starts))
+    props = plan.gather(raw)
+    reports = []
+    for group, members in zip(plan.func_groups, plan.func_group_members):
+        if FUNCTIONS[group.name]["kernel"] is None:
+            continue
+        args = [props[:, idxs] for idxs in group.input_idxs]
+        visible = group.visible(args)
+        kernel_out = np.asarray(group.evaluate(args), dtype=np.float64).astype(dtype)
+        scalar_out = scalar_reference(group.name, args, visible, group.options, group.output_idxs.shape[1]).astype(dtype)
+        for j, i in enumerate(members):
+            k, s = kernel_out[:, j][visible[:, j]], scalar_out[:, j][visible[:, j]]
+            diff = np.abs(k.astype(np.float64) - s.astype(np.float64))
+            bad = (diff > atol) | (np.isnan(k) != np.isnan(s))
+            bad = bad.any(axis=-1)
+            if bad.any():
+                reports.append({
+                    "instance": i,
+                    "function": group.name,
+                    "params": parsed_functions[i][1],
+                    "mismatches": int(bad.sum()),
+                    "max_abs_error": float(np.nanmax(diff)) if not np.isnan(diff).all() else float("nan"),
+                    "first_sample": int(np.flatnonzero(visible[:, j])[np.argmax(bad)]),
+                })
+    return reports
+
+
+def check_focus_parity(focus, observations, starts=None, dtype=np.float32, atol=0.0):
+    # kernel parity of all functions selected in the focus file, see check_plan_parity
+    return check_plan_parity(focus.FEATURE_PLAN, focus.PARSED_FUNCTIONS, observations, starts, dtype, atol)
@@ -0,0 +1,330 @@
+"""Compiled feature plan for scobi focus files"""
+import inspect
+import numpy as np
+from scobi.concepts import NearestK, PROPERTY_BOUNDS
+from scobi.utils.decorators import FUNCTIONS
+
+# properties built from the buffered frames instead of being read from one OCAtari frame
+HISTORY_MEANINGS = ("POSITION_HISTORY", "POSITION_TRAIL")
+# function arguments that stand for all slots of an object category, not a single property
+RELATION_MEANINGS = ("POSITIONS",)
+
+
+def ns_type_len(ns_type):
+    # number of values of a neurosymbolic type (Tuple[int, int] -> 2)
+    return len(ns_type.__args__)
+
+
+def function_options(fname, relations=None):
+    # options of a function (parameters with defaults), overridden by the relations of the focus file
+    relations = relations if relations else {}
+    return {k: relations.get(k, v) for k, v in FUNCTIONS[fname]["options"].items()}
+
+
+def function_return_len(fname, options):
+    ret_type = FUNCTIONS[fname]["returns"][0]
+    if ret_type is NearestK:
+        return 2 * options["k"]
+    return ns_type_len(ret_type)
+
+
+def scalar_kernel(func, return_len):
+    # fallback for functions without an array kernel: evaluate the scalar function for every visible instance
+    def kernel(*args, visible, **options):
+        out = np.full(visible.shape + (return_len,), np.nan)
+        for idx in zip(*np.nonzero(visible)):
+            out[idx] = func(*[tuple(a[idx].tolist()) for a in args], **options)
+        return out
+    return kernel
+
+
+def resolve_kernel(fname, return_len):
+    # registered array kernel, else the scalar function
+    kernel = FUNCTIONS[fname]["kernel"]
+    if kernel is None:
+        kernel = scalar_kernel(FUNCTIONS[fname]["object"], return_len)
+    return kernel
+
+
+def takes_visible(kernel):
+    # kernels opt into the visibility mask with a 'visible' parameter
+    return "visible" in inspect.signature(kernel).parameters
+
+
+class FunctionGroup():
+    """
+All selected instances of one function (with equally long arguments), evaluated with a single kernel call.
+Kernels get the stacked argument arrays, (..., n_instances, arg_len) each, and optionally the (..., n_instances)
+visibility mask of the instances: no NaN in any argument that is not a relation.
+    """
+    def __init__(self, name, input_idxs, output_idxs, options=None, relation_args=None):
+        self.name = name
+        self.input_idxs = input_idxs # per argument: (n_instances, arg_len) indices into the property layer
+        self.output_idxs = output_idxs # (n_instances, return_len) indices into the function layer
+        self.options = options if options else {} # keyword options of the kernel, e.g. k of NEAREST_K
+        relation_args = relation_args if relation_args else [False] * len(input_idxs)
+        self.masking_args = [i for i, relation in enumerate(relation_args) if not relation]
+        self.resolve()
+
+    def resolve(self):
+        self.kernel = resolve_kernel(self.name, self.output_idxs.shape[1])
+        self.kernel_visible = takes_visible(self.kernel)
+
+    def __getstate__(self):
+        # kernels are resolved by name, s.t. compiled plans can be pickled
+        state = self.__dict__.copy()
+        del state["kernel"]
+        del state["kernel_visible"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.resolve()
+
+    def visible(self, args):
+        visible = np.ones(args[0].shape[:-1], dtype=bool)
+        for i in self.masking_args:
+            visible &= ~np.isnan(args[i]).any(axis=-1)
+        return visible
+
+    def evaluate(self, args):
+        if self.kernel_visible:
+            return self.kernel(*args, visible=self.visible(args), **self.options)
+        return self.kernel(*args, **self.options)
+
+    def __call__(self, props, funcs, instances=None):
+        # evaluate all instances, or only the given ones
+        if instances is None:
+            args = [props[..., idxs] for idxs in self.input_idxs]
+            funcs[..., self.output_idxs] = self.evaluate(args)
+        else:
+            args = [props[..., idxs[instances]] for idxs in self.input_idxs]
+            funcs[..., self.output_idxs[instances]] = self.evaluate(args)
+
+
+class FeaturePlan():
+    """
+Index layout of the feature vector, compiled once from the parsed focus file.
+The property layer is gathered from the raw (2, n_props) OCAtari buffer with a single np.take,
+every function reads its inputs from fixed slices of the property layer.
+Only the objects selected in the focus file are part of the plan, the other slots of the buffer are never read.
+    """
+    def __init__(self, ns_repr_list, ns_repr_types, parsed_functions, history_depth=2, object_categories=None, relations=None,
+                 selected_objects=None):
+        # the raw buffer has history_depth rows, oldest frame first, current frame last
+        self.history_depth = history_depth
+        # width of one OCAtari buffer row (POSITION_HISTORY and POSITION_TRAIL are not provided by OCAtari)
+        self.n_props = sum(ns_type_len(t) for (meaning, _), t in zip(ns_repr_list, ns_repr_types) if meaning not in HISTORY_MEANINGS)
+        # selection pushdown: only the properties of the selected objects are gathered, ns_repr_list is the full OCAtari layout
+        selected = set(name for _, name in ns_repr_list) if selected_objects is None else set(selected_objects)
+        raw_offsets = {}
+        row_columns = []
+        raw_idx = 0
+        for (meaning, name), ns_type in zip(ns_repr_list, ns_repr_types):
+            if meaning in HISTORY_MEANINGS:
+                continue
+            arg_len = ns_type_len(ns_type)
+            raw_offsets[(meaning, name)] = raw_idx
+            if name in selected:
+                row_columns += range(raw_idx, raw_idx + arg_len)
+            raw_idx += arg_len
+        # OCAtari columns of the selected objects. buffered histories only keep these columns (compact rows),
+        # the OCAtari buffer itself is read as is
+        self.row_columns = np.array(row_columns, dtype=np.intp)
+        self.compact_rows = history_depth > 2
+        self.row_width = len(row_columns) if self.compact_rows else self.n_props
+        row_pos = dict(zip(row_columns, range(len(row_columns)))) if self.compact_rows else None
+        self.ns_repr_list = []
+        self.ns_repr_index = {}
+        self.ns_repr_slices = []
+        self.backmap = []
+
+        self.object_names = []
+        raw_owners = {}
+
+        # property layer: indices into the flattened buffer
+        current = (history_depth - 1) * self.row_width
+        previous = (history_depth - 2) * self.row_width
+        gather_idxs = []
+        position_offsets = {}
+        for (meaning, name), ns_type in zip(ns_repr_list, ns_repr_types):
+            if name not in selected:
+                continue
+            i = len(self.ns_repr_list)
+            start = len(gather_idxs)
+            if meaning == "POSITION_HISTORY":
+                # [x, y, prev_x, prev_y] of the same object's POSITION
+                pos = position_offsets[name]
+                gather_idxs += [current + pos, current + pos + 1, previous + pos, previous + pos + 1]
+            elif meaning == "POSITION_TRAIL":
+                # [x_t, y_t, x_t-1, y_t-1, ...] over all frames of the buffer
+                pos = position_offsets[name]
+                for frame in reversed(range(history_depth)):
+                    gather_idxs += [frame * self.row_width + pos, frame * self.row_width + pos + 1]
+            else:
+                arg_len = ns_type_len(ns_type)
+                pos = raw_offsets[(meaning, name)]
+                if row_pos is not None:
+                    pos = row_pos[pos]
+                if meaning == "POSITION":
+                    position_offsets[name] = pos
+                if name not in self.object_names:
+                    self.object_names.append(name)
+                gather_idxs += [current + pos + k for k in range(arg_len)]
+                for k in range(arg_len):
+                    raw_owners[pos + k] = self.object_names.index(name)
+            self.ns_repr_list.append([meaning, name])
+            self.ns_repr_index[(meaning, name)] = i
+            self.ns_repr_slices.append((start, len(gather_idxs)))
+            self.backmap += [i] * (len(gather_idxs) - start)
+        self.gather_idxs = np.array(gather_idxs, dtype=np.intp)
+        self.props_size = len(gather_idxs)
+
+        # POSITION slices of every slot of a category, for relation arguments
+        self.object_categories = object_categories if object_categories else {}
+        category_slots = {}
+        for name in self.object_names:
+            if ("POSITION", name) in self.ns_repr_index and name in self.object_categories:
+                start, stop = self.ns_repr_slices[self.ns_repr_index[("POSITION", name)]]
+                category_slots.setdefault(self.object_categories[name], []).append((name, range(start, stop)))
+
+        # function layer: input indices into the property layer, output slices into the function layer
+        self.func_names = [fname for fname, _ in parsed_functions]
+        self.func_options = [function_options(fname, relations) for fname in self.func_names]
+        self.func_input_idxs = []
+        self.func_relation_args = [] # per function instance: argument is a relation (does not mask the result)
+        self.func_output_slices = []
+        fv_index = len(self.ns_repr_list)
+        func_idx = 0
+        for (fname, input_props), options in zip(parsed_functions, self.func_options):
+            input_idxs = []
+            # an object is not its own neighbour, its slot is left out of the relations it is related to
+            related = set(name for meaning, name in input_props if meaning not in RELATION_MEANINGS)
+            for meaning, name in input_props:
+                if meaning in RELATION_MEANINGS:
+                    input_idxs.append([i for obj, idxs in category_slots[name] if obj not in related for i in idxs])
+                else:
+                    input_idxs.append(list(range(*self.ns_repr_slices[self.ns_repr_index[(meaning, name)]])))
+            self.func_input_idxs.append(input_idxs)
+            self.func_relation_args.append([p[0] in RELATION_MEANINGS for p in input_props])
+            return_len = function_return_len(fname, options)
+            self.func_output_slices.append((func_idx, func_idx + return_len))
+            self.backmap += [fv_index] * return_len
+            func_idx += return_len
+            fv_index += 1
+        self.funcs_size = func_idx
+        self.feature_vector_size = self.props_size + self.funcs_size
+
+        # visibility is tracked per object and frame: object o in frame t has row t * n_objects + o
+        # raw_object_incidence maps the buffer columns of the selected objects (visibility_idxs) onto these rows,
+        # object_feature_incidence marks every feature entry that is derived from them
+        n_objects = len(self.object_names)
+        n_rows = history_depth * n_objects
+        owned = sorted(raw_owners)
+        visibility_idxs = np.concatenate([np.add(owned, frame * self.row_width) for frame in range(history_depth)]).astype(np.intp)
+        raw_rows = np.full(history_depth * self.row_width, -1, dtype=np.intp)
+        raw_rows[visibility_idxs] = np.concatenate([np.add([raw_owners[c] for c in owned], frame * n_objects) for frame in range(history_depth)])
+        # None if every column of the buffer is read
+        self.visibility_idxs = None if len(visibility_idxs) == len(raw_rows) else visibility_idxs
+        self.raw_object_incidence = np.zeros((len(visibility_idxs), n_rows), dtype=bool)
+        self.raw_object_incidence[np.arange(len(visibility_idxs)), raw_rows[visibility_idxs]] = True
+        self.object_feature_incidence = np.zeros((n_rows, self.feature_vector_size), dtype=bool)
+        prop_rows = raw_rows[self.gather_idxs]
+        self.object_feature_incidence[prop_rows, np.arange(self.props_size)] = True
+        for (start, stop), input_idxs, relation_args in zip(self.func_output_slices, self.func_input_idxs, self.func_relation_args):
+            masking = [idxs for idxs, relation in zip(input_idxs, relation_args) if not relation]
+            if not masking:
+                continue
+            rows = np.unique(np.concatenate([prop_rows[idxs] for idxs in masking]))
+            self.object_feature_incidence[rows[:, None], np.arange(self.props_size + start, self.props_size + stop)] = True
+
+        # group function instances by function, s.t. each function is evaluated by one kernel call
+        # (one per category size for relations)
+        group_members = {}
+        for i, (fname, _) in enumerate(parsed_functions):
+            group_members.setdefault((fname, tuple(len(idxs) for idxs in self.func_input_idxs[i])), []).append(i)
+        self.func_groups = []
+        self.func_group_members = list(group_members.values()) # function instance indices of each group
+        for (fname, _), members in group_members.items():
+            input_idxs = []
+            for arg in range(len(FUNCTIONS[fname]["expects"])):
+                input_idxs.append(np.array([self.func_input_idxs[i][arg] for i in members], dtype=np.intp))
+            output_idxs = np.array([np.arange(*self.func_output_slices[i]) for i in members], dtype=np.intp)
+            self.func_groups.append(FunctionGroup(fname, input_idxs, output_idxs, self.func_options[members[0]], self.func_relation_args[members[0]]))
+
+        # property layer -> function instance incidence, instances in group order
+        n_instances = sum(len(g.output_idxs) for g in self.func_groups)
+        self.prop_instance_incidence = np.zeros((self.props_size, n_instances), dtype=bool)
+        self.group_offsets = [0]
+        for group in self.func_groups:
+            offset = self.group_offsets[-1]
+            for idxs in group.input_idxs:
+                self.prop_instance_incidence[idxs, offset + np.arange(len(idxs))[:, None]] = True
+            self.group_offsets.append(offset + len(group.output_idxs))
+
+    def feature_bounds(self):
+        """
+Value bounds of every feature vector entry, from the property bounds and the registered function bounds.
+Returns low and high (float64, -inf/inf if unbounded) and whether the entry only takes integer values.
+        """
+        low = np.full(self.feature_vector_size, -np.inf)
+        high = np.full(self.feature_vector_size, np.inf)
+        integral = np.ones(self.feature_vector_size, dtype=bool) # OCAtari properties are integers
+        for (meaning, _), (start, stop) in zip(self.ns_repr_list, self.ns_repr_slices):
+            base = "POSITION" if meaning in HISTORY_MEANINGS else meaning
+            if base in PROPERTY_BOUNDS:
+                n = stop - start
+                low[start:stop] = np.resize(PROPERTY_BOUNDS[base][0], n)
+                high[start:stop] = np.resize(PROPERTY_BOUNDS[base][1], n)
+        for fname, input_idxs, options, (start, stop) in zip(self.func_names, self.func_input_idxs, self.func_options, self.func_output_slices):
+            start, stop = start + self.props_size, stop + self.props_size
+            integral[start:stop] = FUNCTIONS[fname]["integral"]
+            bounds = FUNCTIONS[fname]["bounds"]
+            if bounds is not None:
+                low[start:stop], high[start:stop] = bounds(*[(low[idxs], high[idxs]) for idxs in input_idxs], **options)
+        # entries of invisible objects are zeroed
+        return np.minimum(low, 0.0), np.maximum(high, 0.0), integral
+
+    def raw_buffer(self, obs):
+        # flatten (..., history_depth, row_width) buffers to float64, invisible (None) values become NaN
+        raw = np.asarray(obs, dtype=np.float64)
+        return raw.reshape(raw.shape[:-2] + (-1,))
+
+    def select_columns(self, obs):
+        # (..., n_props) OCAtari rows -> (..., row_width) rows of the buffered history
+        obs = np.asarray(obs, dtype=np.float64)
+        return obs.take(self.row_columns, axis=-1) if self.compact_rows else obs
+
+    def gather(self, raw, out=None):
+        # map the flat raw buffer onto the property layer
+        return np.take(raw, self.gather_idxs, axis=-1, out=out)
+
+    def compute_functions(self, props, out):
+        # evaluate the function layer group by group
+        for group in self.func_groups:
+            group(props, out)
+        return out
+
+    def compute_functions_incremental(self, props, prev_props, out):
+        # evaluate only the function instances whose inputs changed since prev_props,
+        # out has to hold the (unmasked) function layer of prev_props. returns (recomputed, total) instances
+        changed = props != prev_props
+        changed &= ~(np.isnan(props) & np.isnan(prev_props)) # invisible before and now
+        dirty = self.prop_instance_incidence[np.flatnonzero(changed)].any(axis=0)
+        recomputed = 0
+        for group, start, stop in zip(self.func_groups, self.group_offsets, self.group_offsets[1:]):
+            instances = np.flatnonzero(dirty[start:stop])
+            if len(instances) == stop - start:
+                group(props, out)
+            elif len(instances):
+                group(props, out, instances)
+            recomputed += len(instances)
+        return recomputed, self.group_offsets[-1]
+
+    def invisible_features(self, raw):
+        # feature entries derived from objects that are invisible in one of the frames, None if all are visible
+        missing = np.isnan(raw if self.visibility_idxs is None else raw.take(self.visibility_idxs, axis=-1))
+        if not missing.any():
+            return None
+        invisible_objects = missing @ self.raw_object_incidence
+        return invisible_objects @ self.object_feature_incidence
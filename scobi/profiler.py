@@ -0,0 +1,110 @@
+"""Cost profiler for focus files"""
+import json
+import time
+import numpy as np
+from scobi.schema import source_objects
+
+
+class FocusProfiler():
+    """
+Records wall time and call counts of the feature pipeline per concept (function) and per object.
+The time of a kernel call is split evenly over its instances, the share of an instance is attributed
+to every object it reads. Pipeline steps that are not concepts are recorded as PROPERTIES, VISIBILITY and REWARD.
+    """
+    def __init__(self, plan, parsed_functions):
+        self.object_names = plan.object_names
+        object_index = {name: i for i, name in enumerate(self.object_names)}
+        # (n_objects,) share of a group call attributed to each object
+        self.group_object_weights = []
+        for members in plan.func_group_members:
+            weights = np.zeros(len(self.object_names))
+            for i in members:
+                for obj in self.instance_objects(plan, parsed_functions[i][1]):
+                    weights[object_index[obj]] += 1 / len(members)
+            self.group_object_weights.append(weights)
+        self.reset()
+
+    @staticmethod
+    def instance_objects(plan, params):
+        # objects read by a function instance, relations read all slots of their category
+        return set(source_objects(plan, params))
+
+    def reset(self):
+        self.steps = 0
+        self.concept_time = {}
+        self.concept_calls = {}
+        self.concept_instances = {}
+        self.object_time = np.zeros(len(self.object_names))
+
+    def add(self, name, start, instances=1):
+        # record a pipeline step that started at start (time.perf_counter())
+        elapsed = time.perf_counter() - start
+        self.concept_time[name] = self.concept_time.get(name, 0.0) + elapsed
+        self.concept_calls[name] = self.concept_calls.get(name, 0) + 1
+        self.concept_instances[name] = self.concept_instances.get(name, 0) + instances
+        return elapsed
+
+    def compute(self, plan, raw, props_out, funcs_out):
+        # same as gather + compute_functions + invisible_features of the plan, timed step by step
+        self.steps += 1
+        start = time.perf_counter()
+        props = plan.gather(raw, props_out)
+        self.add("PROPERTIES", start, plan.props_size)
+        for group, weights in zip(plan.func_groups, self.group_object_weights):
+            start = time.perf_counter()
+            group(props, funcs_out)
+            self.object_time += weights * self.add(group.name, start, len(group.output_idxs))
+        start = time.perf_counter()
+        frozen = plan.invisible_features(raw)
+        self.add("VISIBILITY", start)
+        return frozen
+
+    def as_dict(self):
+        steps = max(self.steps, 1)
+        concepts = {}
+        for name, total in sorted(self.concept_time.items(), key=lambda x: -x[1]):
+            concepts[name] = {
+                "total_s": total,
+                "us_per_step": total / steps * 1e6,
+                "calls": self.concept_calls[name],
+                "instances": self.concept_instances[name],
+            }
+        objects = {name: {"total_s": t, "us_per_step": t / steps * 1e6}
+                   for name, t in sorted(zip(self.object_names, self.object_time.tolist()), key=lambda x: -x[1])}
+        return {"steps": self.steps, "concepts": concepts, "objects": objects}
+
+    def to_json(self, path=None):
+        out = json.dumps(self.as_dict(), indent=2)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(out)
+        return out
+
+    def table(self):
+        stats = self.as_dict()
+        total = sum(c["total_s"] for c in stats["concepts"].values()) or 1.0
+        lines = ["%-24s %12s %8s %10s %12s" % ("concept", "us/step", "share", "calls", "instances")]
+        for name, c in stats["concepts"].items():
+            lines.append("%-24s %12.2f %7.1f%% %10d %12d" % (name, c["us_per_step"], 100 * c["total_s"] / total, c["calls"], c["instances"]))
+        lines.append("")
+        lines.append("%-24s %12s" % ("object", "us/step"))
+        for name, o in stats["objects"].items():
+            lines.append("%-24s %12.2f" % (name, o["us_per_step"]))
+        lines.append("")
+        lines.append("%d steps, %.2f us/step total" % (stats["steps"], total / max(stats["steps"], 1) * 1e6))
+        return "\n".join(lines)
+
+    def record(self, logger, prefix="focus_profile"):
+        record_profiles(logger, [self.as_dict()], prefix)
+
+
+def record_profiles(logger, profiles, prefix="focus_profile"):
+    # tensorboard scalar group, averaged over the profiles of several envs (FocusProfiler.as_dict()).
+    # logger is a stable-baselines3 logger (or anything with record(key, value))
+    for group, suffix in (("concepts", "%s/%s_us"), ("objects", "%s/object_%s_us")):
+        values = {}
+        for profile in profiles:
+            for name, stats in profile[group].items():
+                values.setdefault(name, []).append(stats["us_per_step"])
+        for name, v in values.items():
+            logger.record(suffix % (prefix, name), float(np.mean(v)))
@@ -0,0 +1,110 @@
+"""Cost-aware focus file pruning"""
+import numpy as np
+from scobi.schema import feature_key
+
+
+def feature_importance(attributions, backmap, n_features, hide_properties=False, props_size=0):
+    """
+Mean absolute attribution per feature (NS_REPR_LIST + PARSED_FUNCTIONS entries of the focus file).
+attributions: (n_samples, obs_size), backmap: feature index of every feature vector entry.
+    """
+    entry_importance = np.abs(np.asarray(attributions, dtype=np.float64)).mean(axis=0)
+    backmap = np.asarray(backmap)
+    if hide_properties: # observation only holds the function layer
+        backmap = backmap[props_size:]
+    return np.bincount(backmap, weights=entry_importance, minlength=n_features)
+
+
+def function_costs(profile, parsed_functions):
+    # measured us per step of every function instance, the time of a concept is split evenly over its instances
+    steps = max(profile["steps"], 1)
+    concepts = profile["concepts"]
+    costs = []
+    for fname, _ in parsed_functions:
+        c = concepts.get(fname)
+        if c is None or not c["instances"]:
+            costs.append(0.0)
+        else:
+            costs.append(c["us_per_step"] / (c["instances"] / steps))
+    return np.array(costs)
+
+
+def reward_requirements(parsed_functions, features):
+    """
+Function instances and objects a reward spec reads (features: see scobi.rewards.spec_features).
+The agent is profiled without reward shaping, so the importance of these features is not measured.
+Returns the function indices in focus file order and the objects of the referenced properties.
+    """
+    keys = {feature_key(f) for f in features}
+    functions = [i for i, f in enumerate(parsed_functions) if feature_key(f) in keys]
+    objects = {name for _, name in features if not isinstance(name, tuple)}
+    return functions, objects
+
+
+def select_functions(importance, costs, keep=0.95, required=()):
+    """
+Greedily keep the function instances with the highest importance per cost,
+until they cover the fraction keep of the total importance. The required indices are always kept.
+Returns the kept indices in focus file order.
+    """
+    importance = np.asarray(importance, dtype=np.float64)
+    kept = [int(i) for i in required]
+    total = importance.sum()
+    if total == 0:
+        return sorted(set(kept))
+    ratio = importance / np.maximum(costs, 1e-9)
+    order = np.lexsort((-importance, -ratio)) # ratio first, ties by importance
+    covered = importance[kept].sum()
+    for i in order:
+        if covered >= keep * total or importance[i] == 0:
+            break
+        if i not in kept:
+            kept.append(int(i))
+            covered += importance[i]
+    return sorted(kept)
+
+
+def select_objects(object_names, ns_repr_list, property_importance, kept_functions, keep=0.95, object_categories=None,
+                   required=()):
+    # objects read by kept functions (their position history too) and the required objects,
+    # plus the objects whose properties cover the fraction keep of the property importance
+    per_object = {name: 0.0 for name in object_names}
+    for (_, obj), imp in zip(ns_repr_list, property_importance):
+        per_object[obj] += imp
+    selected = {p[1] for _, params in kept_functions for p in params} | set(required)
+    # relations ({POSITIONS: <category>}) read every slot of their category
+    categories = object_categories if object_categories else {}
+    selected |= {o for o in object_names if categories.get(o) in selected}
+    total = sum(per_object.values())
+    covered = 0.0
+    for obj, imp in sorted(per_object.items(), key=lambda x: -x[1]):
+        if covered >= keep * total or imp == 0:
+            break
+        selected.add(obj)
+        covered += imp
+    return [o for o in object_names if o in selected]
+
+
+def expected_speedup(step_us, saved_us):
+    # steps/sec before and after removing saved_us of feature extraction from a step of step_us
+    before = 1e6 / step_us
+    after = 1e6 / max(step_us - saved_us, 1e-9)
+    return before, after
+
+
+def pruned_focus_dict(in_dict, objects, functions, funclist_to_yaml_dict):
+    # same layout as the default focus file, only the SELECTION is replaced.
+    # the history is kept for the kept objects, it may only hold selected objects
+    out = dict(in_dict)
+    selection = dict(in_dict["SELECTION"])
+    selection["objects"] = list(objects)
+    selection["functions"] = [funclist_to_yaml_dict(f) for f in functions]
+    history = selection.get("history")
+    if history:
+        properties = [p for p in history.get("properties") or [] if list(p.values())[0] in objects]
+        if properties:
+            selection["history"] = dict(history, properties=properties)
+        else:
+            del selection["history"]
+    out["SELECTION"] = selection
+    return out
@@ -0,0 +1,326 @@
+"""Declarative reward shaping specs"""
+import math
+from pathlib import Path
+import yaml
+import numpy as np
+
+# packaged default specs, one <game>.yaml per game, used if the focus file has no REWARD section
+DEFAULT_SPECS_DIR = Path(__file__).parent / "resources" / "rewards"
+
+TERM_TYPES = ("delta", "threshold", "value", "subgoal")
+STATE_DEFAULTS = {"delta": 0.0, "threshold": np.nan, "subgoal": False}
+CONDITIONS = ("less", "greater", "within")
+
+# REWARD:
+#   values:                     # named scalars read from the (masked) feature vector
+#     ball_dy: {feature: {DISTANCE: [{POSITION: Player1}, {POSITION: Ball1}]}, entry: 1, abs: true}
+#     flag_distance: {distance: [{POSITION: Player1}, {CENTER: [{POSITION: Flag1}, {POSITION: Flag2}]}]}
+#     flag_speed: {norm: {DIR_VELOCITY: [{POSITION_HISTORY: Flag1}]}}
+#   terms:                      # the shaped reward is the sum of all terms, in order
+#   - {type: delta, value: ball_dy, scale: 0.1}             # scale * (previous - current), decrease: true by default
+#   - {type: threshold, value: player_y}                    # scale * improvement of the lowest value so far
+#   - {type: value, value: flag_speed, clip: [0, 10]}       # scale * clip(value)
+#   - {type: subgoal, reward: 100, when: [{within: [player_x, center_x, 10]}]}
+# delta terms take the optional filters below (ignore deltas >= below), max_abs (ignore |delta| >= max_abs) and when,
+# threshold terms take direction: low | high, subgoal terms take once: true (only reward when entering the condition).
+# conditions: less: [a, b], greater: [a, b], within: [a, b, r] (b - r < a < b + r), operands are value names or numbers.
+
+
+def get_default_spec_path(env_name):
+    return DEFAULT_SPECS_DIR / (env_name.split("-")[0] + ".yaml")
+
+
+def load_default_spec(env_name):
+    # REWARD section of the packaged spec of the game, None if there is none
+    spath = get_default_spec_path(env_name)
+    if not spath.exists():
+        return None
+    with open(spath, "r") as f:
+        return yaml.safe_load(f)["REWARD"]
+
+
+def parse_feature_ref(ref):
+    # focus file notation, {POSITION: Player1} or {DISTANCE: [{POSITION: Player1}, {POSITION: Ball1}]}
+    if not isinstance(ref, dict) or len(ref) != 1:
+        return None
+    name, params = list(ref.items())[0]
+    if isinstance(params, list):
+        params = [parse_feature_ref(p) for p in params]
+        if None in params:
+            return None
+        return (name, tuple(params))
+    return (name, params)
+
+
+def spec_features(spec):
+    # parsed references (see parse_feature_ref) of the features the values of a REWARD spec read, malformed ones are left out
+    refs = []
+    for v in ((spec or {}).get("values") or {}).values():
+        v = v if isinstance(v, dict) else {}
+        if "feature" in v:
+            refs.append(v["feature"])
+        elif "distance" in v:
+            refs += v["distance"] if isinstance(v["distance"], list) else []
+        elif "norm" in v:
+            refs.append(v["norm"])
+    features = [parse_feature_ref(r) for r in refs]
+    return [f for f in features if f is not None]
+
+
+class RewardSpec():
+    """
+Reward shaping compiled from a REWARD spec against the feature schema (FeatureSchema) of a focus file.
+Feature references are resolved to feature vector indices once. A batch is evaluated with a handful of
+numpy expressions over (n_envs, fv_size) feature vectors, a single env with the same arithmetic on python floats.
+The state of stateful terms (previous values, thresholds, subgoal flags) is kept per env, see init_state().
+    """
+    def __init__(self, spec, schema, errors):
+        self.values = [] # (name, kind, idxs, abs)
+        self.terms = []
+        self.value_index = {}
+        if not isinstance(spec, dict):
+            errors.append("Reward spec has to be a mapping with 'values' and 'terms'")
+            return
+        def entries(ref):
+            key = parse_feature_ref(ref)
+            if key is None:
+                errors.append("Malformed feature in reward spec: %s" % ref)
+                return None
+            i = schema.feature_index(key)
+            if i is None:
+                errors.append("Reward spec expects a property/concept missing in the focus file selection: %s" % ref)
+                return None
+            return schema.entries(i)
+
+        for name, v in (spec.get("values") or {}).items():
+            v = v if isinstance(v, dict) else {}
+            if "feature" in v:
+                idxs = entries(v["feature"])
+                entry = v.get("entry", 0)
+                if idxs is not None and not (type(entry) is int and 0 <= entry < len(idxs)):
+                    errors.append("Reward value '%s' has no entry %s" % (name, entry))
+                    idxs = None
+                value = ("feature", None if idxs is None else idxs[entry:entry+1])
+            elif "distance" in v:
+                refs = v["distance"] if isinstance(v["distance"], list) else []
+                idxs = [entries(r) for r in refs]
+                if len(idxs) != 2:
+                    errors.append("Reward value '%s': distance expects two features" % name)
+                    idxs = [None]
+                elif any(i is not None and len(i) != 2 for i in idxs):
+                    errors.append("Reward value '%s': distance expects two positions" % name)
+                    idxs = [None]
+                value = ("distance", None if any(i is None for i in idxs) else np.concatenate(idxs))
+            elif "norm" in v:
+                value = ("norm", entries(v["norm"]))
+            else:
+                errors.append("Reward value '%s' needs one of feature, distance or norm" % name)
+                continue
+            self.value_index[name] = len(self.values)
+            idxs = None if value[1] is None else value[1].tolist()
+            self.values.append((name, value[0], idxs, bool(v.get("abs", False))))
+
+        terms = spec.get("terms") or []
+        if not terms:
+            errors.append("Reward spec has no terms")
+        for t in terms:
+            term = self.compile_term(t, errors)
+            if term is not None:
+                self.terms.append(term)
+
+    def operand(self, x, errors):
+        if isinstance(x, (int, float)) and not isinstance(x, bool):
+            return float(x)
+        if x not in self.value_index:
+            errors.append("Unknown reward value: %s" % x)
+            return None
+        return self.value_index[x]
+
+    def compile_conditions(self, conds, errors):
+        out = []
+        for c in conds or []:
+            if not isinstance(c, dict) or len(c) != 1 or list(c)[0] not in CONDITIONS:
+                errors.append("Unknown condition in reward spec: %s (expected one of %s)" % (c, ", ".join(CONDITIONS)))
+                continue
+            op, args = list(c.items())[0]
+            nargs = 3 if op == "within" else 2
+            if not isinstance(args, list) or len(args) != nargs:
+                errors.append("Condition '%s' expects %d operands: %s" % (op, nargs, args))
+                continue
+            out.append((op, [self.operand(a, errors) for a in args]))
+        return out
+
+    def compile_term(self, t, errors):
+        ttype = t.get("type") if isinstance(t, dict) else None
+        if ttype not in TERM_TYPES:
+            errors.append("Unknown reward term type: %s (expected one of %s)" % (ttype, ", ".join(TERM_TYPES)))
+            return None
+        term = {"type": ttype, "scale": float(t.get("scale", 1)), "when": self.compile_conditions(t.get("when"), errors)}
+        if ttype == "subgoal":
+            term["reward"] = float(t.get("reward", 1))
+            term["once"] = bool(t.get("once", False))
+            if not term["when"]:
+                errors.append("Subgoal reward term needs a when condition")
+            return term
+        term["value"] = self.operand(t.get("value"), errors)
+        if type(term["value"]) is float:
+            errors.append("Reward term '%s' expects a named value: %s" % (ttype, t.get("value")))
+        if ttype == "delta":
+            term["sign"] = 1.0 if t.get("decrease", True) else -1.0
+            term["below"] = t.get("below")
+            term["max_abs"] = t.get("max_abs")
+        elif ttype == "threshold":
+            if t.get("direction", "low") not in ("low", "high"):
+                errors.append("Threshold direction has to be low or high: %s" % t.get("direction"))
+            term["sign"] = 1.0 if t.get("direction", "low") == "low" else -1.0
+        elif ttype == "value":
+            term["clip"] = t.get("clip")
+        return term
+
+    def init_state(self, n_envs=None):
+        # per term state, previous values start at 0 and thresholds unset (nan) like the former reward closures.
+        # python scalars for a single env, (n_envs,) arrays for a batch
+        state = [STATE_DEFAULTS.get(term["type"]) for term in self.terms]
+        if n_envs is None:
+            return state
+        return [None if s is None else np.full(n_envs, s) for s in state]
+
+    def reset_state(self, state, env_idx=None):
+        for k, term in enumerate(self.terms):
+            default = STATE_DEFAULTS.get(term["type"])
+            if isinstance(state[k], np.ndarray):
+                state[k][slice(None) if env_idx is None else env_idx] = default
+            else:
+                state[k] = default
+
+    def evaluate_values(self, fv):
+        values = []
+        for _, kind, idxs, absolute in self.values:
+            if kind == "feature":
+                v = fv[:, idxs[0]]
+            elif kind == "distance":
+                # same formula as EUCLIDEAN_DISTANCE
+                v = np.sqrt((fv[:, idxs[3]] - fv[:, idxs[1]])**2 + (fv[:, idxs[2]] - fv[:, idxs[0]])**2)
+            else:
+                v = fv[:, idxs[0]]**2
+                for i in idxs[1:]:
+                    v = v + fv[:, i]**2
+                v = np.sqrt(v)
+            values.append(np.abs(v) if absolute else v)
+        return values
+
+    def condition(self, conds, values, n_envs):
+        ok = np.ones(n_envs, dtype=bool)
+        for op, args in conds:
+            a, b = [values[x] if type(x) is int else x for x in args[:2]]
+            if op == "less":
+                ok &= a < b
+            elif op == "greater":
+                ok &= a > b
+            else:
+                r = values[args[2]] if type(args[2]) is int else args[2]
+                ok &= (a > b - r) & (a < b + r)
+        return ok
+
+    def evaluate_values_single(self, fv):
+        values = []
+        for _, kind, idxs, absolute in self.values:
+            if kind == "feature":
+                v = fv.item(idxs[0])
+            elif kind == "distance":
+                a0, a1, b0, b1 = [fv.item(i) for i in idxs]
+                v = math.sqrt((b1 - a1)**2 + (b0 - a0)**2)
+            else:
+                v = 0.0
+                for i in idxs:
+                    v += fv.item(i)**2
+                v = math.sqrt(v)
+            values.append(abs(v) if absolute else v)
+        return values
+
+    def condition_single(self, conds, values):
+        for op, args in conds:
+            a, b = [values[x] if type(x) is int else x for x in args[:2]]
+            if op == "less":
+                ok = a < b
+            elif op == "greater":
+                ok = a > b
+            else:
+                r = values[args[2]] if type(args[2]) is int else args[2]
+                ok = a > b - r and a < b + r
+            if not ok:
+                return False
+        return True
+
+    def reward(self, fv, state):
+        # single env: (fv_size,) masked feature vector, same arithmetic as the batch evaluation with python floats
+        values = self.evaluate_values_single(fv)
+        reward = 0.0
+        for k, term in enumerate(self.terms):
+            ttype = term["type"]
+            if ttype == "subgoal":
+                inside = self.condition_single(term["when"], values)
+                if inside and not (term["once"] and state[k]):
+                    reward += term["reward"]
+                state[k] = inside
+                continue
+            v = values[term["value"]]
+            if ttype == "delta":
+                delta = (state[k] - v) * term["sign"]
+                state[k] = v
+                keep = self.condition_single(term["when"], values)
+                if term["below"] is not None:
+                    keep = keep and delta < term["below"]
+                if term["max_abs"] is not None:
+                    keep = keep and abs(delta) < term["max_abs"]
+                reward += (delta if keep else 0.0) * term["scale"]
+            elif ttype == "threshold":
+                improvement = (state[k] - v) * term["sign"]
+                better = improvement > 0 # false while unset (nan)
+                if better or state[k] != state[k]:
+                    state[k] = v
+                if better and self.condition_single(term["when"], values):
+                    reward += improvement * term["scale"]
+            else:
+                if term["clip"] is not None:
+                    v = min(max(v, term["clip"][0]), term["clip"][1])
+                if self.condition_single(term["when"], values):
+                    reward += v * term["scale"]
+        return reward
+
+    def __call__(self, fv, state):
+        # fv: (fv_size,) masked feature vector and state of init_state(), or (n_envs, fv_size) and init_state(n_envs).
+        # returns the reward(s) and advances the state
+        if fv.ndim == 1:
+            return self.reward(fv, state)
+        n_envs = fv.shape[0]
+        values = self.evaluate_values(fv)
+        reward = np.zeros(n_envs, dtype=np.float64)
+        for term, s in zip(self.terms, state):
+            ttype = term["type"]
+            if ttype == "subgoal":
+                inside = self.condition(term["when"], values, n_envs)
+                hit = inside & ~s if term["once"] else inside
+                s[:] = inside
+                reward += np.where(hit, term["reward"], 0.0)
+                continue
+            v = values[term["value"]]
+            if ttype == "delta":
+                delta = (s - v) * term["sign"]
+                s[:] = v
+                keep = self.condition(term["when"], values, n_envs)
+                if term["below"] is not None:
+                    keep &= delta < term["below"]
+                if term["max_abs"] is not None:
+                    keep &= np.abs(delta) < term["max_abs"]
+                reward += np.where(keep, delta, 0.0) * term["scale"]
+            elif ttype == "threshold":
+                improvement = (s - v) * term["sign"]
+                better = improvement > 0 # false while unset (nan)
+                s[:] = np.where(np.isnan(s) | better, v, s)
+                reward += np.where(better & self.condition(term["when"], values, n_envs), improvement, 0.0) * term["scale"]
+            else:
+                if term["clip"] is not None:
+                    v = np.clip(v, term["clip"][0], term["clip"][1])
+                reward += np.where(self.condition(term["when"], values, n_envs), v, 0.0) * term["scale"]
+        return reward
@@ -0,0 +1,129 @@
+"""Feature vector schema of a focus file"""
+import json
+import numpy as np
+from scobi.plan import RELATION_MEANINGS
+
+AXES = ("x", "y")
+
+
+def feature_key(x):
+    # hashable key of a feature description entry: ["POSITION", "Player1"] or ["DISTANCE", [["POSITION", "Player1"], ...]]
+    if isinstance(x, (list, tuple)):
+        return tuple(feature_key(y) for y in x)
+    return x
+
+
+def source_objects(plan, params):
+    # objects read by a function instance in focus file order, relations read all slots of their category
+    objs = []
+    for meaning, name in params:
+        if meaning in RELATION_MEANINGS:
+            objs += [o for o in plan.object_names if plan.object_categories.get(o) == name]
+        else:
+            objs.append(name)
+    return tuple(dict.fromkeys(objs))
+
+
+def format_feature(feature_name, feature_signature, ii):
+    # display name of entry ii of a feature, e.g. "D(Player1, Ball1).x"
+    if feature_name == 'RGB':
+        axis = ["R", "G", "B"][ii]
+        return f"RGB({feature_signature}.{axis})"
+    if feature_name in ("POSITION_HISTORY", "POSITION_TRAIL"):
+        # entries are named by frame, the current frame would collide with the POSITION entries
+        # and the trail repeats the first frames of the history
+        frame = "t" if ii < 2 else f"t-{ii // 2}"
+        prefix = "PT" if feature_name == "POSITION_TRAIL" else ""
+        obj = f"{prefix}({feature_signature})" if prefix else feature_signature
+        return f"{obj}.{AXES[ii % 2]}[{frame}]"
+    if feature_name == "NEAREST_K":
+        return f"NK({feature_signature[0][1]}, {feature_signature[1][1]})[{ii // 2}].{AXES[ii % 2]}"
+    if feature_name == "WITHIN_RADIUS":
+        return f"WR({feature_signature[0][1]}, {feature_signature[1][1]})"
+    if feature_name == 'POSITION':
+        return f"{feature_signature}.{AXES[ii]}"
+    if feature_name == "ORIENTATION":
+        return f"O({feature_signature})"
+    objs = ", ".join(str(p[1]) for p in feature_signature) if isinstance(feature_signature, (list, tuple)) else str(feature_signature)
+    abbreviations = {"EUCLIDEAN_DISTANCE": "ED", "DISTANCE": "D", "VELOCITY": "V", "DIR_VELOCITY": "DV", "CENTER": "C",
+                     "LINEAR_TRAJECTORY": "LT", "ACCELERATION": "A", "MULTI_STEP_VELOCITY": "MSV", "COLOR": "COL"}
+    if feature_name in ("EUCLIDEAN_DISTANCE", "COLOR"):
+        return f"{abbreviations[feature_name]}({objs})"
+    if feature_name in abbreviations and ii < 2:
+        return f"{abbreviations[feature_name]}({objs}).{AXES[ii]}"
+    # user registered functions
+    return f"{feature_name}({objs})[{ii}]"
+
+
+class FeatureSchema():
+    """
+Layout of the feature vector of a focus file, derived once from its feature plan.
+Per feature (NS_REPR_LIST + PARSED_FUNCTIONS entry): kind (P property, F function), concept, source objects and
+its (start, stop) slice of the feature vector. Per feature vector entry: display name, value bounds and whether it only
+takes integer values. The observation is the feature vector from observation_start on (the function layer if properties are hidden).
+    """
+    def __init__(self, plan, parsed_functions, hide_properties=False, obs_dtype=np.float32):
+        n_props = len(plan.ns_repr_list)
+        self.features = plan.ns_repr_list + parsed_functions
+        self.kinds = ["P"] * n_props + ["F"] * len(parsed_functions)
+        self.concepts = [meaning for meaning, _ in self.features]
+        self.objects = [(name,) for _, name in plan.ns_repr_list] + [source_objects(plan, params) for _, params in parsed_functions]
+        self.slices = list(plan.ns_repr_slices) + [(start + plan.props_size, stop + plan.props_size)
+                                                   for start, stop in plan.func_output_slices]
+        self.index = {feature_key(f): i for i, f in enumerate(self.features)}
+        self.backmap = np.array(plan.backmap, dtype=np.intp)
+        self.names = [format_feature(concept, signature, ii)
+                      for (concept, signature), (start, stop) in zip(self.features, self.slices) for ii in range(stop - start)]
+        self.low, self.high, self.integral = plan.feature_bounds()
+        self.dtype = np.dtype(obs_dtype)
+        self.size = plan.feature_vector_size
+        self.observation_start = plan.props_size if hide_properties else 0
+
+    def __len__(self):
+        return len(self.features)
+
+    @property
+    def observation_size(self):
+        return self.size - self.observation_start
+
+    @property
+    def observation_names(self):
+        return self.names[self.observation_start:]
+
+    def feature_index(self, feature):
+        # index of a feature description entry (or its feature_key), None if it is not selected
+        return self.index.get(feature_key(feature))
+
+    def entries(self, i):
+        # feature vector indices of feature i
+        return np.arange(*self.slices[i])
+
+    def values(self, fv, i):
+        start, stop = self.slices[i]
+        return fv[..., start:stop]
+
+    def as_dict(self):
+        features = []
+        for i, (concept, signature) in enumerate(self.features):
+            features.append({
+                "kind": self.kinds[i],
+                "concept": concept,
+                "signature": signature,
+                "objects": list(self.objects[i]),
+                "slice": list(self.slices[i]),
+            })
+        return {
+            "dtype": self.dtype.name,
+            "size": self.size,
+            "observation_start": self.observation_start,
+            "features": features,
+            "names": self.names,
+            "observation_names": self.observation_names,
+        }
+
+    def to_json(self, path=None):
+        out = json.dumps(self.as_dict(), indent=2)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(out)
+        return out
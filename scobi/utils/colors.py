@@ -1,8 +1,6 @@
-from colormath import color_diff_matrix
-from colormath.color_objects import sRGBColor, LabColor
-from colormath.color_conversions import convert_color
 import scobi.utils.color_dicts as cdicts
 import numpy as np
+# colormath is imported on first use, the Atari palette is precomputed in scobi.utils.palette
 
 # TODO: RF: is this copypaste from colormath?
 def _get_lab_color1_vector(color):
@@ -37,29 +35,36 @@ def delta_e_cmc(color1, color2_matrix, pl=2, pc=1):
       Acceptability: pl=2, pc=1
       Perceptability: pl=1, pc=1
     """
+    from colormath import color_diff_matrix
     color1_vector = _get_lab_color1_vector(color1)
     # color2_matrix = _get_lab_color2_matrix(color2)
     delta_e = color_diff_matrix.delta_e_cmc(
-        color1_vector, color2_matrix, pl=pl, pc=pc)[0]
-    return delta_e.item()
+        color1_vector, color2_matrix, pl=pl, pc=pc)
+    return delta_e
+
+# (n_css3_colors, 3) lab matrix of all CSS3 colors, built on the first off-palette color
+colors_names = list(cdicts.CSS3_NAMES_TO_RGB)
+colors_matrix = None
 
-colors_matrices = {}
-for color_name, rgb in cdicts.CSS3_NAMES_TO_RGB.items():
-    color2_rgb = sRGBColor(*rgb)
-    color2_lab = convert_color(color2_rgb, LabColor)
-    color2_lab_matrix = _get_lab_color2_matrix(color2_lab)
-    colors_matrices[color_name] = color2_lab_matrix
+def _get_colors_matrix():
+    global colors_matrix
+    if colors_matrix is None:
+        from colormath.color_objects import sRGBColor, LabColor
+        from colormath.color_conversions import convert_color
+        colors_matrix = np.concatenate([_get_lab_color2_matrix(convert_color(sRGBColor(*rgb), LabColor))
+                                        for rgb in cdicts.CSS3_NAMES_TO_RGB.values()])
+    return colors_matrix
 
-def _colordist(rgb1, color2_lab_matrix):
+def _colordists(rgb1):
+    # delta e of rgb1 to every CSS3 color, the input is converted once
+    from colormath.color_objects import sRGBColor, LabColor
+    from colormath.color_conversions import convert_color
     rgb1 = (np.array(rgb1)/255).tolist()
     color1_lab = convert_color(sRGBColor(*rgb1), LabColor)
-    delta_e = delta_e_cmc(color1_lab, color2_lab_matrix)
-    return delta_e
+    return delta_e_cmc(color1_lab, _get_colors_matrix())
 
 # returns str and int of closest color to input rgb
 def get_closest_color(rgb):
-    comp_list = [(c[0], _colordist(rgb, c[1])) for c in colors_matrices.items()] 
-    comp_list2 = sorted(comp_list, key=lambda el: el[1])
-    color_name = comp_list2[0][0]
+    color_name = colors_names[int(np.argmin(_colordists(rgb)))] # first of equally close colors
     color_int = cdicts.COLOR_TO_INT[color_name]
-    return color_name, color_int
\ No newline at end of file
+    return color_name, color_int
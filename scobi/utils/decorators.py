@@ -5,15 +5,22 @@ PROPERTIES = dict()
 
 
 # decorator to register properties and functions
+# functions may pass an array kernel (kernel=...), evaluating all instances at once on stacked argument arrays.
+# it is preferred by the feature plan, the decorated scalar function is the reference and the fallback.
+# bounds=... returns the value bounds of the function given the bounds of its arguments (unbounded if omitted),
+# integral=True marks functions with integer values, s.t. they fit integer observation dtypes without rounding
 def register(*args, **kwargs):
 
     def inner(func):
         sig = inspect.signature(func)
         ret_ano = sig.return_annotation
-        sig_list = sig.parameters
+        # parameters with defaults are options (e.g. k of NEAREST_K), set in the focus file instead of bound to properties
+        sig_list = {k: v for k, v in sig.parameters.items() if v.default is inspect.Parameter.empty}
         param_descs = kwargs["params"]
         ret_desc = kwargs["desc"]
-        sig_dict = {"object": func, "expects": [], "returns": None}
+        options = {k: v.default for k, v in sig.parameters.items() if v.default is not inspect.Parameter.empty}
+        sig_dict = {"object": func, "expects": [], "returns": None, "options": options, "kernel": kwargs.get("kernel"),
+                    "bounds": kwargs.get("bounds"), "integral": kwargs.get("integral", False)}
         sig_dict["returns"] = (ret_ano, ret_desc)
         if len(sig_list) == len(param_descs):
             for k in sig_list.keys():
@@ -10,6 +10,14 @@ class Logger():
         print(colored("scobi >", "light_red"), "Parser Error: "+msg)
         exit()
 
+    def FocusFileParserErrors(self, msgs):
+        # report every (distinct) error of a focus file before exiting
+        msgs = list(dict.fromkeys(msgs))
+        for msg in msgs:
+            print(colored("scobi >", "light_red"), "Parser Error: "+msg)
+        print(colored("scobi >", "light_red"), "Parser Error: %d error(s) in focus file." % len(msgs))
+        exit()
+
     def GeneralInfo(self, msg):
         if self.SILENT:
             return
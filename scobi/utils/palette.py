@@ -0,0 +1,74 @@
+"""Atari NTSC palette with precomputed color ints for the COLOR concept"""
+import numpy as np
+
+# the 128 colors of the NTSC palette (as emulated by the ALE), 0xRRGGBB, 8 luminances per hue
+NTSC_PALETTE = [
+    0x000000, 0x4a4a4a, 0x6f6f6f, 0x8e8e8e, 0xaaaaaa, 0xc0c0c0, 0xd6d6d6, 0xececec,
+    0x484800, 0x69690f, 0x86861d, 0xa2a22a, 0xbbbb35, 0xd2d240, 0xe8e84a, 0xfcfc54,
+    0x7c2c00, 0x904811, 0xa26221, 0xb47a30, 0xc3903d, 0xd2a44a, 0xdfb755, 0xecc860,
+    0x901c00, 0xa33915, 0xb55328, 0xc66c3a, 0xd5824a, 0xe39759, 0xf0aa67, 0xfcbc74,
+    0x940000, 0xa71a1a, 0xb83232, 0xc84848, 0xd65c5c, 0xe46f6f, 0xf08080, 0xfc9090,
+    0x840064, 0x97197a, 0xa8308f, 0xb846a2, 0xc659b3, 0xd46cc3, 0xe07cd2, 0xec8ce0,
+    0x500084, 0x68199a, 0x7d30ad, 0x9246c0, 0xa459d0, 0xb56ce0, 0xc57cee, 0xd48cfc,
+    0x140090, 0x331aa3, 0x4e32b5, 0x6848c6, 0x7f5cd5, 0x956fe3, 0xa980f0, 0xbc90fc,
+    0x000094, 0x181aa7, 0x2d32b8, 0x4248c8, 0x545cd6, 0x656fe4, 0x7580f0, 0x8490fc,
+    0x001c88, 0x183b9d, 0x2d57b0, 0x4272c2, 0x548ad2, 0x65a0e1, 0x75b5ef, 0x84c8fc,
+    0x003064, 0x185080, 0x2d6d98, 0x4288b0, 0x54a0c5, 0x65b7d9, 0x75cceb, 0x84e0fc,
+    0x004030, 0x18624e, 0x2d8169, 0x429e82, 0x54b899, 0x65d1ae, 0x75e7c2, 0x84fcd4,
+    0x004400, 0x1a661a, 0x328432, 0x48a048, 0x5cba5c, 0x6fd26f, 0x80e880, 0x90fc90,
+    0x143c00, 0x355f18, 0x527e2d, 0x6e9c42, 0x87b754, 0x9ed065, 0xb4e775, 0xc8fc84,
+    0x303800, 0x505916, 0x6d762b, 0x88923e, 0xa0ab4f, 0xb7c25f, 0xccd86e, 0xe0ec7c,
+    0x482c00, 0x694d14, 0x866a26, 0xa28638, 0xbb9f47, 0xd2b656, 0xe8cc63, 0xfce070,
+]
+
+# COLOR_TO_INT of the closest CSS3 color (get_closest_color) of every palette entry,
+# regenerate with build_palette_color_ints() if colors.py or color_dicts.py change
+NTSC_COLOR_INTS = [
+    8, 12, 12, 12, 12, 12, 12, 0,
+    3, 3, 3, 3, 3, 7, 4, 4,
+    7, 7, 7, 7, 7, 7, 4, 4,
+    1, 7, 7, 7, 7, 7, 7, 7,
+    1, 1, 7, 1, 1, 1, 1, 1,
+    6, 6, 9, 6, 6, 6, 6, 6,
+    2, 2, 9, 9, 9, 9, 9, 6,
+    2, 2, 9, 9, 9, 9, 9, 9,
+    2, 2, 2, 9, 9, 2, 2, 2,
+    2, 9, 2, 2, 2, 2, 2, 2,
+    9, 2, 2, 2, 2, 2, 2, 2,
+    12, 12, 3, 3, 3, 3, 3, 5,
+    3, 3, 3, 3, 3, 3, 3, 3,
+    3, 3, 3, 3, 3, 3, 3, 3,
+    3, 3, 3, 3, 4, 4, 7, 7,
+    7, 7, 7, 7, 4, 4, 7, 7,
+]
+
+
+def build_palette_color_ints():
+    from scobi.utils.colors import get_closest_color
+    return [get_closest_color(rgb)[1] for rgb in unpack_rgb(np.array(NTSC_PALETTE)).tolist()]
+
+
+def unpack_rgb(keys):
+    # (...,) 0xRRGGBB ints -> (..., 3) rgb values
+    return np.stack([(keys >> 16) & 255, (keys >> 8) & 255, keys & 255], axis=-1)
+
+
+_order = np.argsort(NTSC_PALETTE)
+PALETTE_KEYS = np.array(NTSC_PALETTE, dtype=np.float64)[_order]
+PALETTE_RGB = unpack_rgb(np.array(NTSC_PALETTE))[_order].astype(np.float64)
+PALETTE_COLOR_INTS = np.array(NTSC_COLOR_INTS, dtype=np.float64)[_order]
+# rgb tuple -> color int, for scalar lookups
+PALETTE_COLOR_INT_MAP = {tuple(rgb): c for rgb, c in zip(unpack_rgb(np.array(NTSC_PALETTE)).tolist(), NTSC_COLOR_INTS)}
+_key_weights = np.array([1 << 16, 1 << 8, 1], dtype=np.float64)
+
+
+def palette_color_ints(rgb):
+    """
+(..., 3) rgb values -> (...,) color ints and (...,) mask of values found in the palette.
+Entries that are off palette (or nan) are nan.
+    """
+    rgb = np.asarray(rgb, dtype=np.float64)
+    pos = np.searchsorted(PALETTE_KEYS, rgb @ _key_weights) # nan sorts last
+    np.minimum(pos, len(PALETTE_KEYS) - 1, out=pos)
+    found = (PALETTE_RGB[pos] == rgb).all(axis=-1)
+    return np.where(found, PALETTE_COLOR_INTS[pos], np.nan), found
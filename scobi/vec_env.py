@@ -0,0 +1,385 @@
+"""Vector envs of scobi environments"""
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from stable_baselines3.common.atari_wrappers import EpisodicLifeEnv
+from stable_baselines3.common.env_util import is_wrapped
+from stable_baselines3.common.monitor import Monitor
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv, CloudpickleWrapper
+
+
+class ScobiVecEnv(VecEnv):
+    """
+Vector env that owns n scobi Environments in one process. The envs are stepped in turn and the features of all envs
+are computed by one batched call of a shared focus (Focus.get_feature_vector_batch), without IPC or pickling per step.
+Drop-in for SubprocVecEnv([make_env(...), ...]) with env_fns that return unwrapped Environments.
+episodic_life and monitor apply the semantics of the EpisodicLifeEnv and Monitor wrappers per env: a lost life ends
+an episode, the game is only reset when it is over, every episode end reports info["episode"].
+Finished envs are reset automatically and report info["terminal_observation"], like in SubprocVecEnv.
+With threads > 0 the emulators of the envs are stepped concurrently by a pool of that many threads (ALE releases
+the GIL while emulating), the features are still computed in one batched call on the calling thread.
+    """
+    def __init__(self, env_fns, episodic_life=False, monitor=True, threads=0):
+        self.envs = [fn() for fn in env_fns]
+        env = self.envs[0]
+        super().__init__(len(self.envs), env.observation_space, env.action_space)
+        focus = env.focus
+        for e in self.envs[1:]:
+            if e.focus.FOCUS_KEY != focus.FOCUS_KEY or e.focus.get_settings() != focus.get_settings() or e.focus.REWARD_SHAPING != focus.REWARD_SHAPING:
+                env.logger.GeneralError("Envs of a ScobiVecEnv have to share the focus file and its settings.")
+        # the focus of the first env computes the features of all envs, its batch state is kept per env
+        focus.init_batch_reward_states(self.num_envs)
+        for state, e in zip(focus.batch_reward_states, self.envs):
+            state["ale"] = e.focus.ale
+            e.focus = focus
+        self.focus = focus
+        self.episodic_life = episodic_life
+        self.monitor = monitor
+        self.actions = None
+        self.freeze_masks = None
+        # EpisodicLifeEnv state, the game counts as over until the first step
+        self.lives = np.zeros(self.num_envs, dtype=np.int64)
+        self.game_over = np.ones(self.num_envs, dtype=bool)
+        # Monitor state
+        self.t_start = time.time()
+        self.episode_returns = np.zeros(self.num_envs, dtype=np.float64)
+        self.episode_lengths = np.zeros(self.num_envs, dtype=np.int64)
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="scobi-ale") if threads > 0 else None
+
+    def reset_env(self, i, **kwargs):
+        # reset env i like EpisodicLifeEnv.reset() and Monitor.reset(), returns its OCAtari buffer, info and
+        # whether the game was reset (else a no-op step continued it after a lost life)
+        env = self.envs[i]
+        reset = True
+        if self.episodic_life and not self.game_over[i]:
+            obs, reward, terminated, truncated, info = env.oc_env.step(0)
+            env.record_step(obs, reward, terminated or truncated)
+            reset = terminated or truncated
+        if reset:
+            obs, info = env.oc_env.reset(**kwargs)
+            env.did_reset = True
+        if self.episodic_life:
+            self.lives[i] = env.unwrapped.ale.lives()
+        self.episode_returns[i] = 0.0
+        self.episode_lengths[i] = 0
+        return obs, info, reset
+
+    def reset(self):
+        buffers = []
+        for i in range(self.num_envs):
+            options = {"options": self._options[i]} if self._options[i] else {}
+            obs, self.reset_infos[i], reset = self.reset_env(i, seed=self._seeds[i], **options)
+            if reset:
+                self.focus.reset_batch_history(i)
+                self.focus.reset_batch_reward_state(i)
+            buffers.append(obs)
+        observations, _, self.freeze_masks = self.focus.get_feature_vector_batch(np.stack(buffers))
+        # seeds and options are only used once
+        self._reset_seeds()
+        self._reset_options()
+        return observations
+
+    def step_async(self, actions):
+        self.actions = actions
+
+    def step_wait(self):
+        buffers = []
+        env_rewards = np.zeros(self.num_envs, dtype=np.float64)
+        terminated = np.zeros(self.num_envs, dtype=bool)
+        truncated = np.zeros(self.num_envs, dtype=bool)
+        infos = []
+        if self.pool is None:
+            results = (env.oc_env.step(int(action)) for env, action in zip(self.envs, self.actions))
+        else:
+            results = self.pool.map(lambda env, action: env.oc_env.step(int(action)), self.envs, self.actions)
+        for i, (env, result) in enumerate(zip(self.envs, results)):
+            obs, env_rewards[i], terminated[i], truncated[i], info = result
+            env.record_step(obs, env_rewards[i], terminated[i] or truncated[i])
+            buffers.append(obs)
+            infos.append(dict(info))
+        observations, scobi_rewards, self.freeze_masks = self.focus.get_feature_vector_batch(np.stack(buffers))
+        rewards = self.focus.compose_reward(scobi_rewards, env_rewards)
+        if self.episodic_life:
+            self.game_over = terminated | truncated
+            lives = np.array([env.unwrapped.ale.lives() for env in self.envs], dtype=np.int64)
+            terminated |= (0 < lives) & (lives < self.lives)
+            self.lives = lives
+        dones = terminated | truncated
+        self.episode_returns += rewards
+        self.episode_lengths += 1
+
+        done_idxs = np.flatnonzero(dones)
+        buffers = []
+        reset = []
+        for i, info in enumerate(infos):
+            info["TimeLimit.truncated"] = bool(truncated[i] and not terminated[i])
+        for i in done_idxs:
+            info = infos[i]
+            if self.monitor:
+                info["episode"] = {"r": round(float(self.episode_returns[i]), 6), "l": int(self.episode_lengths[i]),
+                                   "t": round(time.time() - self.t_start, 6)}
+            info["terminal_observation"] = observations[i].copy()
+            obs, self.reset_infos[i], r = self.reset_env(i)
+            buffers.append(obs)
+            reset.append(r)
+        if len(done_idxs):
+            observations[done_idxs], _, self.freeze_masks[done_idxs] = self.focus.get_feature_vector_rows(np.stack(buffers), done_idxs, reset)
+        return observations, rewards, dones, infos
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+        for env in self.envs:
+            env.close()
+
+    def get_images(self):
+        return [env.oc_env.render() for env in self.envs]
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self.envs[i], attr_name) for i in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        for i in self._get_indices(indices):
+            setattr(self.envs[i], attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return [getattr(self.envs[i], method_name)(*method_args, **method_kwargs) for i in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        # the wrappers are emulated, see above
+        wrapped = (self.monitor and issubclass(Monitor, wrapper_class)) or (self.episodic_life and issubclass(EpisodicLifeEnv, wrapper_class))
+        return [wrapped for _ in self._get_indices(indices)]
+
+
+def ring_layout(ring_size, n_envs, obs_shape, obs_dtype, fv_size):
+    # (shape, dtype, offset) of the observations, rewards, dones and freeze masks of a shared ring, and its size in bytes
+    layout = []
+    offset = 0
+    for shape, dtype in ((tuple(obs_shape), obs_dtype), ((), np.float64), ((), np.bool_), ((fv_size,), np.int64)):
+        dtype = np.dtype(dtype)
+        shape = (ring_size, n_envs) + shape
+        offset = -(-offset // 8) * 8
+        layout.append((shape, dtype, offset))
+        offset += int(np.prod(shape)) * dtype.itemsize
+    return layout, max(offset, 1)
+
+
+def ring_views(buf, layout):
+    return [np.ndarray(shape, dtype, buf, offset) for shape, dtype, offset in layout]
+
+
+def _scobi_env(env):
+    # the scobi Environment below the gym wrappers of env
+    while not hasattr(env, "focus"):
+        env = env.env
+    return env
+
+
+def _shm_worker(remote, parent_remote, env_fn_wrapper, rank):
+    # like the SubprocVecEnv worker, but the step results are written to the shared ring (slot, rank)
+    parent_remote.close()
+    env = env_fn_wrapper.var()
+    scobi_env = _scobi_env(env)
+    shm = None
+    observations = rewards = dones = freeze_masks = None
+    info = {}
+    reset_info = {}
+
+    def write(slot, obs, reward, done):
+        observations[slot, rank] = obs
+        rewards[slot, rank] = reward
+        dones[slot, rank] = done
+        freeze_masks[slot, rank] = scobi_env.focus.get_current_freeze_mask()
+
+    try:
+        while True:
+            cmd, data = remote.recv()
+            if cmd == "step":
+                slot, action = data
+                obs, reward, terminated, truncated, info = env.step(action)
+                done = terminated or truncated
+                info["TimeLimit.truncated"] = truncated and not terminated
+                if done:
+                    info["terminal_observation"] = obs
+                    obs, reset_info = env.reset()
+                write(slot, obs, reward, done)
+                # infos are only sent at episode ends, the others on request (get_info)
+                remote.send((info, reset_info) if done else None)
+            elif cmd == "reset":
+                slot, seed, options = data
+                obs, reset_info = env.reset(seed=seed, **options)
+                write(slot, obs, 0.0, False)
+                remote.send(reset_info)
+            elif cmd == "get_info":
+                remote.send(info)
+            elif cmd == "attach":
+                name, layout = data
+                shm = SharedMemory(name=name)
+                observations, rewards, dones, freeze_masks = ring_views(shm.buf, layout)
+                remote.send(None)
+            elif cmd == "render":
+                remote.send(env.render())
+            elif cmd == "close":
+                env.close()
+                remote.close()
+                break
+            elif cmd == "get_spaces":
+                remote.send((env.observation_space, env.action_space, scobi_env.focus.FEATURE_VECTOR_SIZE))
+            elif cmd == "env_method":
+                # gym wrappers do not forward attributes, they are looked up through the wrapper stack
+                method = env.get_wrapper_attr(data[0])
+                remote.send(method(*data[1], **data[2]))
+            elif cmd == "get_attr":
+                remote.send(env.get_wrapper_attr(data))
+            elif cmd == "set_attr":
+                remote.send(env.set_wrapper_attr(data[0], data[1]))
+            elif cmd == "is_wrapped":
+                remote.send(is_wrapped(env, data))
+            else:
+                raise NotImplementedError(f"`{cmd}` is not implemented in the worker")
+    except EOFError:
+        pass
+    finally:
+        if shm is not None:
+            del observations, rewards, dones, freeze_masks
+            shm.close()
+
+
+class ScobiSubprocVecEnv(VecEnv):
+    """
+Vector env that runs each scobi Environment in its own process, drop-in for SubprocVecEnv([make_env(...), ...]).
+The workers write their observations, rewards, dones and freeze masks into a shared memory ring of ring_size slots,
+the pipes only carry the action indices and the infos of steps that end an episode (get_infos() fetches the others).
+The returned arrays are views of the ring, they are valid for ring_size - 1 further steps (VecNormalize copies them).
+    """
+    def __init__(self, env_fns, start_method=None, ring_size=4):
+        self.waiting = False
+        self.closed = False
+        n_envs = len(env_fns)
+        if start_method is None:
+            # fork is not a thread safe method
+            start_method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+        ctx = mp.get_context(start_method)
+        # the workers attach to the ring and have to share the tracker of the parent, else it is unlinked at their exit.
+        # there is no resource tracker on windows, the ring is freed with its last handle
+        if os.name == "posix":
+            resource_tracker.ensure_running()
+        self.remotes, self.work_remotes = zip(*[ctx.Pipe() for _ in range(n_envs)])
+        self.processes = []
+        for rank, (work_remote, remote, env_fn) in enumerate(zip(self.work_remotes, self.remotes, env_fns)):
+            args = (work_remote, remote, CloudpickleWrapper(env_fn), rank)
+            # daemon=True: if the main process crashes, we should not cause things to hang
+            process = ctx.Process(target=_shm_worker, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+        self.remotes[0].send(("get_spaces", None))
+        observation_space, action_space, fv_size = self.remotes[0].recv()
+        super().__init__(n_envs, observation_space, action_space)
+        layout, nbytes = ring_layout(ring_size, n_envs, observation_space.shape, observation_space.dtype, fv_size)
+        self.shm = SharedMemory(create=True, size=nbytes)
+        self.observations, self.rewards, self.dones, self.ring_freeze_masks = ring_views(self.shm.buf, layout)
+        for remote in self.remotes:
+            remote.send(("attach", (self.shm.name, layout)))
+        for remote in self.remotes:
+            remote.recv()
+        self.ring_size = ring_size
+        self.slot = 0
+        self.freeze_masks = None
+
+    def next_slot(self):
+        self.slot = (self.slot + 1) % self.ring_size
+        return self.slot
+
+    def step_async(self, actions):
+        slot = self.next_slot()
+        for remote, action in zip(self.remotes, actions):
+            remote.send(("step", (slot, int(action))))
+        self.waiting = True
+
+    def step_wait(self):
+        results = [remote.recv() for remote in self.remotes]
+        self.waiting = False
+        infos = []
+        for i, result in enumerate(results):
+            if result is None:
+                infos.append({})
+            else:
+                info, self.reset_infos[i] = result
+                infos.append(info)
+        self.freeze_masks = self.ring_freeze_masks[self.slot]
+        return self.observations[self.slot], self.rewards[self.slot], self.dones[self.slot], infos
+
+    def reset(self):
+        slot = self.next_slot()
+        for i, remote in enumerate(self.remotes):
+            options = {"options": self._options[i]} if self._options[i] else {}
+            remote.send(("reset", (slot, self._seeds[i], options)))
+        self.reset_infos = [remote.recv() for remote in self.remotes]
+        # seeds and options are only used once
+        self._reset_seeds()
+        self._reset_options()
+        self.freeze_masks = self.ring_freeze_masks[slot]
+        return self.observations[slot]
+
+    def get_infos(self, indices=None):
+        # full infos of the last step, the step results only carry those of episode ends
+        target_remotes = self._get_target_remotes(indices)
+        for remote in target_remotes:
+            remote.send(("get_info", None))
+        return [remote.recv() for remote in target_remotes]
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            for remote in self.remotes:
+                remote.recv()
+        for remote in self.remotes:
+            remote.send(("close", None))
+        for process in self.processes:
+            process.join()
+        # views into the ring have to be released before the shared memory is closed
+        del self.observations, self.rewards, self.dones, self.ring_freeze_masks
+        self.freeze_masks = None
+        self.shm.close()
+        self.shm.unlink()
+        self.closed = True
+
+    def get_images(self):
+        for remote in self.remotes:
+            remote.send(("render", None))
+        return [remote.recv() for remote in self.remotes]
+
+    def get_attr(self, attr_name, indices=None):
+        target_remotes = self._get_target_remotes(indices)
+        for remote in target_remotes:
+            remote.send(("get_attr", attr_name))
+        return [remote.recv() for remote in target_remotes]
+
+    def set_attr(self, attr_name, value, indices=None):
+        target_remotes = self._get_target_remotes(indices)
+        for remote in target_remotes:
+            remote.send(("set_attr", (attr_name, value)))
+        for remote in target_remotes:
+            remote.recv()
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        target_remotes = self._get_target_remotes(indices)
+        for remote in target_remotes:
+            remote.send(("env_method", (method_name, method_args, method_kwargs)))
+        return [remote.recv() for remote in target_remotes]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        target_remotes = self._get_target_remotes(indices)
+        for remote in target_remotes:
+            remote.send(("is_wrapped", wrapper_class))
+        return [remote.recv() for remote in target_remotes]
+
+    def _get_target_remotes(self, indices):
+        return [self.remotes[i] for i in self._get_indices(indices)]
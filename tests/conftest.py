@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+from typing import Tuple
+
+import numpy as np
+import pytest
+import yaml
+
+from scobi.focus import Focus
+from scobi.utils.logging import Logger
+
+NS_TYPES = {"POSITION": Tuple[int, int], "RGB": Tuple[int, int, int], "ORIENTATION": Tuple[int]}
+
+# object slots of the games under test: category -> (number of slots, properties)
+GAMES = {
+    "Pong-v5": {"Player": (1, ["POSITION"]), "Enemy": (1, ["POSITION"]), "Ball": (1, ["POSITION"])},
+    "Kangaroo-v5": {"Player": (1, ["POSITION", "ORIENTATION"]), "Monkey": (4, ["POSITION"]),
+                    "Ladder": (3, ["POSITION"]), "Fruit": (2, ["POSITION", "RGB"])},
+    "Skiing-v5": {"Player": (1, ["POSITION", "ORIENTATION"]), "Flag": (2, ["POSITION"]), "Tree": (3, ["POSITION"])},
+}
+ACTIONS = ["NOOP", "FIRE", "UP", "DOWN"]
+
+
+def game_objects(env_name):
+    # stand-ins for the initialized OCAtari slots, only category and neurosymbolic representation are read
+    objs = [SimpleNamespace(category=cat, _ns_meaning=props, _ns_types=[NS_TYPES[p] for p in props])
+            for cat, (_, props) in GAMES[env_name].items()]
+    return objs, {cat: n for cat, (n, _) in GAMES[env_name].items()}
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path_factory, monkeypatch):
+    # compiled focus files and extractors of the tests are not written to the user cache
+    path = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv("SCOBI_CACHE_DIR", str(path))
+    return path
+
+
+@pytest.fixture
+def make_focus(tmp_path):
+    """
+Focus of one of the GAMES on fake object slots. Without selection the default focus file is generated,
+else it is a copy of the default focus file with the SELECTION entries (and REWARD) replaced.
+    """
+    def make(env_name, selection=None, reward=0, **kwargs):
+        objs, max_objs = game_objects(env_name)
+        fofile = None
+        if selection is not None:
+            Focus(env_name, 0, False, tmp_path, None, objs, max_objs, ACTIONS, True, Logger(silent=True))
+            with open(tmp_path / ("default_focus_%s.yaml" % env_name)) as f:
+                sdict = yaml.safe_load(f)
+            sdict["SELECTION"].update(selection)
+            fofile = "test_focus_%s.yaml" % env_name
+            with open(tmp_path / fofile, "w") as f:
+                yaml.dump(sdict, f, sort_keys=False)
+        return Focus(env_name, reward, False, tmp_path, fofile, objs, max_objs, ACTIONS, True, Logger(silent=True), **kwargs)
+    return make
+
+
+def position_columns(focus, obj):
+    # columns of the POSITION of obj in the raw (2, n_props) OCAtari buffer
+    offset = 0
+    for (meaning, name), ns_type in zip(*focus.ALL_NS_REPR):
+        if meaning in ("POSITION_HISTORY", "POSITION_TRAIL"):
+            continue
+        if (meaning, name) == ("POSITION", obj):
+            return [offset, offset + 1]
+        offset += len(ns_type.__args__)
+    raise KeyError(obj)
+
+
+def random_walk(rng, n_props, steps, invisible=0.0):
+    # OCAtari buffers (previous, current frame) of objects moving a few pixels per step, None for invisible values
+    frame = rng.integers(0, 160, n_props)
+    out = []
+    for _ in range(steps):
+        nxt = np.clip(frame + rng.integers(-3, 4, n_props), 0, 159)
+        obs = np.stack([frame, nxt]).astype(object)
+        obs[1, rng.random(n_props) < invisible] = None
+        out.append(obs)
+        frame = nxt
+    return out
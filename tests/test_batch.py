@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+HISTORY_SELECTION = {
+    "functions": [
+        {"DISTANCE": [{"POSITION": "Player1"}, {"POSITION": "Monkey1"}]},
+        {"VELOCITY": [{"POSITION_HISTORY": "Monkey2"}]},
+        {"ACCELERATION": [{"POSITION_TRAIL": "Player1"}]},
+        {"MULTI_STEP_VELOCITY": [{"POSITION_TRAIL": "Monkey1"}]},
+        {"NEAREST_K": [{"POSITION": "Player1"}, {"POSITIONS": "Monkey"}]},
+    ],
+    "history": {"depth": 4, "properties": [{"POSITION": "Player1"}, {"POSITION": "Monkey1"}]},
+}
+
+
+def env_streams(rng, n_envs, steps, n_props):
+    # per env: (previous, current frame) buffers with invisible objects (NaN) and episode starts
+    streams, starts = [], []
+    for _ in range(n_envs):
+        frame = rng.integers(0, 160, n_props).astype(np.float64)
+        obs = []
+        for _ in range(steps):
+            nxt = np.clip(frame + rng.integers(-3, 4, n_props), 0, 159)
+            nxt[rng.random(n_props) < 0.05] = np.nan
+            obs.append(np.stack([frame, nxt]))
+            frame = np.where(np.isnan(nxt), rng.integers(0, 160, n_props), nxt)
+        streams.append(obs)
+        starts.append(rng.random(steps) < 0.05)
+    return streams, starts
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_batch_matches_single_envs_with_history(make_focus, incremental):
+    n_envs, steps = 3, 80
+    batch = make_focus("Kangaroo-v5", HISTORY_SELECTION, reward=0, incremental=incremental)
+    assert batch.HISTORY_DEPTH == 4
+    singles = [make_focus("Kangaroo-v5", HISTORY_SELECTION, reward=0, incremental=incremental) for _ in range(n_envs)]
+    streams, starts = env_streams(np.random.default_rng(0), n_envs, steps, batch.FEATURE_PLAN.n_props)
+    for t in range(steps):
+        for i, focus in enumerate(singles):
+            if starts[i][t]:
+                focus.reset_history()
+                batch.reset_batch_history(i)
+        observations, _, freeze_masks = batch.get_feature_vector_batch(np.stack([s[t] for s in streams]))
+        for i, focus in enumerate(singles):
+            obs, _ = focus.get_feature_vector(streams[i][t])
+            np.testing.assert_array_equal(observations[i], obs)
+            np.testing.assert_array_equal(freeze_masks[i], focus.get_current_freeze_mask())
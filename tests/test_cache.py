@@ -0,0 +1,54 @@
+import os
+import pickle
+
+import numpy as np
+
+from scobi.codegen import CODEGEN_VERSION
+from conftest import random_walk
+
+
+class Planted():
+    # pickle payload that creates a file when it is loaded
+    def __init__(self, path):
+        self.path = path
+
+    def __reduce__(self):
+        return (open, (self.path, "w"))
+
+
+def test_caches_are_kept_in_the_cache_dir(make_focus, tmp_path, cache_dir):
+    focus = make_focus("Pong-v5")
+    assert focus.EXTRACTOR is not None
+    assert sorted(p.name.endswith("_extractor.py") for p in cache_dir.iterdir()) == [False, True]
+    assert not list(tmp_path.glob("*.compiled")) and not list(tmp_path.glob("*_extractor.py"))
+    # a second load of the unchanged focus file reads both caches
+    mtimes = {p: os.stat(p).st_mtime_ns for p in cache_dir.iterdir()}
+    assert make_focus("Pong-v5").EXTRACTOR.KEY == focus.FOCUS_KEY
+    assert {p: os.stat(p).st_mtime_ns for p in cache_dir.iterdir()} == mtimes
+
+
+def test_files_next_to_the_focus_file_are_not_loaded(make_focus, tmp_path, cache_dir):
+    focus = make_focus("Pong-v5")
+    fpath = focus.FOCUSFILEPATH
+    imported, unpickled = tmp_path / "imported", tmp_path / "unpickled"
+    with open(fpath.with_name(fpath.stem + "_extractor.py"), "w") as f:
+        f.write("open(%r, 'w').close()\nKEY = %r\nCODEGEN_VERSION = %d\n" % (str(imported), focus.FOCUS_KEY, CODEGEN_VERSION))
+    with open(fpath.with_suffix(".compiled"), "wb") as f:
+        pickle.dump(Planted(str(unpickled)), f)
+    for p in cache_dir.iterdir():
+        p.unlink()
+    make_focus("Pong-v5")
+    assert not imported.exists() and not unpickled.exists()
+
+
+def test_caches_can_be_turned_off(make_focus, cache_dir, monkeypatch):
+    cached = make_focus("Kangaroo-v5")
+    for p in cache_dir.iterdir():
+        p.unlink()
+    monkeypatch.setenv("SCOBI_CACHE", "0")
+    focus = make_focus("Kangaroo-v5")
+    assert focus.EXTRACTOR is None
+    assert not list(cache_dir.iterdir())
+    # the feature plan computes the same features as the generated extractor
+    for obs in random_walk(np.random.default_rng(0), focus.FEATURE_PLAN.n_props, 50, invisible=0.1):
+        np.testing.assert_array_equal(focus.get_feature_vector(obs)[0], cached.get_feature_vector(obs)[0])
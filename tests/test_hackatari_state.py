@@ -0,0 +1,53 @@
+import pytest
+
+pytest.importorskip("ocatari")
+
+from scobi.environments.hackatari.core import HackAtari
+
+
+def make_env(game, mods):
+    # same arguments as scobi.environments.ocgym.make
+    return HackAtari(difficulty=0, env_name="ALE/%s-v5" % game, game_mode=0, modifs=mods, switch_frame=0,
+                     render_mode="rgb_array", obs_mode="obj", mode="ram", frameskip=4)
+
+
+def step(env, n):
+    for _ in range(n):
+        env.step(0)
+
+
+def test_mod_state_is_per_env():
+    # two envs with the same mods in one process, stepped separately
+    a, b = make_env("Breakout", ["gravity"]), make_env("Breakout", ["gravity"])
+    assert a.mod_state is not b.mod_state
+    a.reset(seed=0)
+    b.reset(seed=0)
+    step(a, 10)
+    assert a.mod_state.timer > 0
+    assert b.mod_state.timer == 0
+    step(b, 10)
+    assert a.mod_state.timer == b.mod_state.timer
+
+
+def test_mod_settings_are_per_env():
+    # settings of a mod are parsed per env, a later env with other settings does not change an earlier one
+    a, b = make_env("Breakout", ["color_p1"]), make_env("Breakout", ["color_p3"])
+    a.reset(seed=0)
+    b.reset(seed=0)
+    step(a, 2)
+    step(b, 2)
+    assert (a.mod_state.player_color, b.mod_state.player_color) == (1, 3)
+    assert a.get_ram()[62] != b.get_ram()[62]
+    # settings that add up over the mods of an env do not add up over envs
+    assert make_env("Asterix", ["speed1"]).mod_state.speed == make_env("Asterix", ["speed1"]).mod_state.speed == 8
+
+
+def test_mod_randomness_is_per_env():
+    # the random stream of the mods is seeded per env by reset(seed=...)
+    a, b = make_env("Seaquest", ["random_color_enemies"]), make_env("Seaquest", ["random_color_enemies"])
+    a.reset(seed=3)
+    step(a, 5)
+    b.reset(seed=3)
+    step(b, 5)
+    assert a.mod_state.current_colors == b.mod_state.current_colors
+    assert a.mod_state.current_colors is not b.mod_state.current_colors
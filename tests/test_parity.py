@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from scobi.parity import check_focus_parity, check_plan_parity, record_observations
+from conftest import GAMES, random_walk
+
+TRAIL_SELECTION = {
+    "functions": [
+        {"VELOCITY": [{"POSITION_HISTORY": "Monkey1"}]},
+        {"ACCELERATION": [{"POSITION_TRAIL": "Monkey1"}]},
+        {"MULTI_STEP_VELOCITY": [{"POSITION_TRAIL": "Player1"}]},
+        {"LINEAR_TRAJECTORY": [{"POSITION": "Player1"}, {"POSITION_HISTORY": "Monkey2"}]},
+    ],
+    "history": {"depth": 5, "properties": [{"POSITION": "Player1"}, {"POSITION": "Monkey1"}]},
+}
+
+RELATION_SELECTION = {
+    # an empty category (Player1 is left out of its own) and k above the number of monkeys
+    "functions": [
+        {"NEAREST_K": [{"POSITION": "Player1"}, {"POSITIONS": "Player"}]},
+        {"NEAREST_K": [{"POSITION": "Player1"}, {"POSITIONS": "Monkey"}]},
+        {"NEAREST_K": [{"POSITION": "Monkey2"}, {"POSITIONS": "Monkey"}]},
+        {"WITHIN_RADIUS": [{"POSITION": "Monkey2"}, {"POSITIONS": "Monkey"}]},
+        {"WITHIN_RADIUS": [{"POSITION": "Player1"}, {"POSITIONS": "Player"}]},
+    ],
+    "relations": {"k": 6, "radius": 4},
+}
+
+
+def recording(focus, invisible, steps=600, seed=0):
+    # float64 (steps, 2, n_props) buffers with NaN for invisible slots and random episode starts
+    rng = np.random.default_rng(seed)
+    observations = np.array(random_walk(rng, focus.FEATURE_PLAN.n_props, steps, invisible), dtype=np.float64)
+    return observations, rng.random(steps) < 0.02
+
+
+@pytest.mark.parametrize("env_name", list(GAMES))
+@pytest.mark.parametrize("invisible", [0.0, 0.2])
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_default_focus_kernels_match_scalar(make_focus, env_name, invisible, dtype):
+    focus = make_focus(env_name)
+    observations, starts = recording(focus, invisible)
+    assert check_focus_parity(focus, observations, starts, dtype) == []
+
+
+@pytest.mark.parametrize("selection", [TRAIL_SELECTION, RELATION_SELECTION], ids=["trail", "relations"])
+@pytest.mark.parametrize("invisible", [0.0, 0.2])
+def test_kernels_match_scalar(make_focus, selection, invisible):
+    focus = make_focus("Kangaroo-v5", selection)
+    observations, starts = recording(focus, invisible)
+    assert check_focus_parity(focus, observations, starts, np.float64) == []
+
+
+def test_mismatch_is_reported(make_focus, monkeypatch):
+    focus = make_focus("Kangaroo-v5", TRAIL_SELECTION)
+    observations, starts = recording(focus, 0.2)
+    group = next(g for g in focus.FEATURE_PLAN.func_groups if g.name == "ACCELERATION")
+    kernel = group.kernel
+    monkeypatch.setattr(group, "kernel", lambda *args, **kwargs: kernel(*args, **kwargs) + 0.5)
+    reports = check_plan_parity(focus.FEATURE_PLAN, focus.PARSED_FUNCTIONS, observations, starts, np.float64, atol=0.1)
+    assert [(r["function"], r["params"]) for r in reports] == [("ACCELERATION", [["POSITION_TRAIL", "Monkey1"]])]
+    # only visible instances are compared
+    assert 0 < reports[0]["mismatches"] < len(observations)
+    assert reports[0]["max_abs_error"] == pytest.approx(0.5)
+
+
+@pytest.mark.parametrize("game", ["Pong", "Kangaroo"])
+def test_recorded_observations(tmp_path, game):
+    pytest.importorskip("ocatari")
+    from scobi import Environment
+    env = Environment("ALE/%s-v5" % game, focus_dir=str(tmp_path), silent=True)
+    observations, starts = record_observations(env.oc_env, 500, seed=84)
+    assert check_focus_parity(env.focus, observations, starts) == []
+    env.close()
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+import yaml
+
+from scobi.focus import Focus
+from scobi.pruning import reward_requirements, select_functions, select_objects, pruned_focus_dict
+from scobi.rewards import load_default_spec, spec_features
+from scobi.utils.logging import Logger
+from conftest import ACTIONS, game_objects, random_walk
+
+# objects with a position history, only Player1 is read by a function
+HISTORY_OBJECTS = {"Kangaroo-v5": ["Player1", "Monkey1", "Ladder2"], "Skiing-v5": ["Player1", "Tree1"]}
+
+
+def prune(focus, function_importance):
+    # the selection of prune_focus.py, without property importance and with equal costs
+    features = spec_features(load_default_spec(focus.ENV_NAME))
+    reward_functions, reward_objects = reward_requirements(focus.PARSED_FUNCTIONS, features)
+    kept = select_functions(function_importance, np.ones(len(focus.PARSED_FUNCTIONS)), 0.95, reward_functions)
+    kept_functions = [focus.PARSED_FUNCTIONS[i] for i in kept]
+    objects = select_objects(focus.OBJECT_NAMES, focus.NS_REPR_LIST, np.zeros(len(focus.NS_REPR_LIST)), kept_functions,
+                             0.95, focus.OBJECT_CATEGORIES, reward_objects)
+    with open(focus.FOCUSFILEPATH) as f:
+        return pruned_focus_dict(yaml.safe_load(f), objects, kept_functions, focus.funclist_to_yaml_dict)
+
+
+@pytest.mark.parametrize("env_name", ["Kangaroo-v5", "Skiing-v5"])
+def test_pruned_focus_file_keeps_reward_and_history_features(make_focus, tmp_path, env_name):
+    with open(make_focus(env_name).FOCUSFILEPATH) as f:
+        functions = yaml.safe_load(f)["SELECTION"]["functions"]
+    selection = {
+        "functions": functions + [{"ACCELERATION": [{"POSITION_TRAIL": "Player1"}]}],
+        "history": {"depth": 4, "properties": [{"POSITION": o} for o in HISTORY_OBJECTS[env_name]]},
+    }
+    focus = make_focus(env_name, selection, reward=1)
+    # the profiled agent only attends to the trail of the player, none of the reward features
+    importance = np.zeros(len(focus.PARSED_FUNCTIONS))
+    importance[-1] = 1.0
+    with open(tmp_path / "pruned.yaml", "w") as f:
+        yaml.dump(prune(focus, importance), f, sort_keys=False)
+
+    objs, max_objs = game_objects(env_name)
+    pruned = Focus(env_name, 1, False, tmp_path, "pruned.yaml", objs, max_objs, ACTIONS, False, Logger(silent=True))
+    assert len(pruned.PARSED_FUNCTIONS) < len(focus.PARSED_FUNCTIONS)
+    assert pruned.HISTORY_OBJECTS == ["Player1"]
+    assert pruned.REWARD_SPEC is not None
+    # the pruned focus file shapes the same rewards
+    for obs in random_walk(np.random.default_rng(0), focus.FEATURE_PLAN.n_props, 200):
+        assert pruned.get_feature_vector(obs)[1] == pytest.approx(focus.get_feature_vector(obs)[1])
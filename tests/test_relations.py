@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from scobi.concepts import nearest_k_kernel, within_radius_kernel
+from scobi.utils.decorators import FUNCTIONS
+from conftest import position_columns
+
+
+def random_relations(rng, n_samples, n_slots, invisible=0.3):
+    # reference positions and category slots on a coarse grid (ties and coincident slots), NaN for invisible slots
+    a_position = rng.integers(0, 8, (n_samples, 2)).astype(np.float64) * 10
+    positions = rng.integers(0, 8, (n_samples, 2 * n_slots)).astype(np.float64) * 10
+    hidden = np.repeat(rng.random((n_samples, n_slots)) < invisible, 2, axis=1)
+    positions[hidden] = np.nan
+    return a_position, positions
+
+
+@pytest.mark.parametrize("n_slots", [0, 1, 4])
+@pytest.mark.parametrize("k", [1, 2, 4, 6])
+def test_nearest_k_kernel_matches_scalar(k, n_slots):
+    # includes empty categories and k larger than the number of slots (zero padded)
+    a_position, positions = random_relations(np.random.default_rng(k), 500, n_slots)
+    visible = np.ones(len(a_position), dtype=bool)
+    out = nearest_k_kernel(a_position, positions, visible, k=k)
+    for i in range(len(a_position)):
+        expected = FUNCTIONS["NEAREST_K"]["object"](tuple(a_position[i]), tuple(positions[i]), k=k)
+        np.testing.assert_array_equal(out[i], expected)
+
+
+@pytest.mark.parametrize("radius", [0.0, 15.0, 40.0])
+def test_within_radius_kernel_matches_scalar(radius):
+    a_position, positions = random_relations(np.random.default_rng(int(radius)), 500, 4)
+    visible = np.ones(len(a_position), dtype=bool)
+    out = within_radius_kernel(a_position, positions, visible, radius=radius)
+    for i in range(len(a_position)):
+        expected = FUNCTIONS["WITHIN_RADIUS"]["object"](tuple(a_position[i]), tuple(positions[i]), radius=radius)
+        np.testing.assert_array_equal(out[i], expected)
+
+
+def test_relation_kernels_mask_invisible_reference():
+    a_position = np.array([[np.nan, np.nan], [10.0, 10.0]])
+    positions = np.array([[0.0, 0.0, 20.0, 20.0], [0.0, 0.0, 20.0, 20.0]])
+    visible = ~np.isnan(a_position).any(axis=-1)
+    assert np.isnan(nearest_k_kernel(a_position, positions, visible, k=2)[0]).all()
+    assert np.isnan(within_radius_kernel(a_position, positions, visible, radius=20.0)[0]).all()
+    np.testing.assert_array_equal(within_radius_kernel(a_position, positions, visible, radius=20.0)[1], [2.0])
+
+
+def test_coincident_objects_are_neighbours(make_focus):
+    # an object is left out of its own category by slot, objects at the same position still count
+    focus = make_focus("Kangaroo-v5", {
+        "functions": [
+            {"NEAREST_K": [{"POSITION": "Monkey1"}, {"POSITIONS": "Monkey"}]},
+            {"WITHIN_RADIUS": [{"POSITION": "Monkey1"}, {"POSITIONS": "Monkey"}]},
+            {"WITHIN_RADIUS": [{"POSITION": "Player1"}, {"POSITIONS": "Monkey"}]},
+        ],
+        "relations": {"k": 2, "radius": 5},
+    })
+    obs = np.full((2, focus.FEATURE_PLAN.n_props), 150, dtype=object)
+    for obj, position in (("Monkey1", (40, 60)), ("Monkey2", (40, 60)), ("Monkey3", (50, 60)), ("Monkey4", (100, 100)),
+                          ("Player1", (40, 60))):
+        obs[:, position_columns(focus, obj)] = position
+    focus.get_feature_vector(obs)
+    np.testing.assert_array_equal(focus.CURRENT_FEATURE_VECTOR_FUNCS, [0, 0, 10, 0, 1, 2])
+    observations, _, _ = focus.get_feature_vector_batch(obs[None])
+    np.testing.assert_array_equal(observations[0, focus.FEATURE_VECTOR_PROPS_SIZE:], [0, 0, 10, 0, 1, 2])
+
+
+def test_relations_without_other_objects(make_focus):
+    # the category of Player1 only holds Player1 itself, Monkey has less than k slots
+    focus = make_focus("Kangaroo-v5", {
+        "functions": [
+            {"NEAREST_K": [{"POSITION": "Player1"}, {"POSITIONS": "Player"}]},
+            {"WITHIN_RADIUS": [{"POSITION": "Player1"}, {"POSITIONS": "Player"}]},
+            {"NEAREST_K": [{"POSITION": "Player1"}, {"POSITIONS": "Monkey"}]},
+        ],
+        "relations": {"k": 6, "radius": 200},
+    })
+    n = focus.FEATURE_VECTOR_PROPS_SIZE
+    assert focus.FEATURE_VECTOR_SIZE - n == 12 + 1 + 12
+    obs = np.full((2, focus.FEATURE_PLAN.n_props), 100, dtype=object)
+    for i, obj in enumerate(["Player1", "Monkey1", "Monkey2", "Monkey3", "Monkey4"]):
+        obs[:, position_columns(focus, obj)] = (10 * i, 0)
+    expected = [0] * 12 + [0] + [10, 0, 20, 0, 30, 0, 40, 0, 0, 0, 0, 0]
+    focus.get_feature_vector(obs)
+    np.testing.assert_array_equal(focus.CURRENT_FEATURE_VECTOR_FUNCS, expected)
+    observations, _, _ = focus.get_feature_vector_batch(obs[None])
+    np.testing.assert_array_equal(observations[0, n:], expected)
+    # the bounds of an empty category are zero
+    np.testing.assert_array_equal(focus.OBSERVATION_LOW[n:n + 13], 0)
+    np.testing.assert_array_equal(focus.OBSERVATION_HIGH[n:n + 13], 0)
@@ -0,0 +1,154 @@
+import math
+
+import numpy as np
+import pytest
+
+from scobi.utils.decorators import FUNCTIONS
+
+
+class ReferenceReward():
+    """
+The python reward functions of Pong, Kangaroo and Skiing that the packaged reward specs (scobi/resources/rewards)
+replace, as they were in Focus.get_reward_func. Evaluated on the masked feature vector of a focus.
+    """
+    def __init__(self, env, fv_description, fv_backmap):
+        self.reward_history = [0, 0]
+        self.reward_threshold = -1
+        self.reward_subgoals = 0
+        self.reward_helper_var = False
+        fv_backmap = np.asarray(fv_backmap)
+        self.func = getattr(self, env.split("-")[0].lower())(fv_description, fv_backmap)
+
+    def __call__(self, fv):
+        return self.func(list(fv))
+
+    def pong(self, fv_description, fv_backmap):
+        i = 0
+        idxs = np.empty(0)
+        for feature in fv_description:
+            i += 1
+            feature_name = feature[0]
+            feature_signature = feature[1]
+            if feature_name == "DISTANCE":
+                input1 = feature_signature[0]
+                input2 = feature_signature[1]
+                if input1[0] == "POSITION" and input1[1] == "Player1" and input2[0] == "POSITION" and input2[1] == "Ball1":
+                    idxs = np.where(fv_backmap == i-1)[0]
+        # reward when player decreases y-distance to ball
+        def reward(fv, idxs=idxs):
+            v_entries = fv[idxs[0]:idxs[-1]+1]
+            self.reward_history[0] = self.reward_history[1]
+            self.reward_history[1] = abs(v_entries[1]) # absolute distance on y-axis
+            delta = self.reward_history[0] - self.reward_history[1] #decrease in distance: positive sign
+            return delta * 0.1
+        return reward
+
+    def kangaroo(self, fv_description, fv_backmap):
+        i = 0
+        player_idxs = np.empty(0)
+        distance_idxs = np.empty(0)
+        for feature in fv_description:
+            i += 1
+            feature_name = feature[0]
+            feature_signature = feature[1]
+            if feature_name == "POSITION":
+                if feature_signature == "Player1":
+                    player_idxs = np.where(fv_backmap == i-1)[0]
+            if feature_name == "DISTANCE":
+                input1 = feature_signature[0]
+                input2 = feature_signature[1]
+                if input1[0] == "POSITION" and input1[1] == "Player1" and input2[0] == "POSITION" and input2[1] == "Ladder1":
+                    distance_idxs = np.where(fv_backmap == i-1)[0]
+        # reward when player achieves new y-coord low and goes to ladder
+        def reward(fv, p_idxs=player_idxs, d_idxs=distance_idxs):
+            p_entries = fv[p_idxs[0]:p_idxs[-1]+1]
+            y_coord_reward = 0
+            if self.reward_threshold == -1: #set starting y
+                self.reward_threshold = p_entries[1]
+                y_coord_reward = 0
+            else:
+                delta = self.reward_threshold - abs(p_entries[1])
+                if delta > 0:
+                    self.reward_threshold = abs(p_entries[1])
+                    y_coord_reward = delta # reward when player achieves new y-coord low an
+
+            d_entries = fv[d_idxs[0]:d_idxs[-1]+1]
+            self.reward_history[0] = self.reward_history[1]
+            self.reward_history[1] = abs(d_entries[0]) # x-dist
+            delta = self.reward_history[0] - self.reward_history[1] # decreasing x-distance to Scale1
+            distance_reward = delta if 100 > delta else 0 # ignore 100+ spikes
+            return y_coord_reward + 5 * distance_reward
+        return reward
+
+    def skiing(self, fv_description, fv_backmap):
+        i = 0
+        dscale = 1
+        player_position_idxs = np.empty(0)
+        flag_center_idxs = np.empty(0)
+        flag_velocity_idxs = np.empty(0)
+        for feature in fv_description:
+            i += 1
+            feature_name = feature[0]
+            feature_signature = feature[1]
+            if feature_name == "CENTER":
+                input1 = feature_signature[0]
+                input2 = feature_signature[1]
+                if input1[0] == "POSITION" and input1[1] == "Flag1" and input2[0] == "POSITION" and input2[1] == "Flag2":
+                    flag_center_idxs = np.where(fv_backmap == i-1)[0]
+            if feature_name == "POSITION":
+                if feature_signature == "Player1":
+                    player_position_idxs = np.where(fv_backmap == i-1)[0]
+            if feature_name == "DIR_VELOCITY":
+                input = feature_signature[0]
+                if input[0] == "POSITION_HISTORY" and input[1] == "Flag1":
+                    flag_velocity_idxs = np.where(fv_backmap == i-1)[0]
+        # reward for high player velocity and player decreases euc-distance to center of flag1 and flag2
+        def reward(fv, c_idxs=flag_center_idxs, p_idxs=player_position_idxs, v_idxs=flag_velocity_idxs):
+            p_entries = fv[p_idxs[0]:p_idxs[-1]+1]
+            c_entries = fv[c_idxs[0]:c_idxs[-1]+1]
+            v_entries = fv[v_idxs[0]:v_idxs[-1]+1]
+            euc_dist = FUNCTIONS["EUCLIDEAN_DISTANCE"]["object"]
+            player_flag_distance = euc_dist(p_entries, c_entries)[0]
+            self.reward_history[0] = self.reward_history[1]
+            self.reward_history[1] = player_flag_distance
+            delta = self.reward_history[0] - self.reward_history[1] #decrease in distance: positive sign
+            player_flag_distance_delta = delta * dscale if p_entries[1] < c_entries[1] else 0 #only scale and send if next flag is ahead not behind
+            player_flag_distance_delta = player_flag_distance_delta if abs(player_flag_distance_delta) < 20 * dscale else 0 #omit bad delta spikes when new flag in focus
+            euc_velocity_flag = np.clip(math.sqrt((v_entries[0])**2 + (v_entries[1])**2), 0, 10) #clip to 10
+            # emit subgoal reward when player passes through 20x10px area around flag center
+            if p_entries[0] > (c_entries[0] -10) and p_entries[0] < (c_entries[0] + 10)and p_entries[1] > (c_entries[1] -5) and p_entries[1] < (c_entries[1] + 5):
+                if not self.reward_helper_var:
+                    self.reward_subgoals = 100
+                    self.reward_helper_var = True
+            else:
+                self.reward_helper_var = False
+                self.reward_subgoals = 0
+            return self.reward_subgoals + euc_velocity_flag + player_flag_distance_delta
+        return reward
+
+
+def episode(rng, n_props, steps, invisible):
+    # objects close to each other (subgoals and threshold updates are hit), some values invisible
+    frame = rng.integers(0, 20, n_props)
+    out = []
+    for _ in range(steps):
+        nxt = np.clip(frame + rng.integers(-3, 4, n_props), 0, 30)
+        obs = np.stack([frame, nxt]).astype(object)
+        obs[1, rng.random(n_props) < invisible] = None
+        out.append(obs)
+        frame = nxt
+    return out
+
+
+@pytest.mark.parametrize("env_name", ["Pong-v5", "Kangaroo-v5", "Skiing-v5"])
+@pytest.mark.parametrize("invisible", [0.0, 0.02])
+def test_reward_specs_reproduce_python_rewards(make_focus, env_name, invisible):
+    focus = make_focus(env_name, reward=1)
+    assert focus.REWARD_SPEC is not None
+    reference = ReferenceReward(env_name, *focus.get_feature_vector_description())
+    rewards = []
+    for obs in episode(np.random.default_rng(0), focus.FEATURE_PLAN.n_props, 2000, invisible):
+        _, reward = focus.get_feature_vector(obs)
+        assert reward == pytest.approx(reference(focus.CURRENT_FEATURE_VECTOR), abs=1e-9)
+        rewards.append(reward)
+    assert np.count_nonzero(rewards) > 0
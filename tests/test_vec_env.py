@@ -0,0 +1,35 @@
+import pytest
+
+pytest.importorskip("ocatari")
+pytest.importorskip("stable_baselines3")
+
+from stable_baselines3.common.atari_wrappers import EpisodicLifeEnv
+from stable_baselines3.common.monitor import Monitor
+
+from scobi import Environment
+from scobi.vec_env import ScobiSubprocVecEnv
+
+
+def make_env(focus_dir, rank):
+    # the wrapper stack of the train envs (train.py make_env)
+    def _init():
+        env = Environment("ALE/Pong-v5", seed=rank, focus_dir=str(focus_dir), silent=True, profile=True)
+        env = Monitor(EpisodicLifeEnv(env=env))
+        env.reset(seed=rank)
+        return env
+    return _init
+
+
+def test_attributes_are_forwarded_through_wrappers(tmp_path):
+    # the workers look up methods and attributes of the scobi Environment below EpisodicLifeEnv and Monitor
+    vec_env = ScobiSubprocVecEnv([make_env(tmp_path, i) for i in range(2)])
+    try:
+        vec_env.reset()
+        vec_env.step([0, 0])
+        profiles = vec_env.env_method("get_focus_profile")
+        assert len(profiles) == 2 and all(profiles)
+        assert vec_env.env_method("get_vector_entry_descriptions", indices=[1])[0]
+        vec_env.set_attr("draw_features", True, indices=[0])
+        assert vec_env.get_attr("draw_features") == [True, False]
+    finally:
+        vec_env.close()
@@ -1,4 +1,5 @@
 import os
+import json
 import shutil
 from collections import deque
 from datetime import datetime
@@ -22,9 +23,12 @@ from stable_baselines3.common.vec_env import SubprocVecEnv, VecNormalize, VecTra
 
 import utils.parser.parser
 from scobi import Environment
+from scobi.profiler import record_profiles
+from scobi.vec_env import ScobiVecEnv, ScobiSubprocVecEnv
 from utils.model_card import ModelCard
 
-MULTIPROCESSING_START_METHOD = "spawn" if os.name == 'nt' else "fork"  # 'nt' == Windows
+# workers are forked from a server that has imported this module, they receive the (picklable) prototype focus of the parent
+MULTIPROCESSING_START_METHOD = "spawn" if os.name == 'nt' else "forkserver"  # 'nt' == Windows
 
 class RtptCallback(BaseCallback):
     def __init__(self, exp_name, max_iter, verbose=0):
@@ -63,6 +67,18 @@ class TensorboardCallback(BaseCallback):
         self.logger.record("rollout/ep_env_rew_mean", np.mean(list(self.buffer)))
 
 
+class FocusProfileCallback(BaseCallback):
+    """
+    Plot the feature extraction costs per concept and object of all envs in tensorboard.
+    """
+
+    def _on_step(self) -> bool:
+        return True
+
+    def on_rollout_end(self) -> None:
+        record_profiles(self.logger, _get_focus_profiles(self.training_env))
+
+
 class SaveBestModelCallback(BaseCallback):
     def __init__(self, save_path: str, rgb=False):
         super(SaveBestModelCallback, self).__init__()
@@ -92,6 +108,12 @@ def _create_modelcard(flags, location):
     model_card.create_card(location)
     return model_card
 
+# Helper function to get the focus profiles of a vec env, one per focus
+def _get_focus_profiles(vec_env):
+    # the envs of a ScobiVecEnv share one focus, its profile would be repeated n_envs times
+    indices = [0] if isinstance(vec_env.unwrapped, ScobiVecEnv) else range(vec_env.num_envs)
+    return vec_env.env_method("get_focus_profile", indices=indices)
+
 # Helper function to get the correct checkpoint location with the correct version specified
 def _get_directory(path, exp_name):
     version_counter = 2
@@ -140,7 +162,7 @@ def main():
     }
     model_card = _create_modelcard(flags, ckpt_path)
 
-    def make_env(rank: int = 0, seed: int = 0, silent=False, refresh=True) -> Callable:
+    def make_env(rank: int = 0, seed: int = 0, silent=False, refresh=True, prototype=None, wrap=True) -> Callable:
         def _init() -> gym.Env:
             env = Environment(flags_dictionary["env"],
                               seed=seed + rank,
@@ -152,16 +174,20 @@ def main():
                               refresh_yaml=refresh,
                               hud=flags_dictionary["hud"],
                               hackatari=use_hacks,
-                              mods=mods
+                              mods=mods,
+                              profile=flags_dictionary["profile"],
+                              obs_dtype=flags_dictionary["obs_dtype"],
+                              prototype=prototype
                               )
-            env = EpisodicLifeEnv(env=env)
-            env = Monitor(env)
+            if wrap: # else the wrappers are emulated by the vector env
+                env = EpisodicLifeEnv(env=env)
+                env = Monitor(env)
             env.reset(seed=seed + rank)
             return env
         set_random_seed(seed)
         return _init
 
-    def make_eval_env(rank: int = 0, seed: int = 0, silent=False, refresh=True) -> Callable:
+    def make_eval_env(rank: int = 0, seed: int = 0, silent=False, refresh=True, prototype=None, wrap=True) -> Callable:
         def _init() -> gym.Env:
             env = Environment(flags_dictionary["env"],
                               seed=seed + rank,
@@ -173,8 +199,11 @@ def main():
                               refresh_yaml=refresh,
                               hud=flags_dictionary["hud"],
                               hackatari=use_hacks,
-                              mods=mods)
-            env = Monitor(env)
+                              mods=mods,
+                              obs_dtype=flags_dictionary["obs_dtype"],
+                              prototype=prototype)
+            if wrap:
+                env = Monitor(env)
             env.reset(seed=seed + rank)
             return env
 
@@ -195,10 +224,21 @@ def main():
         # check if compatible gym env
         monitor = make_env()()
         check_env(monitor.env)
+        # the checked env is the prototype of all workers, they copy its compiled focus file instead of loading it again
+        prototype = monitor.env.env.focus # Monitor -> EpisodicLifeEnv -> Environment
         del monitor
         # silent init and dont refresh default yaml file because it causes spam and issues with multiprocessing
-        eval_env = VecNormalize(SubprocVecEnv([make_eval_env(rank=i, seed=eval_env_seed, silent=True, refresh=False) for i in range(n_eval_envs)], start_method=MULTIPROCESSING_START_METHOD), norm_reward=False, training=False)
-        train_env = VecNormalize(SubprocVecEnv([make_env(rank=i, seed=int(flags_dictionary["seed"]), silent=True, refresh=False) for i in range(n_envs)], start_method=MULTIPROCESSING_START_METHOD), norm_reward=False)
+        if flags_dictionary["vec_env"] == "scobi":
+            # all envs in this process, features of all envs in one batched call
+            eval_env = VecNormalize(ScobiVecEnv([make_eval_env(rank=i, seed=eval_env_seed, silent=True, refresh=False, prototype=prototype, wrap=False) for i in range(n_eval_envs)], threads=flags_dictionary["vec_threads"]), norm_reward=False, training=False)
+            train_env = VecNormalize(ScobiVecEnv([make_env(rank=i, seed=int(flags_dictionary["seed"]), silent=True, refresh=False, prototype=prototype, wrap=False) for i in range(n_envs)], episodic_life=True, threads=flags_dictionary["vec_threads"]), norm_reward=False)
+        elif flags_dictionary["vec_env"] == "shm":
+            # step results are read from shared memory, only actions and episode end infos are pickled
+            eval_env = VecNormalize(ScobiSubprocVecEnv([make_eval_env(rank=i, seed=eval_env_seed, silent=True, refresh=False, prototype=prototype) for i in range(n_eval_envs)], start_method=MULTIPROCESSING_START_METHOD), norm_reward=False, training=False)
+            train_env = VecNormalize(ScobiSubprocVecEnv([make_env(rank=i, seed=int(flags_dictionary["seed"]), silent=True, refresh=False, prototype=prototype) for i in range(n_envs)], start_method=MULTIPROCESSING_START_METHOD), norm_reward=False)
+        else:
+            eval_env = VecNormalize(SubprocVecEnv([make_eval_env(rank=i, seed=eval_env_seed, silent=True, refresh=False, prototype=prototype) for i in range(n_eval_envs)], start_method=MULTIPROCESSING_START_METHOD), norm_reward=False, training=False)
+            train_env = VecNormalize(SubprocVecEnv([make_env(rank=i, seed=int(flags_dictionary["seed"]), silent=True, refresh=False, prototype=prototype) for i in range(n_envs)], start_method=MULTIPROCESSING_START_METHOD), norm_reward=False)
 
     rtpt_iters = training_timestamps // rtpt_frequency
     save_bm = SaveBestModelCallback(ckpt_path, rgb=flags_dictionary["rgb_exp"])
@@ -231,6 +271,8 @@ def main():
     cbl = [checkpoint_callback, eval_callback, n_callback, tb_callback]
     if flags_dictionary["rgb_exp"]: #remove tb callback if rgb
         cbl = cbl[:-1]
+    elif flags_dictionary["profile"]:
+        cbl.append(FocusProfileCallback())
     cb_list = CallbackList(cbl)
     new_logger = configure(str(log_path), ["tensorboard"])
 
@@ -288,6 +330,9 @@ def main():
         focus_file_path = Path(flags_dictionary["focus_dir"]) / flags_dictionary["pruned_ff_name"]
         shutil.copy(focus_file_path, ckpt_path / focus_file_path.name)
     model.learn(total_timesteps=training_timestamps, callback=cb_list, progress_bar=flags_dictionary["progress"])
+    if flags_dictionary["profile"] and not flags_dictionary["rgb_exp"]:
+        with open(ckpt_path / "focus_profile.json", "w") as f:
+            json.dump(_get_focus_profiles(train_env), f, indent=2)
 
     model_card.update_card(ckpt_path, model.num_timesteps, training_timestamps, model.sde_sample_freq, n_eval_episodes,
                            model.gae_lambda, model.n_steps, model.batch_size, model.ent_coef, model.gamma,
@@ -24,6 +24,13 @@ def parse_train():
     parser.add_argument("--hud", action="store_true", help="use HUD objects")
     parser.add_argument("--hackatari", action="store_true", help="use Hackatari as environment")
     parser.add_argument("-mods", "--mods", type=str, required=False, help="list which mods you want to run with hackatari, separate via comma")
+    parser.add_argument("--profile", action="store_true", help="profile feature extraction costs per concept and object (tensorboard group focus_profile)")
+    parser.add_argument("--obs_dtype", type=str, required=False, default="float32", choices=["float32", "float16", "int16"],
+                        help="dtype of the env observations, compact dtypes are clipped to the feature bounds (int16 rounds)")
+    parser.add_argument("--vec_env", type=str, required=False, default="shm", choices=["shm", "subproc", "scobi"],
+                        help="vector env of the train and eval envs: one process per env with a shared memory ring (shm) or with pickled step results (subproc), or all envs in one process with batched features (scobi)")
+    parser.add_argument("--vec_threads", type=int, required=False, default=0,
+                        help="threads stepping the emulators of the scobi vec env concurrently, 0 steps them in turn")
 
     opts = parser.parse_args()
 
@@ -91,7 +98,11 @@ def parse_train():
         "progress": opts.progress,
         "hud": opts.hud,
         "hackatari": opts.hackatari,
-        "mods" : mods
+        "mods" : mods,
+        "profile": opts.profile,
+        "obs_dtype": opts.obs_dtype,
+        "vec_env": opts.vec_env,
+        "vec_threads": opts.vec_threads
     }
 
 
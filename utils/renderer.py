@@ -164,7 +164,8 @@ class Renderer:
         # write each line of path
         if hasattr(self.model, 'decision_path'):
             line_height = 50
-            feature_names = self.env.get_vector_entry_descriptions()
+            # the decision path indexes the observation, names are cached in the feature schema
+            feature_names = self.env.feature_schema.observation_names
             for line in self.model.decision_path:
                 parts = line.split(" ", 1)  # Split only at the first space
                 index = int(parts[0])
@@ -153,6 +153,8 @@ def main():
                       focus_dir=focus_dir,
                       focus_file=pruned_ff_name, hackatari=opts.hackatari, mods=mods)
     _, _ = env.reset(seed=EVAL_ENV_SEED)
+    # observation layout, read by create_exec_code.py to name the features of the extracted trees
+    env.feature_schema.to_json(output_path / "schema.json")
 
 
     # Original SB3 Model Eval and Trainset Generation
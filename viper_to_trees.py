@@ -1,6 +1,8 @@
 import matplotlib.pyplot as plt
 from sklearn.tree import plot_tree
 import joblib
+import json
+import os
 import numpy as np
 
 viper_path = "viper_extracts/extract_output/Asterix_seed0_reward-env_oc_pruned-extraction/Tree-4695.0_best.viper"
@@ -16,7 +18,13 @@ print(f"Shape of observations: {obs_data.shape}")
 
 # Assuming the number of features is the second dimension of obs_data
 num_features = obs_data.shape[1]
-features = [f"feature_{i}" for i in range(num_features)]
+# feature names from the observation schema written by viper_extract.py, generic names for older extracts
+schema_path = 'viper_extracts/extract_output/Asterix_seed0_reward-env_oc_pruned-extraction/schema.json'
+if os.path.exists(schema_path):
+    with open(schema_path, "r") as f:
+        features = json.load(f)["observation_names"]
+else:
+    features = [f"feature_{i}" for i in range(num_features)]
 thresholds = dtree.tree_.threshold
 
 # Recursive function to extract decision rules